@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -20,10 +22,14 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-j#cedux&o3k@)+)%5ceul00d*y9hxa^s7n(4r)hoae@=e38s1n'
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'django-insecure-j#cedux&o3k@)+)%5ceul00d*y9hxa^s7n(4r)hoae@=e38s1n')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
+
+# The insecure default key is only for development
+if not DEBUG and not os.environ.get('DJANGO_SECRET_KEY'):
+    raise ImproperlyConfigured('Set DJANGO_SECRET_KEY when DJANGO_DEBUG=0')
 
 ALLOWED_HOSTS = ['*']
 
@@ -46,7 +52,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.instrumentation.InstrumentationMiddleware',
+    'utils.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'utils.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -87,10 +96,36 @@ DATABASES = {
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        # Seconds a DB connection is reused by the same worker thread, 0 opens one per request
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        'OPTIONS': {
+            # Seconds to wait for a connection, an unreachable host would block for minutes
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
     }
 }
 
+# Check the persistent DB connections that have been idle for a while before using them
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1'
+DB_CONN_HEALTH_CHECK_INTERVAL = float(os.environ.get('DB_CONN_HEALTH_CHECK_INTERVAL', 10))  # Seconds
+
+# Startup wait for the database (wait_for_db), retried with exponential backoff and jitter
+DB_WAIT_TIMEOUT = float(os.environ.get('DB_WAIT_TIMEOUT', 60))  # Seconds
+DB_WAIT_MAX_DELAY = float(os.environ.get('DB_WAIT_MAX_DELAY', 5))  # Max seconds between two attempts
+
+# Seconds the database check of the /readyz probe is reused
+READINESS_CHECK_TTL = float(os.environ.get('READINESS_CHECK_TTL', 1))
+
+
+# Password hashing, PBKDF2 with PASSWORD_HASH_ITERATIONS iterations
+
+PASSWORD_HASHERS = [
+    'user.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -150,6 +185,115 @@ SWAGGER_SETTINGS = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
-    )
+        'user.authentication.CachedTokenAuthentication',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        # Token requests of an email from an IP
+        'login': os.environ.get('LOGIN_THROTTLE_RATE', '10/min'),
+    },
+}
+
+# Password hashing cost and the pool that checks the passwords of the token requests,
+# requests beyond the workers and the queue are rejected
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 260000))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))  # Threads
+PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 32))  # Pending checks
+
+# Cache of the token -> user resolution of the token authentication
+TOKEN_AUTH_CACHE_SIZE = int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000))  # Tokens
+TOKEN_AUTH_CACHE_TTL = float(os.environ.get('TOKEN_AUTH_CACHE_TTL', 10))  # Seconds
+# Alias in CACHES of a cache shared by the workers (e.g. Redis), revoked tokens are then rejected
+# by every worker right away instead of after TOKEN_AUTH_CACHE_TTL
+TOKEN_AUTH_CACHE_SHARED_ALIAS = os.environ.get('TOKEN_AUTH_CACHE_SHARED_ALIAS') or None
+
+# Product visits are buffered in memory and written to the DB in batches
+PRODUCT_VISITS_FLUSH_INTERVAL = float(os.environ.get('PRODUCT_VISITS_FLUSH_INTERVAL', 5))  # Seconds
+PRODUCT_VISITS_FLUSH_SIZE = int(os.environ.get('PRODUCT_VISITS_FLUSH_SIZE', 1000))  # Pending visits
+# 'atomic' writes the visit of each read with a single UPDATE ... RETURNING instead
+PRODUCT_VISITS_MODE = os.environ.get('PRODUCT_VISITS_MODE', 'buffered')
+
+# Retention of the minute, hour and day product visit buckets
+PRODUCT_VISITS_MINUTE_RETENTION = int(os.environ.get('PRODUCT_VISITS_MINUTE_RETENTION', 24))  # Hours
+PRODUCT_VISITS_HOUR_RETENTION = int(os.environ.get('PRODUCT_VISITS_HOUR_RETENTION', 30))  # Days
+PRODUCT_VISITS_DAY_RETENTION = int(os.environ.get('PRODUCT_VISITS_DAY_RETENTION', 730))  # Days
+
+# Slack notifications are sent in the background by a pool of workers
+SLACK_NOTIFICATION_WORKERS = int(os.environ.get('SLACK_NOTIFICATION_WORKERS', 2))
+SLACK_NOTIFICATION_QUEUE_SIZE = int(os.environ.get('SLACK_NOTIFICATION_QUEUE_SIZE', 1000))
+SLACK_COALESCE_WINDOW = float(os.environ.get('SLACK_COALESCE_WINDOW', 2))  # Seconds
+SLACK_TIMEOUT = float(os.environ.get('SLACK_TIMEOUT', 5))  # Seconds
+SLACK_MAX_RETRIES = int(os.environ.get('SLACK_MAX_RETRIES', 3))
+SLACK_RETRY_BACKOFF = float(os.environ.get('SLACK_RETRY_BACKOFF', 0.5))  # Seconds, doubled on each retry
+
+# Product list pagination and streaming
+PRODUCT_LIST_PAGE_SIZE = int(os.environ.get('PRODUCT_LIST_PAGE_SIZE', 100))
+PRODUCT_LIST_MAX_PAGE_SIZE = int(os.environ.get('PRODUCT_LIST_MAX_PAGE_SIZE', 1000))
+PRODUCT_STREAM_CHUNK_SIZE = int(os.environ.get('PRODUCT_STREAM_CHUNK_SIZE', 2000))  # Rows per DB fetch
+
+# Read-through cache of single products, PRODUCT_CACHE_SHARED_ALIAS is the
+# alias in CACHES of an optional shared tier (e.g. Redis or Memcached)
+PRODUCT_CACHE_SIZE = int(os.environ.get('PRODUCT_CACHE_SIZE', 10000))  # Products in local memory
+PRODUCT_CACHE_TTL = float(os.environ.get('PRODUCT_CACHE_TTL', 30))  # Seconds
+PRODUCT_CACHE_SHARED_ALIAS = os.environ.get('PRODUCT_CACHE_SHARED_ALIAS') or None
+PRODUCT_CACHE_SHARED_TTL = float(os.environ.get('PRODUCT_CACHE_SHARED_TTL', 300))  # Seconds
+
+# Leaderboards of the most visited products, overall and per brand
+PRODUCT_TOP_SIZE = int(os.environ.get('PRODUCT_TOP_SIZE', 100))  # Products per board, max N of a top-N read
+PRODUCT_TOP_TTL = float(os.environ.get('PRODUCT_TOP_TTL', 60))  # Seconds
+PRODUCT_TOP_BRANDS = int(os.environ.get('PRODUCT_TOP_BRANDS', 1000))  # Boards kept in memory
+
+# Opt-in pagination of the user list (?page_size=)
+USER_LIST_PAGE_SIZE = int(os.environ.get('USER_LIST_PAGE_SIZE', 100))
+USER_LIST_MAX_PAGE_SIZE = int(os.environ.get('USER_LIST_MAX_PAGE_SIZE', 1000))
+
+# Bulk product writes
+PRODUCT_BULK_MAX_ITEMS = int(os.environ.get('PRODUCT_BULK_MAX_ITEMS', 50000))  # Products per request
+PRODUCT_BULK_BATCH_SIZE = int(os.environ.get('PRODUCT_BULK_BATCH_SIZE', 1000))  # Rows per INSERT/UPDATE
+
+# Threads (and DB connections) of each worker used by the async product views
+ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', 8))
+
+# Brotli/gzip compression of the responses, smaller responses are sent as they are
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # Bytes
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))  # 0-11, higher is slower
+
+# Per request instrumentation: Server-Timing headers, request log lines and /metrics
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '1') == '1'
+INSTRUMENTATION_SERVER_TIMING = os.environ.get('INSTRUMENTATION_SERVER_TIMING', '1') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None  # Bearer token required by /metrics, local only when not set
+# Directory where each worker process writes its metrics, /metrics adds them up. Without it,
+# /metrics only has the ones of the worker that answers
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_EXPORT_INTERVAL = float(os.environ.get('METRICS_EXPORT_INTERVAL', 5))  # Seconds
+
+# Opt-in profiling of a sample of the requests (cProfile) and of the slow ones (stack sampler)
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '0') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01))  # Fraction of requests
+PROFILING_SLOW_THRESHOLD = float(os.environ.get('PROFILING_SLOW_THRESHOLD', 1))  # Seconds, 0 to disable
+PROFILING_SAMPLE_INTERVAL = float(os.environ.get('PROFILING_SAMPLE_INTERVAL', 0.01))  # Seconds
+PROFILING_TRACEMALLOC = os.environ.get('PROFILING_TRACEMALLOC', '1') == '1'
+PROFILING_DIR = os.environ.get('PROFILING_DIR', '/tmp/profiles')
+PROFILING_MAX_PROFILES = int(os.environ.get('PROFILING_MAX_PROFILES', 100))  # Oldest ones are deleted
+
+# OpenAPI schema and Swagger page, built once per process. SCHEMA_FILE is written by the
+# generate_schema command and loaded instead of introspecting the views when the code is the same
+SCHEMA_FILE = os.environ.get('SCHEMA_FILE', '/tmp/openapi.json')
+SCHEMA_MAX_AGE = int(os.environ.get('SCHEMA_MAX_AGE', 300))  # Seconds clients cache the schema and the page
+# Swagger UI assets, a pinned version so its files never change and are cached for a year
+SWAGGER_UI_URL = os.environ.get('SWAGGER_UI_URL', 'https://unpkg.com/swagger-ui-dist@3.52.5')
+
+# One JSON line per request is logged at INFO, e.g. REQUEST_LOG_LEVEL=INFO
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'utils.instrumentation': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
 }
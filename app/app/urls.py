@@ -15,31 +15,23 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.utils.translation import gettext as _   # For text translations
-from django.views.generic import TemplateView
 
-from rest_framework.schemas import get_schema_view
-
-SCHEMA_TITLE = _('ZeBrands Products and Users API')
-SCHEMA_DESCRIPTION = _('This is a basic API to manage ZeBrands products and users.<br><br>'
-                       'First you need to create a token for authorization with your ZeBrands '
-                       'email (user@zebrands.com) and your password.<br>'
-                       'Then you need to add that token to the "Authorization" header of your requests in '
-                       'the form: Token {valid_token}<br><br>'
-                       'Notice that there are some public endpoints that do not need authentication.')
+from core import views as core_views
 
 urlpatterns = [
-    # Adding Schema view with rest_framework
-    path('Schema/', get_schema_view(
-        title=SCHEMA_TITLE,
-        description=SCHEMA_DESCRIPTION
-    ), name='openapi-schema'),
-    # Adding API endpoints documentation with Swagger
-    path('', TemplateView.as_view(
-        template_name='documentation.html',
-        extra_context={'schema_url': 'openapi-schema'}
-    ), name='swagger-ui'),
+    # OpenAPI schema, built once per process
+    path('Schema/', core_views.openapi_schema, name='openapi-schema'),
+    # Adding API endpoints documentation with Swagger, built once per process
+    path('', core_views.documentation, name='swagger-ui'),
+    # Liveness and readiness probes
+    path('healthz', core_views.healthz, name='healthz'),
+    path('readyz', core_views.readyz, name='readyz'),
+    # Prometheus metrics of the requests
+    path('metrics', core_views.metrics, name='metrics'),
     path('admin/', admin.site.urls),
+    # Request profiles, captured when PROFILING_ENABLED is on
+    path('api/profiles/', core_views.ProfileListView.as_view(), name='profiles'),
+    path('api/profiles/<str:name>', core_views.ProfileFileView.as_view(), name='profile'),
     path('api/users/', include('user.urls')),
     path('api/products/', include('products.urls')),
 ]
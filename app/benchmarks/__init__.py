@@ -0,0 +1,48 @@
+"""
+Performance benchmarks for the ZeBrands API.
+
+Each benchmark is a module runnable from the ``app`` folder, e.g.
+``python -m benchmarks.bench_visits``. They run against the Postgres
+server configured in the settings, inside a throwaway test database.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    """Configure Django so that the benchmarks can use the ORM"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+    import django
+    django.setup()
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """Create a throwaway database for the benchmark and destroy it at the end"""
+    from django.db import connection
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+
+@contextmanager
+def timer(results, name):
+    """Store in results[name] the seconds spent inside the block"""
+    start = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - start
+
+
+def percentile(values, percent):
+    """Return the given percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,119 @@
+"""
+Benchmark of the sync product read views against their async versions
+(api/products/async/...) served by uvicorn, at increasing concurrency.
+
+    DB_CONN_MAX_AGE=60 DJANGO_DEBUG=0 python -m benchmarks.bench_async_views --products 10000
+
+The server runs in a subprocess on the benchmark database, the clients
+are keep-alive connections driven by a single asyncio loop.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks import benchmark_database, percentile, setup_django
+
+HOST = '127.0.0.1'
+
+
+async def get(reader, writer, path):
+    """Send a keep-alive GET request and return its status code"""
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {HOST}\r\n\r\n'.encode())
+    await writer.drain()
+    headers = await reader.readuntil(b'\r\n\r\n')
+    status = int(headers.split(b' ', 2)[1])
+    length = 0
+    for line in headers.split(b'\r\n'):
+        name, _, value = line.partition(b':')
+        if name.lower() == b'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def load(port, paths, concurrency, duration):
+    """Return the latencies and errors of `concurrency` clients requesting random paths"""
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def client():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(HOST, port)
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            if await get(reader, writer, random.choice(paths)) != 200:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        writer.close()
+
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return latencies, errors
+
+
+def wait_for_server(port, timeout=30):
+    """Wait until the server accepts requests"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('The server did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per measurement')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64, 256])
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from core.models import Product
+
+    with benchmark_database() as connection:
+        Product.objects.bulk_create([
+            Product(sku=f'bench_{index:08d}', name=f'Bench Product {index}', price=10.0, brand=f'Brand {index % 50}')
+            for index in range(args.products)
+        ], batch_size=5000)
+        ids = list(Product.objects.values_list('id', flat=True))
+
+        env = dict(os.environ, DB_NAME=connection.settings_dict['NAME'])
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'app.asgi:application', '--host', HOST,
+             '--port', str(args.port), '--no-access-log'],
+            env=env
+        )
+        try:
+            wait_for_server(args.port)
+            endpoints = [
+                ('detail sync', [f'/api/products/{pk}/' for pk in ids]),
+                ('detail async', [f'/api/products/async/{pk}/' for pk in ids]),
+                ('list sync', [f'/api/products/?brand=Brand%20{brand}&page_size=20' for brand in range(50)]),
+                ('list async', [f'/api/products/async/?brand=Brand%20{brand}&page_size=20' for brand in range(50)]),
+            ]
+            print(f'{args.duration:g}s per measurement, {args.products} products')
+            print(f'{"endpoint":>13} {"clients":>8} {"rps":>9} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+            for name, paths in endpoints:
+                for concurrency in args.concurrency:
+                    latencies, errors = asyncio.run(load(args.port, paths, concurrency, args.duration))
+                    print(f'{name:>13} {concurrency:8d} {len(latencies) / args.duration:9.1f} '
+                          f'{percentile(latencies, 50) * 1000:8.2f} {percentile(latencies, 99) * 1000:8.2f} '
+                          f'{errors:7d}')
+        finally:
+            server.terminate()
+            server.wait()
+            connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark of the catalog export and import commands: products per
+second of export_products and import_products, in CSV and NDJSON, on a
+catalog seeded with SQL.
+
+    python -m benchmarks.bench_catalog_io --rows 1000000
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from django.core.management import call_command
+
+from benchmarks import benchmark_database, setup_django
+
+SEED_SQL = """
+INSERT INTO core_product (sku, name, price, brand, visits, updated_at)
+SELECT 'SKU-' || i, 'Product ' || i, (random() * 5000)::numeric(10, 2), 'Brand ' || (i %% 50), i %% 1000, now()
+FROM generate_series(1, %(rows)s) AS i;
+ANALYZE core_product;
+"""
+
+
+def run(name, *args, **options):
+    """Run a command and return its seconds"""
+    start = time.perf_counter()
+    call_command(name, *args, stderr=io.StringIO(), **options)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from core.models import Product
+
+    with benchmark_database() as connection, tempfile.TemporaryDirectory() as directory:
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_SQL, {'rows': args.rows})
+
+        print(f'{args.rows:,} products, batches of {args.batch_size:,}')
+        print(f'{"step":>22} {"seconds":>8} {"products/s":>11} {"MB":>7}')
+        for file_format in ('csv', 'ndjson'):
+            path = os.path.join(directory, f'products.{file_format}')
+            steps = [
+                ('export', lambda: run('export_products', path, batch_size=args.batch_size)),
+                ('import (all updated)', lambda: run('import_products', path, batch_size=args.batch_size)),
+            ]
+            for step, function in steps:
+                if step.startswith('import'):
+                    # Every SKU exists, with another name
+                    Product.objects.update(name='Old')
+                elapsed = function()
+                print(f'{file_format + " " + step:>22} {elapsed:8.1f} {args.rows / elapsed:11,.0f} '
+                      f'{os.path.getsize(path) / 1e6:7.1f}')
+
+            Product.objects.all().delete()
+            elapsed = run('import_products', path, batch_size=args.batch_size)
+            print(f'{file_format + " import (new)":>22} {elapsed:8.1f} {args.rows / elapsed:11,.0f}')
+
+
+if __name__ == '__main__':
+    main()
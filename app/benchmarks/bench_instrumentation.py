@@ -0,0 +1,103 @@
+"""
+Benchmark of the overhead of the request instrumentation: the same
+requests are sent in process with the instrumentation enabled and
+disabled, in alternating rounds so that both see the same conditions.
+
+    python -m benchmarks.bench_instrumentation --requests 2000
+
+The requests go through the whole middleware and view stack with the
+Django test client, no server is needed.
+"""
+import argparse
+import gc
+import time
+
+from benchmarks import benchmark_database, percentile, setup_django
+
+
+def set_query_recorder(enabled):
+    """Add or remove the DB execute wrapper of the instrumentation"""
+    from django.db import connection
+
+    from utils.instrumentation import install_query_recorder, record_query
+
+    if enabled:
+        install_query_recorder(None, connection)
+    elif record_query in connection.execute_wrappers:
+        connection.execute_wrappers.remove(record_query)
+
+
+def make_client(enabled):
+    """Return a test client whose middleware chain is loaded with the instrumentation on or off"""
+    from django.test import Client, override_settings
+
+    client = Client()
+    with override_settings(INSTRUMENTATION_ENABLED=enabled):
+        client.get('/healthz')  # Loads the middleware chain
+    return client
+
+
+def run(client, requests, latencies):
+    for method, path, kwargs in requests:
+        start = time.perf_counter()
+        getattr(client, method)(path, **kwargs)
+        latencies.append(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and mode')
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.test.utils import setup_test_environment
+    from rest_framework.authtoken.models import Token
+
+    from core.models import Product
+    from products.visits import visit_buffer
+
+    setup_test_environment()
+    with benchmark_database():
+        Product.objects.bulk_create([
+            Product(sku=f'bench_{index:06d}', name=f'Bench Product {index}', price=10.0, brand=f'Brand {index % 50}')
+            for index in range(1000)
+        ])
+        ids = list(Product.objects.values_list('id', flat=True))
+        user = get_user_model().objects.create_user('bench@zebrands.com', 'pass123')
+        token = Token.objects.create(user=user)
+        auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+        endpoints = {
+            'detail (cached)': [('get', f'/api/products/{ids[0]}/', {})],
+            'list page': [('get', '/api/products/?page_size=20', {})],
+            'user list (auth)': [('get', '/api/users/', auth)],
+            'product PATCH': [('patch', f'/api/products/manage/{ids[1]}/', dict(
+                auth, data='{"price": 11.0}', content_type='application/json'
+            ))],
+        }
+        clients = {enabled: make_client(enabled) for enabled in (False, True)}
+        per_round = max(1, args.requests // args.rounds)
+        # Keep the startup objects out of the GC, its full collections would add noise to the timings
+        gc.freeze()
+
+        print(f'{per_round * args.rounds} requests per endpoint and mode')
+        print(f'{"endpoint":>17} {"off p50 us":>11} {"on p50 us":>10} {"off p99 us":>11} {"on p99 us":>10} {"overhead":>9}')
+        for name, requests in endpoints.items():
+            latencies = {False: [], True: []}
+            for index in range(args.rounds):
+                # Alternate which mode runs first, so neither always runs on a warmer process
+                for enabled in (False, True) if index % 2 else (True, False):
+                    set_query_recorder(enabled)
+                    run(clients[enabled], requests * per_round, latencies[enabled])
+                visit_buffer.clear()
+
+            off, on = (percentile(latencies[mode], 50) for mode in (False, True))
+            print(f'{name:>17} {off * 1e6:11.0f} {on * 1e6:10.0f} {percentile(latencies[False], 99) * 1e6:11.0f} '
+                  f'{percentile(latencies[True], 99) * 1e6:10.0f} {(on - off) / off:9.1%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark of a login storm: logins per second on the token endpoint and
+p50/p99 latency of the product reads made at the same time, with an
+unbounded and a bounded password hashing pool, and with clients that
+present their still valid token.
+
+    python -m benchmarks.bench_login_storm --logins 16 --readers 8 --duration 10
+
+Gunicorn (threaded workers) runs in a subprocess on the benchmark database.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from benchmarks import benchmark_database, percentile, setup_django
+
+HOST = '127.0.0.1'
+PASSWORD = 'storm-password'
+
+
+def wait_for_server(url, timeout=30):
+    """Wait until the server answers"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError('The server did not start')
+
+
+def storm(url, emails, tokens, product_id, readers, duration):
+    """Run login and reader clients, return the logins, rejected logins and reader latencies"""
+    deadline = time.monotonic() + duration
+    logins = []
+    rejected = []
+    latencies = []
+
+    def login(email):
+        session = requests.Session()
+        if tokens:
+            session.headers['Authorization'] = f'Token {tokens[email]}'
+        while time.monotonic() < deadline:
+            response = session.post(f'{url}/api/users/token/', data={'email': email, 'password': PASSWORD})
+            (logins if response.status_code == 200 else rejected).append(1)
+
+    def read():
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            session.get(f'{url}/api/products/{product_id}/')
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=login, args=(email, )) for email in emails]
+    threads += [threading.Thread(target=read) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return len(logins), len(rejected), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=16, help='Concurrent login clients')
+    parser.add_argument('--readers', type=int, default=8, help='Concurrent product read clients')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per scenario')
+    parser.add_argument('--threads', type=int, default=8, help='Threads of the gunicorn worker')
+    parser.add_argument('--hash-workers', type=int, default=os.cpu_count() or 2, help='Bounded pool size')
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+    from rest_framework.authtoken.models import Token
+
+    from core.models import Product
+
+    scenarios = [
+        ('no logins', 0, args.threads, False),
+        ('unbounded hashing', args.logins, args.threads, False),
+        (f'{args.hash_workers} hashing threads', args.logins, args.hash_workers, False),
+        ('token reuse', args.logins, args.hash_workers, True),
+    ]
+
+    with benchmark_database() as connection:
+        product_id = Product.objects.create(sku='storm', name='Storm', price=1, brand='Storm').id
+        emails = [f'storm{index}@zebrands.com' for index in range(args.logins)]
+        tokens = {}
+        for email in emails:
+            user = get_user_model().objects.create_user(email=email, password=PASSWORD)
+            tokens[email] = Token.objects.create(user=user).key
+        connection.close()
+
+        url = f'http://{HOST}:{args.port}'
+        print(f'{args.logins} login clients, {args.readers} product readers, {args.duration:g}s per scenario')
+        print(f'{"scenario":>20} {"logins/s":>9} {"rejected":>9} {"reads/s":>8} {"read p50 ms":>12} {"read p99 ms":>12}')
+        for name, logins, hash_workers, reuse in scenarios:
+            env = dict(
+                os.environ, DB_NAME=connection.settings_dict['NAME'], WEB_BIND=f'{HOST}:{args.port}',
+                WEB_CONCURRENCY='1', WEB_THREADS=str(args.threads), WEB_ACCESS_LOG='/dev/null',
+                WEB_LOG_LEVEL='warning', PASSWORD_HASH_WORKERS=str(hash_workers),
+                LOGIN_THROTTLE_RATE='1000000/s',
+            )
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app.wsgi'], env=env
+            )
+            try:
+                wait_for_server(f'{url}/api/products/{product_id}/')
+                done, rejected, latencies = storm(
+                    url, emails[:logins], tokens if reuse else None, product_id, args.readers, args.duration
+                )
+            finally:
+                server.terminate()
+                server.wait()
+
+            print(f'{name:>20} {done / args.duration:9.1f} {rejected:9d} {len(latencies) / args.duration:8.1f} '
+                  f'{percentile(latencies, 50) * 1000:12.2f} {percentile(latencies, 99) * 1000:12.2f}')
+
+
+if __name__ == '__main__':
+    main()
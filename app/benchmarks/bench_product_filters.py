@@ -0,0 +1,86 @@
+"""
+Benchmark of the product list filters before and after the
+0005_product_indexes migration, on a seeded catalog.
+
+    python -m benchmarks.bench_product_filters --rows 1000000
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks import benchmark_database, setup_django
+
+FIELDS = ('id', 'sku', 'name', 'price', 'brand', 'visits')
+
+SEED_SQL = """
+INSERT INTO core_product (sku, name, price, brand, visits)
+SELECT
+    'SKU-' || lpad(i::text, 8, '0'),
+    (ARRAY['Blue', 'Red', 'Green', 'White', 'Black', 'Grey', 'Soft', 'Firm'])[1 + i %% 8]
+        || ' ' || (ARRAY['Pillow', 'Mattress', 'Sheet', 'Blanket', 'Bed', 'Sofa'])[1 + (i / 8) %% 6]
+        || ' ' || i,
+    (i * 7919 %% 100000) / 100.0,
+    'Brand ' || (i %% 200),
+    i %% 1000
+FROM generate_series(1, %s) AS i
+"""
+
+
+def queries():
+    """Return the list of (name, queryset factory) to benchmark"""
+    from core.models import Product
+
+    products = Product.objects.values_list(*FIELDS)
+    return [
+        ('brand', lambda: products.filter(brand='Brand 42').order_by('id')[:100]),
+        ('price range', lambda: products.filter(price__gte=500, price__lte=501).order_by('id')[:100]),
+        ('order by price', lambda: products.order_by('price', 'id')[:100]),
+        ('name prefix', lambda: products.filter(name__istartswith='blue pillow 12').order_by('id')[:100]),
+        ('name contains', lambda: products.filter(name__icontains='pillow 4242').order_by('id')[:100]),
+    ]
+
+
+def measure(repeat):
+    """Return the median milliseconds of each query"""
+    results = {}
+    for name, queryset in queries():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset())
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = statistics.median(timings)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.core.management import call_command
+
+    with benchmark_database() as connection:
+        # Catalog without the product indexes
+        call_command('migrate', 'core', '0004', verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_SQL, [args.rows])
+            cursor.execute('ANALYZE core_product')
+        before = measure(args.repeat)
+
+        call_command('migrate', 'core', '0005', verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_product')
+        after = measure(args.repeat)
+
+    print(f'Median query latency over {args.repeat} runs, {args.rows} products')
+    print(f'{"query":>15} {"before ms":>10} {"after ms":>10}')
+    for name in before:
+        print(f'{name:>15} {before[name]:10.2f} {after[name]:10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark of the product list serialization: ProductSerializer with the
+DRF JSON renderer against the values() rows fast path.
+
+    python -m benchmarks.bench_product_list --rows 10000 100000
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks import benchmark_database, setup_django
+
+
+def measure(function, repeat):
+    """Return the median milliseconds of the function and its result"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from rest_framework.renderers import JSONRenderer
+
+    from core.models import Product
+    from products.renderers import ProductJSONRenderer, product_values
+    from products.serializers import ProductSerializer
+
+    def serializer_path(queryset):
+        return JSONRenderer().render(ProductSerializer(queryset, many=True).data)
+
+    def fast_path(queryset):
+        return ProductJSONRenderer().render(list(product_values(queryset)))
+
+    print(f'Median milliseconds over {args.repeat} runs')
+    print(f'{"rows":>8} {"serializer":>11} {"fast path":>10} {"speedup":>8}')
+    with benchmark_database():
+        created = 0
+        for rows in sorted(args.rows):
+            Product.objects.bulk_create([
+                Product(sku=f'bench_{index:08d}', name=f'Bench Product {index}', price=index / 100, brand='Bench')
+                for index in range(created, rows)
+            ], batch_size=5000)
+            created = rows
+
+            queryset = Product.objects.order_by('id')
+            before, expected = measure(lambda: serializer_path(queryset.all()), args.repeat)
+            after, content = measure(lambda: fast_path(queryset.all()), args.repeat)
+            assert content == expected, 'The fast path output is different'
+            print(f'{rows:8d} {before:11.1f} {after:10.1f} {before / after:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
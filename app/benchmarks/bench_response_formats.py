@@ -0,0 +1,77 @@
+"""
+Benchmark of the product list formats: encode time and bytes on the wire
+of a product list rendered as JSON, columnar JSON and MessagePack, sent
+as they are and compressed with gzip and brotli.
+
+    python -m benchmarks.bench_response_formats --products 100000
+
+The rows are built in memory like the ones read by the product list,
+no database is needed.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks import setup_django
+
+
+def make_rows(count):
+    """Return product rows like the ones of product_values()"""
+    brands = [f'Brand {index}' for index in range(50)]
+    return [
+        {
+            'id': index,
+            'sku': f'SKU-{index:08d}',
+            'name': f'Product {index} {random.choice(("Almohada", "Colchón", "Base", "Sábanas"))}',
+            'price': round(random.uniform(10, 5000), 2),
+            'brand': random.choice(brands),
+            'visits': int(random.paretovariate(1.2)),
+        }
+        for index in range(1, count + 1)
+    ]
+
+
+def measure(function, repeat):
+    """Return the result and the median milliseconds of the function"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from rest_framework.renderers import JSONRenderer
+
+    from products.renderers import MessagePackRenderer, ProductColumnarRenderer, ProductJSONRenderer
+    from utils.compression import COMPRESSORS, ENCODINGS
+
+    rows = make_rows(args.products)
+
+    renderers = [('JSON (DRF)', JSONRenderer()), ('JSON', ProductJSONRenderer()),
+                 ('columnar', ProductColumnarRenderer()), ('MessagePack', MessagePackRenderer())]
+    compressors = [(encoding, COMPRESSORS[encoding]) for encoding in reversed(ENCODINGS)]
+
+    print(f'{args.products} products, median of {args.repeat} runs')
+    print(f'{"format":>12} {"encode ms":>10} {"bytes":>12} '
+          + ' '.join(f'{name + " ms":>9} {name + " bytes":>11}' for name, _ in compressors))
+    for name, renderer in renderers:
+        content, encode = measure(lambda: renderer.render(rows), args.repeat)
+        line = f'{name:>12} {encode:10.1f} {len(content):12,d}'
+        for _, compress in compressors:
+            compressed, elapsed = measure(lambda: compress(content), max(1, args.repeat // 2))
+            line += f' {elapsed:9.1f} {len(compressed):11,d}'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark of the token authentication, compares the stock DRF
+TokenAuthentication with the cached one.
+
+    python -m benchmarks.bench_token_auth --requests 5000 --tokens 10
+"""
+import argparse
+import random
+
+from benchmarks import benchmark_database, setup_django, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--tokens', type=int, default=10, help='Distinct users/tokens used by the requests')
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.authtoken.models import Token
+    from rest_framework.test import APIRequestFactory
+
+    from user.authentication import CachedTokenAuthentication, token_cache
+
+    with benchmark_database():
+        password = make_password('benchmark')
+        users = get_user_model().objects.bulk_create([
+            get_user_model()(email=f'bench{index}@zebrands.com', name=f'Bench {index}', password=password)
+            for index in range(args.tokens)
+        ])
+        keys = [Token.objects.create(user=user).key for user in users]
+
+        factory = APIRequestFactory()
+        requests = [
+            factory.get('/api/users/', HTTP_AUTHORIZATION=f'Token {random.choice(keys)}')
+            for _ in range(args.requests)
+        ]
+        results = {}
+        queries = {}
+
+        for name, backend in (('stock', TokenAuthentication()), ('cached', CachedTokenAuthentication())):
+            token_cache.clear()
+            with CaptureQueriesContext(connection) as context, timer(results, name):
+                for request in requests:
+                    backend.authenticate(request)
+            queries[name] = len(context.captured_queries)
+
+    print(f'{args.requests} authentications with {args.tokens} tokens')
+    for name in ('stock', 'cached'):
+        seconds = results[name]
+        print(f'{name:>7}: {args.requests / seconds:10.0f} auth/s  '
+              f'{seconds / args.requests * 1e6:8.1f} us/auth  {queries[name]} queries')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark of the top visited products reads: sorting the catalog, the
+0007_product_visits_indexes index scans and the in-memory leaderboard.
+
+    python -m benchmarks.bench_top_products --rows 1000000
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks import benchmark_database, setup_django
+
+SEED_SQL = """
+INSERT INTO core_product (sku, name, price, brand, visits, updated_at)
+SELECT 'SKU-' || lpad(i::text, 8, '0'), 'Product ' || i, (i %% 1000) + 0.99, 'Brand ' || (i %% 200),
+    (1000000 / (1 + i::bigint * 7919 %% 100000))::int, now()
+FROM generate_series(1, %s) AS i
+"""
+
+
+def measure(function, repeat):
+    """Return the median milliseconds of the function"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.core.management import call_command
+
+    from core.models import Product
+    from products.leaderboard import Leaderboard
+    from products.renderers import product_values
+
+    def sql_top(brand=None):
+        products = Product.objects.order_by('-visits', 'id')
+        if brand is not None:
+            products = products.filter(brand=brand)
+        return list(product_values(products)[:args.limit])
+
+    queries = [
+        ('top', lambda: sql_top()),
+        ('top of a brand', lambda: sql_top('Brand 42')),
+    ]
+
+    with benchmark_database() as connection:
+        # Catalog without the visits indexes
+        call_command('migrate', 'core', '0006', verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_SQL, [args.rows])
+            cursor.execute('ANALYZE core_product')
+        before = {name: measure(query, args.repeat) for name, query in queries}
+
+        call_command('migrate', 'core', '0007', verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_product')
+        after = {name: measure(query, args.repeat) for name, query in queries}
+
+        leaderboard = Leaderboard(size=100, ttl=600)
+        leaderboard.top(args.limit)
+        leaderboard.top(args.limit, brand='Brand 42')
+        memory = {
+            'top': measure(lambda: leaderboard.top(args.limit), args.repeat),
+            'top of a brand': measure(lambda: leaderboard.top(args.limit, brand='Brand 42'), args.repeat),
+        }
+
+    print(f'Median latency of the top {args.limit} over {args.repeat} runs, {args.rows} products')
+    print(f'{"read":>15} {"sort ms":>10} {"index ms":>10} {"memory ms":>10}')
+    for name in before:
+        print(f'{name:>15} {before[name]:10.2f} {after[name]:10.2f} {memory[name]:10.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark of the time bucketed product visits: write throughput of the
+minute bucket upserts and latency of the windowed count and trending
+queries, on buckets filled up to the default retentions.
+
+    python -m benchmarks.bench_visit_analytics --products 1000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks import benchmark_database, setup_django
+
+# Minute, hour and day buckets of every product for the kept periods
+SEED_SQL = """
+INSERT INTO core_product (sku, name, price, brand, visits, updated_at)
+SELECT 'SKU-' || i, 'Product ' || i, 10, 'Brand ' || (i %% 20), 0, now() FROM generate_series(1, %(products)s) AS i;
+
+INSERT INTO core_productvisitbucket (product_id, resolution, bucket_start, count)
+SELECT p.id, r.resolution, s.bucket_start, 1 + (random() * 10)::int
+FROM core_product p,
+    (VALUES ('minute', interval '1 minute', %(minutes)s),
+            ('hour', interval '1 hour', %(hours)s),
+            ('day', interval '1 day', %(days)s)) AS r(resolution, length, buckets),
+    LATERAL (
+        SELECT date_trunc(r.resolution, now()) - r.length * n AS bucket_start
+        FROM generate_series(0, r.buckets - 1) AS n
+    ) AS s;
+
+ANALYZE core_product;
+ANALYZE core_productvisitbucket;
+"""
+
+
+def measure(function, repeat):
+    """Return the median milliseconds of the function"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--flushes', type=int, default=50, help='Flushes of the write benchmark')
+    parser.add_argument('--flush-size', type=int, default=1000, help='Products per flush')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from django.db.models import Count
+
+    from core.models import Product, ProductVisitBucket
+    from products import analytics
+
+    with benchmark_database() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_SQL, {
+                'products': args.products,
+                'minutes': settings.PRODUCT_VISITS_MINUTE_RETENTION * 60,
+                'hours': settings.PRODUCT_VISITS_HOUR_RETENTION * 24,
+                'days': settings.PRODUCT_VISITS_DAY_RETENTION,
+            })
+        ids = list(Product.objects.values_list('id', flat=True))
+        sizes = dict(ProductVisitBucket.objects.values_list('resolution').annotate(Count('id')))
+        print(f'{args.products} products, buckets: {sizes}')
+
+        start = time.perf_counter()
+        for _ in range(args.flushes):
+            sample = random.sample(ids, min(len(ids), args.flush_size))
+            analytics.record_visits({pk: random.randint(1, 5) for pk in sample})
+        elapsed = time.perf_counter() - start
+        written = args.flushes * min(len(ids), args.flush_size)
+        print(f'Writes: {written / elapsed:,.0f} buckets/s, {elapsed / args.flushes * 1000:.1f} ms per flush')
+
+        print(f'Median latency over {args.repeat} runs')
+        print(f'{"window":>7} {"count ms":>9} {"trending ms":>12}')
+        for window in ('1h', '1d', '7d', '30d', '365d'):
+            delta = analytics.parse_window(window)
+            count = measure(lambda: analytics.visit_count(random.choice(ids), delta), args.repeat)
+            top = measure(lambda: analytics.trending(delta, 10), args.repeat)
+            print(f'{window:>7} {count:9.2f} {top:12.2f}')
+
+        start = time.perf_counter()
+        analytics.rollup()
+        rollup = time.perf_counter() - start
+        print(f'Rollup: {rollup * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark of the product visits counting under concurrent load.
+
+Compares the old read-modify-write ``product.save()`` per visit with the
+buffered counter, reporting throughput and checking the final counts.
+
+    python -m benchmarks.bench_visits --threads 16 --visits 2000 --products 50
+"""
+import argparse
+import random
+import threading
+
+from benchmarks import benchmark_database, setup_django, timer
+
+
+def run_threads(threads, target):
+    """Run target(thread_index) in many threads and wait for all of them"""
+    workers = [threading.Thread(target=target, args=(index, )) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--visits', type=int, default=2000, help='Visits per thread')
+    parser.add_argument('--products', type=int, default=50)
+    parser.add_argument('--flush-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.db import connections
+    from django.db.models import Sum
+
+    from core.models import Product
+    from products.visits import VisitBuffer
+
+    with benchmark_database():
+        Product.objects.bulk_create([
+            Product(sku=f'bench_{index:06d}', name=f'Product {index}', price=10.0, brand='Bench')
+            for index in range(args.products)
+        ])
+        product_ids = list(Product.objects.values_list('id', flat=True))
+        plans = [
+            [random.choice(product_ids) for _ in range(args.visits)]
+            for _ in range(args.threads)
+        ]
+        expected = args.threads * args.visits
+        results = {}
+
+        def save_per_visit(index):
+            for product_id in plans[index]:
+                product = Product.objects.get(id=product_id)
+                product.visits += 1
+                product.save()
+            connections.close_all()
+
+        with timer(results, 'save'):
+            run_threads(args.threads, save_per_visit)
+        saved = Product.objects.aggregate(total=Sum('visits'))['total']
+
+        Product.objects.update(visits=0)
+        buffer = VisitBuffer(flush_interval=1.0, flush_size=args.flush_size)
+
+        def buffered(index):
+            for product_id in plans[index]:
+                buffer.record(product_id)
+            connections.close_all()
+
+        with timer(results, 'buffered'):
+            run_threads(args.threads, buffered)
+            buffer.stop()
+        buffered_total = Product.objects.aggregate(total=Sum('visits'))['total']
+        connections.close_all()
+
+    print(f'{args.threads} threads x {args.visits} visits over {args.products} products')
+    for name, total in (('save', saved), ('buffered', buffered_total)):
+        seconds = results[name]
+        print(f'{name:>9}: {expected / seconds:12.0f} visits/s  '
+              f'final count {total}/{expected} ({expected - total} lost)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Load test of the product endpoints against a running server, reports
+the p50/p99 latency and requests per second of each endpoint.
+
+Start the server (e.g. the production mode with gunicorn) on a local
+Postgres and run:
+
+    python -m benchmarks.load_test --url http://localhost:8000 --concurrency 32 --duration 30
+
+Pass --token to also load the authenticated endpoint, and --seed to
+create products through the bulk endpoint first (needs --token).
+"""
+import argparse
+import random
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from benchmarks import percentile
+
+
+def seed_products(session, url, count):
+    """Create products through the bulk endpoint"""
+    for start in range(0, count, 5000):
+        products = [
+            {'sku': f'load_{index:08d}', 'name': f'Load Product {index}', 'price': 10.0, 'brand': 'Load'}
+            for index in range(start, min(count, start + 5000))
+        ]
+        session.post(f'{url}/api/products/bulk/', json=products).raise_for_status()
+
+
+def product_ids(session, url, limit=1000):
+    """Return the IDs of some products"""
+    response = session.get(f'{url}/api/products/', params={'page_size': limit})
+    response.raise_for_status()
+    return [product['id'] for product in response.json()['results']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds')
+    parser.add_argument('--token', help='Authorization token for the authenticated endpoints')
+    parser.add_argument('--seed', type=int, default=0, help='Products to create before the test')
+    args = parser.parse_args()
+
+    url = args.url.rstrip('/')
+    headers = {'Authorization': f'Token {args.token}'} if args.token else {}
+    setup = requests.Session()
+    setup.headers.update(headers)
+    if args.seed:
+        seed_products(setup, url, args.seed)
+    ids = product_ids(setup, url)
+    if not ids:
+        parser.error('There are no products, use --seed to create some')
+
+    endpoints = [
+        ('list (100)', lambda: f'{url}/api/products/?page_size=100', {}),
+        ('detail anonymous', lambda: f'{url}/api/products/{random.choice(ids)}/', {}),
+    ]
+    if args.token:
+        endpoints.append(('detail authenticated', lambda: f'{url}/api/products/manage/{random.choice(ids)}/', headers))
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def client():
+        session = requests.Session()
+        local_latencies = defaultdict(list)
+        local_errors = defaultdict(int)
+        while time.monotonic() < deadline:
+            name, make_url, endpoint_headers = random.choice(endpoints)
+            start = time.perf_counter()
+            try:
+                ok = session.get(make_url(), headers=endpoint_headers).status_code == 200
+            except requests.RequestException:
+                ok = False
+            local_latencies[name].append(time.perf_counter() - start)
+            if not ok:
+                local_errors[name] += 1
+        with lock:
+            for name, values in local_latencies.items():
+                latencies[name].extend(values)
+            for name, count in local_errors.items():
+                errors[name] += count
+
+    workers = [threading.Thread(target=client) for _ in range(args.concurrency)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    print(f'{args.concurrency} clients for {args.duration:g}s against {url}')
+    print(f'{"endpoint":>22} {"requests":>9} {"errors":>7} {"rps":>8} {"p50 ms":>8} {"p99 ms":>8}')
+    for name, _, _ in endpoints:
+        values = latencies[name]
+        print(f'{name:>22} {len(values):9d} {errors[name]:7d} {len(values) / args.duration:8.1f} '
+              f'{percentile(values, 50) * 1000:8.2f} {percentile(values, 99) * 1000:8.2f}')
+    total = sum(len(values) for values in latencies.values())
+    print(f'{"total":>22} {total:9d} {sum(errors.values()):7d} {total / args.duration:8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""
+Benchmark suite of the API: seeds a throwaway database with a catalog and
+users generated from a fixed seed, then times the main endpoints and the
+serializer and ORM paths behind them, and counts their SQL queries.
+
+    python -m benchmarks.suite --products 10000 --users 1000 --output results.json
+    python -m benchmarks.suite --products 10000 --users 1000 --baseline results.json --threshold 0.2
+
+The results are saved as JSON. Given a baseline, the run fails (exit code
+1) when the median time of a case grew more than the threshold, or when
+a case runs more queries than in the baseline.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks import benchmark_database, percentile, setup_django
+
+BRANDS = 50
+PASSWORD = 'benchmark-pass'
+PAGE_SIZE = 100
+
+
+class Case:
+    """A benchmarked operation, `run` is called once per iteration with the iteration number"""
+
+    def __init__(self, name, run, weight=1.0, status=None):
+        """
+        :param name: str Name of the case in the results
+        :param run: callable(iteration)
+        :param weight: float Fraction of the iterations run, for the slow cases like password checks
+        :param status: int Expected status code of the response returned by `run`, for the HTTP cases
+        """
+        self.name = name
+        self.run = run
+        self.weight = weight
+        self.status = status
+
+    def __call__(self, iteration):
+        result = self.run(iteration)
+        # An error response is usually much faster, and would be benchmarked instead of the endpoint
+        if self.status is not None and result.status_code != self.status:
+            raise SystemExit(f'{self.name}: expected status {self.status}, got {result.status_code}')
+
+
+def seed_database(products, users, seed):
+    """Create the products and users of the benchmark, the same ones for the same seed"""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+
+    from core.models import Product
+
+    generator = random.Random(seed)
+    Product.objects.bulk_create([
+        Product(
+            sku=f'suite_{index:08d}',
+            name=f'Suite Product {index}',
+            price=round(generator.uniform(10, 5000), 2),
+            brand=f'Brand {min(int(generator.paretovariate(1.5)), BRANDS)}',
+            visits=int(generator.paretovariate(1.2)),
+        )
+        for index in range(products)
+    ], batch_size=5000)
+
+    # Hashing a password takes a few hundred ms, all the users share one hash
+    password = make_password(PASSWORD)
+    user_model = get_user_model()
+    user_model.objects.bulk_create([
+        user_model(email=f'suite_{index:06d}@zebrands.com', name=f'Suite User {index}', password=password)
+        for index in range(users)
+    ], batch_size=5000)
+
+
+def make_cases(seed):
+    """Return the benchmarked cases, run against the seeded database"""
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+    from rest_framework.authtoken.models import Token
+
+    from core.models import Product
+    from products.renderers import FIELDS
+    from products.serializers import ProductSerializer
+    from user.serializers import UserSerializer
+
+    generator = random.Random(seed)
+    ids = list(Product.objects.values_list('id', flat=True))
+    product_ids = [generator.choice(ids) for _ in range(1000)]
+    user = get_user_model().objects.order_by('id').first()
+    # The logins are rotated between the users, the login rate of a single email would be exceeded
+    emails = list(get_user_model().objects.order_by('id').values_list('email', flat=True)[:1000])
+    token = Token.objects.create(user=user)
+    auth = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+    client = Client()
+    new_skus = itertools.count()
+
+    def product_id(iteration):
+        return product_ids[iteration % len(product_ids)]
+
+    products = list(Product.objects.order_by('id')[:PAGE_SIZE])
+    users = list(get_user_model().objects.order_by('id')[:PAGE_SIZE])
+
+    return [
+        Case('product list page', lambda i: client.get(f'/api/products/?page_size={PAGE_SIZE}'), status=200),
+        Case('product list brand', lambda i: client.get(f'/api/products/?brand=Brand%20{i % BRANDS + 1}'),
+             status=200),
+        Case('product detail anonymous', lambda i: client.get(f'/api/products/{product_id(i)}/'), status=200),
+        Case('product detail authenticated', lambda i: client.get(f'/api/products/manage/{product_id(i)}/', **auth),
+             status=200),
+        Case('product create', lambda i: client.post('/api/products/create/', {
+            'sku': f'suite_new_{next(new_skus)}', 'name': 'New Product', 'price': 10.0, 'brand': 'Brand 1'
+        }, **auth), status=201),
+        Case('product update', lambda i: client.patch(
+            f'/api/products/manage/{product_id(i)}/', json.dumps({'price': 10.0 + i % 100}),
+            content_type='application/json', **auth
+        ), status=200),
+        Case('token', lambda i: client.post('/api/users/token/', {
+            'email': emails[i % len(emails)], 'password': PASSWORD
+        }), weight=0.05, status=200),
+        Case('user list page', lambda i: client.get(f'/api/users/?page_size={PAGE_SIZE}', **auth), status=200),
+        Case('serializer products', lambda i: ProductSerializer(products, many=True).data),
+        Case('serializer users', lambda i: UserSerializer(users, many=True).data),
+        Case('orm product get', lambda i: Product.objects.get(pk=product_id(i))),
+        Case('orm product filter', lambda i: list(Product.objects.filter(brand=f'Brand {i % BRANDS + 1}')[:PAGE_SIZE])),
+        Case('orm product values', lambda i: list(Product.objects.values(*FIELDS)[:1000])),
+    ]
+
+
+def run_case(case, iterations, warmup):
+    """Return the timings and query count of a case"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    iterations = max(3, int(iterations * case.weight))
+    for iteration in range(max(1, int(warmup * case.weight))):
+        case(iteration)
+
+    timings = []
+    for iteration in range(iterations):
+        start = time.perf_counter()
+        case(iteration)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Counted on a separate run, so the capture does not slow the timed ones
+    with CaptureQueriesContext(connection) as queries:
+        case(iterations)
+
+    return {
+        'iterations': iterations,
+        'mean_ms': round(sum(timings) / len(timings), 4),
+        'p50_ms': round(percentile(timings, 50), 4),
+        'p95_ms': round(percentile(timings, 95), 4),
+        'min_ms': round(min(timings), 4),
+        'queries': len(queries),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return the {case: reason} regressions of the results against a baseline
+
+    :param threshold: float Max relative growth of the median time, e.g. 0.2 for 20%
+    """
+    regressions = {}
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result['queries'] > previous['queries']:
+            regressions[name] = f'{previous["queries"]} -> {result["queries"]} queries'
+        elif result['p50_ms'] > previous['p50_ms'] * (1 + threshold):
+            regressions[name] = f'median {previous["p50_ms"]:.3f} -> {result["p50_ms"]:.3f} ms'
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=200, help='Timed iterations per case')
+    parser.add_argument('--warmup', type=int, default=20, help='Untimed iterations per case')
+    parser.add_argument('--cases', nargs='+', help='Only run the cases whose name contains one of these words')
+    parser.add_argument('--output', help='Save the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare the results to the ones of this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Max relative growth of a median time before it is a regression')
+    args = parser.parse_args()
+
+    # No Slack notification is sent for the benchmark updates
+    os.environ.pop('SLACK_WEBHOOK', None)
+    setup_django()
+
+    from django.test.utils import setup_test_environment
+
+    from products.cache import product_cache
+    from products.visits import visit_buffer
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    setup_test_environment()
+    results = {}
+    with benchmark_database():
+        seed_database(args.products, args.users, args.seed)
+        cases = make_cases(args.seed)
+        if args.cases:
+            cases = [case for case in cases if any(word in case.name for word in args.cases)]
+
+        print(f'{args.products} products, {args.users} users, seed {args.seed}')
+        print(f'{"case":>30} {"runs":>5} {"p50 ms":>9} {"p95 ms":>9} {"mean ms":>9} {"queries":>8}')
+        for case in cases:
+            result = results[case.name] = run_case(case, args.iterations, args.warmup)
+            print(f'{case.name:>30} {result["iterations"]:5d} {result["p50_ms"]:9.3f} {result["p95_ms"]:9.3f} '
+                  f'{result["mean_ms"]:9.3f} {result["queries"]:8d}')
+        visit_buffer.clear()
+        product_cache.clear()
+
+    report = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'products': args.products,
+            'users': args.users,
+            'seed': args.seed,
+            'iterations': args.iterations,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if baseline is None:
+        return
+    if baseline['meta']['products'] != args.products or baseline['meta']['users'] != args.users:
+        print('Warning: the baseline was run with other data sizes')
+    regressions = compare(results, baseline['results'], args.threshold)
+    print(f'\nCompared to {args.baseline} ({baseline["meta"].get("commit")}), threshold {args.threshold:.0%}')
+    for name, reason in regressions.items():
+        print(f'REGRESSION {name}: {reason}')
+    if regressions:
+        sys.exit(1)
+    print('No regression')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        if settings.DB_CONN_HEALTH_CHECKS:
+            from core.db import check_connections
+            request_started.connect(check_connections, dispatch_uid='core_check_connections')
+        if settings.INSTRUMENTATION_ENABLED:
+            from utils.instrumentation import install_query_recorder
+            connection_created.connect(install_query_recorder, dispatch_uid='core_install_query_recorder')
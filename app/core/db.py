@@ -0,0 +1,26 @@
+"""
+Health checks of the persistent DB connections (CONN_MAX_AGE).
+
+Django 3.2 reuses a persistent connection without checking it, so a
+connection closed by the server (restart, idle timeout) fails the next
+request. Before each request, connections that have been idle for more
+than DB_CONN_HEALTH_CHECK_INTERVAL seconds are checked and closed if
+unusable, so that Django opens a new one.
+"""
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+def check_connections(**kwargs):
+    """request_started receiver that closes the unusable idle connections"""
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+
+        last_check = getattr(connection, 'last_health_check', now)
+        connection.last_health_check = now
+        if now - last_check >= settings.DB_CONN_HEALTH_CHECK_INTERVAL and not connection.is_usable():
+            connection.close()
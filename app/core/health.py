@@ -0,0 +1,107 @@
+"""
+Readiness of the database, used by the wait_for_db command at startup
+and by the /readyz probe.
+
+Django connections are lazy, getting one does not tell if the database
+is up: a check opens the connection if needed and runs ``SELECT 1``.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+def check_database(alias=DEFAULT_DB_ALIAS):
+    """Run a trivial query on a DB connection
+
+    :raise DatabaseError: If the database is not available
+    """
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except DatabaseError:
+        # Open a new connection on the next check
+        connection.close()
+        raise
+
+
+def backoff_delays(initial=0.1, maximum=5.0):
+    """Yield the delays of an exponential backoff, each one between half and all of its step
+
+    The jitter spreads the retries of many containers started at once.
+    """
+    delay = initial
+    while True:
+        yield random.uniform(delay / 2, delay)
+        delay = min(delay * 2, maximum)
+
+
+def wait_for_database(timeout, initial_delay=0.1, max_delay=5.0, alias=DEFAULT_DB_ALIAS, on_retry=None):
+    """Wait until the database answers a query
+
+    :param timeout: float Max seconds to wait
+    :param initial_delay: float Seconds before the first retry, doubled on each retry
+    :param max_delay: float Max seconds between two attempts
+    :param alias: str Alias of the database
+    :param on_retry: callable(attempt, error, delay) called before each wait
+    :return: int Number of attempts
+    :raise TimeoutError: If the database is not available within the timeout
+    """
+    deadline = time.monotonic() + timeout
+    for attempt, delay in enumerate(backoff_delays(initial_delay, max_delay), start=1):
+        try:
+            check_database(alias)
+            return attempt
+        except DatabaseError as error:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f'Database unavailable after {attempt} attempts: {error}') from error
+            delay = min(delay, remaining)
+            if on_retry is not None:
+                on_retry(attempt, error, delay)
+            time.sleep(delay)
+
+
+class ReadinessProbe:
+    """Readiness of the database, the result of a check is reused for a few seconds
+
+    Probes of every orchestrator replica hit the same processes, the DB
+    is queried at most once per TTL whatever the number of probes.
+    """
+
+    def __init__(self, ttl=1.0):
+        """
+        :param ttl: float Seconds the result of a check is reused
+        """
+        self.ttl = ttl
+        self._ready = False
+        self._checked_at = None
+        self._lock = threading.Lock()  # Only one thread checks the DB at a time
+
+    def _is_stale(self):
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.ttl
+
+    def is_ready(self):
+        """Return True if the database answered the last check"""
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    try:
+                        check_database()
+                        self._ready = True
+                    except DatabaseError:
+                        self._ready = False
+                    self._checked_at = time.monotonic()
+
+        return self._ready
+
+    def clear(self):
+        """Forget the last check, the next call checks the DB again"""
+        self._checked_at = None
+
+
+readiness = ReadinessProbe(ttl=settings.READINESS_CHECK_TTL)
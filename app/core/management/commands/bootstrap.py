@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+class Command(BaseCommand):
+    """Django command to prepare the app before serving it
+
+    Waits for the DB, applies the migrations, creates the default user and
+    writes the OpenAPI schema file, writing the duration of each phase to
+    find what slows down the boot.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, help='Max seconds to wait for the DB')
+
+    def handle(self, *args, **options):
+        wait_options = {'timeout': options['timeout']} if options['timeout'] is not None else {}
+        phases = (
+            ('wait_for_db', lambda: call_command('wait_for_db', stdout=self.stdout, **wait_options)),
+            ('migrate', self.migrate),
+            ('create_user', lambda: call_command('create_user', stdout=self.stdout)),
+        )
+        if settings.SCHEMA_FILE:
+            phases += (('generate_schema', lambda: call_command('generate_schema', stdout=self.stdout)), )
+
+        start = time.monotonic()
+        for name, run in phases:
+            phase_start = time.monotonic()
+            run()
+            self.stdout.write(f'Startup phase {name} took {time.monotonic() - phase_start:.2f} seconds')
+
+        self.stdout.write(self.style.SUCCESS(f'Startup took {time.monotonic() - start:.2f} seconds'))
+
+    def migrate(self):
+        """Apply the pending migrations, migrate is skipped when there are none"""
+        executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+        if not executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            self.stdout.write('No migrations to apply')
+            return
+
+        call_command('migrate', interactive=False, stdout=self.stdout)
@@ -0,0 +1,57 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog import BATCH_SIZE, FORMATS, Checkpoint, Progress, export_products, guess_format
+
+
+class Command(BaseCommand):
+    """Django command to export the products to a CSV or NDJSON file
+
+    With --checkpoint an interrupted export is resumed from the last batch written.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path of the file, - for the standard output')
+        parser.add_argument('--format', choices=FORMATS, help='File format, by default given by the extension')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per DB fetch')
+        parser.add_argument('--checkpoint', help='Path of the checkpoint file used to resume the export')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        file_format = options['format'] or guess_format(output)
+        if output == '-' and options['checkpoint']:
+            raise CommandError('The standard output can not be resumed, use a file with --checkpoint')
+        checkpoint = Checkpoint(options['checkpoint'])
+        state = checkpoint.load()
+
+        if output == '-':
+            stream = sys.stdout.buffer
+        elif state:
+            # Drop what was written after the last checkpoint
+            stream = open(output, 'r+b')
+            stream.truncate(state['offset'])
+            stream.seek(state['offset'])
+            self.stderr.write(f'Resuming after {state["rows"]:,} products')
+        else:
+            stream = open(output, 'wb')
+
+        rows = state.get('rows', 0)
+        progress = Progress(self.stderr.write)
+        try:
+            batches = export_products(
+                stream, file_format, options['batch_size'], after_id=state.get('last_id', 0), header=not state
+            )
+            for count, last_id in batches:
+                rows += count
+                stream.flush()
+                if checkpoint.path is not None:
+                    checkpoint.save(last_id=last_id, rows=rows, offset=stream.tell())
+                progress.update(rows)
+        finally:
+            if output != '-':
+                stream.close()
+
+        checkpoint.delete()
+        progress.update(rows, force=True)
+        self.stderr.write(self.style.SUCCESS(f'Exported {rows:,} products'))
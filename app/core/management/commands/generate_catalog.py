@@ -0,0 +1,65 @@
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from core import synthetic
+from products.catalog import Progress
+
+
+class Command(BaseCommand):
+    """Django command to fill the database with synthetic products and users, for scale tests
+
+    The same --seed generates the same data. Products are written with COPY
+    and users share one password hash, so millions of rows load in minutes.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000, help='Products to create')
+        parser.add_argument('--users', type=int, default=1000, help='Users to create')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--start', type=int, default=0,
+                            help='Number of the first product and user, to add rows to a generated catalog')
+        parser.add_argument('--brands', type=int, default=200)
+        parser.add_argument('--brand-skew', type=float, default=1.1,
+                            help='Exponent of the Zipf distribution of the brands, 0 for uniform')
+        parser.add_argument('--visits-alpha', type=float, default=1.16,
+                            help='Shape of the power law of the visits, lower gives more to the top products')
+        parser.add_argument('--sku-prefix', default='SYN')
+        parser.add_argument('--password', default='password', help='Password of every user')
+        parser.add_argument('--batch-size', type=int, default=synthetic.BATCH_SIZE, help='Rows per COPY or INSERT')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        products = islice(synthetic.generate_products(
+            options['seed'], options['brands'], options['brand_skew'], options['visits_alpha'],
+            options['start'], options['sku_prefix']
+        ), options['products'])
+        users = islice(synthetic.generate_users(options['seed'], options['start']), options['users'])
+
+        try:
+            created = self.load('products', synthetic.load_products(products, options['batch_size']))
+            created_users = self.load('users', synthetic.load_users(
+                users, options['password'], options['batch_size']
+            ))
+        except IntegrityError as error:
+            raise CommandError(
+                f'Some rows already exist, generate other ones with --start or --sku-prefix: {error}'
+            ) from error
+
+        synthetic.analyze()
+        self.stderr.write(self.style.SUCCESS(
+            f'Generated {created:,} products and {created_users:,} users in {time.monotonic() - start:.1f}s'
+        ))
+
+    def load(self, name, batches):
+        """Write the batches, reporting the progress, and return the number of rows"""
+        progress = Progress(self.stderr.write, unit=name)
+        total = 0
+        for rows in batches:
+            total += rows
+            progress.update(total)
+        if total:
+            progress.update(total, force=True)
+        return total
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import schema
+
+
+class Command(BaseCommand):
+    """Django command to write the OpenAPI schema to SCHEMA_FILE
+
+    The app loads it instead of introspecting every view, as long as it
+    was generated from the same code.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.SCHEMA_FILE, help='Schema file, SCHEMA_FILE by default')
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError('No schema file, set SCHEMA_FILE or use --output')
+        start = time.monotonic()
+        fingerprint = schema.code_fingerprint()
+        if schema.read_schema(options['output'], fingerprint) is not None:
+            self.stdout.write(f'Schema {options["output"]} is up to date')
+            return
+
+        schema.write_schema(options['output'], schema.generate_schema(), fingerprint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Schema written to {options["output"]} in {time.monotonic() - start:.2f} seconds'
+        ))
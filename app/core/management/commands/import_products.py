@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from products.catalog import BATCH_SIZE, FORMATS, Checkpoint, Progress, guess_format, import_products
+
+# Invalid records written to the output, the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+class Command(BaseCommand):
+    """Django command to create or update (by SKU) the products of a CSV or NDJSON file
+
+    CSV files need a header with the sku, name, price and brand columns.
+    With --checkpoint an interrupted import is resumed from the last batch written.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Path of the file, - for the standard input')
+        parser.add_argument('--format', choices=FORMATS, help='File format, by default given by the extension')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Products per COPY')
+        parser.add_argument('--checkpoint', help='Path of the checkpoint file used to resume the import')
+
+    def handle(self, *args, **options):
+        path = options['input']
+        file_format = options['format'] or guess_format(path)
+        checkpoint = Checkpoint(options['checkpoint'])
+        state = checkpoint.load()
+        totals = {key: state.get(key, 0) for key in ('records', 'created', 'updated', 'errors')}
+        if state:
+            self.stderr.write(f'Resuming after {totals["records"]:,} records')
+
+        stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        progress = Progress(self.stderr.write)
+        try:
+            for batch in import_products(stream, file_format, options['batch_size'], skip=totals['records']):
+                for number, message in batch['errors']:
+                    if totals['errors'] < MAX_REPORTED_ERRORS:
+                        self.stderr.write(self.style.WARNING(f'Record {number}: {message}'))
+                    totals['errors'] += 1
+                for key in ('records', 'created', 'updated'):
+                    totals[key] += batch[key]
+                checkpoint.save(**totals)
+                progress.update(totals['records'])
+        finally:
+            if path != '-':
+                stream.close()
+
+        checkpoint.delete()
+        progress.update(totals['records'], force=True)
+        self.stderr.write(self.style.SUCCESS(
+            'Imported {records:,} records: {created:,} created, {updated:,} updated, {errors:,} invalid'.format(
+                **totals
+            )
+        ))
@@ -1,23 +1,33 @@
 import time
 
-from django.db import connections
-from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.health import wait_for_database
 
 
 class Command(BaseCommand):
-    """Django command to pause execution until DB is available"""
+    """Django command to pause execution until DB is available
+
+    The DB is available once it answers a query, attempts are retried
+    with exponential backoff and jitter until the timeout.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, default=settings.DB_WAIT_TIMEOUT, help='Max seconds to wait')
 
     def handle(self, *args, **options):
         self.stdout.write('Waiting for Database...')   # Output a message to the screen
-        db_conn = None
+        start = time.monotonic()
+
+        def on_retry(attempt, error, delay):
+            self.stdout.write(f'Database unavailable ({str(error).strip()}), retrying in {delay:.2f} seconds...')
 
-        # Wait until DB is available, try every second
-        while not db_conn:
-            try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+        try:
+            attempts = wait_for_database(options['timeout'], max_delay=settings.DB_WAIT_MAX_DELAY, on_retry=on_retry)
+        except TimeoutError as error:
+            raise CommandError(str(error))
 
-        self.stdout.write(self.style.SUCCESS('Database is available'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Database is available after {attempts} attempts in {time.monotonic() - start:.2f} seconds'
+        ))
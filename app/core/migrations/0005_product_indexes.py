@@ -0,0 +1,65 @@
+import logging
+
+from django.db import DatabaseError, migrations, models, transaction
+
+logger = logging.getLogger(__name__)
+
+# Serves name__istartswith lookups, Django compares UPPER(name::text)
+NAME_PREFIX_INDEX_SQL = (
+    'CREATE INDEX IF NOT EXISTS product_name_prefix_idx '
+    'ON core_product (UPPER(name::text) text_pattern_ops)'
+)
+# Serves name__icontains (and prefix) lookups, needs the pg_trgm extension
+NAME_TRIGRAM_INDEX_SQL = (
+    'CREATE INDEX IF NOT EXISTS product_name_trgm_idx '
+    'ON core_product USING gin (UPPER(name::text) gin_trgm_ops)'
+)
+
+
+def create_name_indexes(apps, schema_editor):
+    """Create the name search indexes, the trigram index only if pg_trgm is available"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(NAME_PREFIX_INDEX_SQL)
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            logger.warning('pg_trgm is not available, the product_name_trgm_idx index was not created')
+            return
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+                cursor.execute(NAME_TRIGRAM_INDEX_SQL)
+        except DatabaseError as error:
+            # E.g. the DB user is not allowed to create the extension,
+            # substring searches will not be indexed
+            logger.warning('The product_name_trgm_idx index was not created: %s', error)
+
+
+def drop_name_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP INDEX IF EXISTS product_name_trgm_idx')
+        cursor.execute('DROP INDEX IF EXISTS product_name_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_product_visits'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['brand'], name='product_brand_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price'], name='product_price_idx'),
+        ),
+        migrations.RunPython(create_name_indexes, drop_name_indexes),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.4 on 2026-10-17 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-visits', 'id'], name='product_visits_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['brand', '-visits', 'id'], name='product_brand_visits_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.4 on 2026-10-17 18:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_product_visits_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVisitBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=6)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.product')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='productvisitbucket',
+            index=models.Index(fields=['resolution', 'bucket_start'], name='visit_bucket_start_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='productvisitbucket',
+            constraint=models.UniqueConstraint(fields=('product', 'resolution', 'bucket_start'), name='visit_bucket_unique'),
+        ),
+    ]
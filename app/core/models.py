@@ -52,6 +52,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=225)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)  # Used for conditional GET requests
 
     objects = UserManager()
 
@@ -68,6 +69,48 @@ class Product(models.Model):
     price = models.FloatField(default=0)
     brand = models.CharField(max_length=200)
     visits = models.IntegerField(default=0)
+    # Used for conditional GET requests, also updated when visits are written
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # Indexes for the product list filters, the name search indexes
+        # are created with SQL in the 0005_product_indexes migration
+        indexes = [
+            models.Index(fields=['brand'], name='product_brand_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),
+            # Top visited products, overall and per brand
+            models.Index(fields=['-visits', 'id'], name='product_visits_idx'),
+            models.Index(fields=['brand', '-visits', 'id'], name='product_brand_visits_idx'),
+        ]
 
     def __str__(self):
         return self.sku
+
+
+class ProductVisitBucket(models.Model):
+    """Anonymous visits of a product during a minute, hour or day"""
+    MINUTE = 'minute'
+    HOUR = 'hour'
+    DAY = 'day'
+    RESOLUTIONS = [(MINUTE, 'Minute'), (HOUR, 'Hour'), (DAY, 'Day')]
+
+    # No DB constraint, visits are written in batches without checking
+    # the products, and the buckets of deleted products expire
+    product = models.ForeignKey(
+        Product, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    resolution = models.CharField(max_length=6, choices=RESOLUTIONS)
+    bucket_start = models.DateTimeField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'resolution', 'bucket_start'], name='visit_bucket_unique'),
+        ]
+        indexes = [
+            # Trending products, rollups and retention
+            models.Index(fields=['resolution', 'bucket_start'], name='visit_bucket_start_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} {self.resolution} {self.bucket_start}'
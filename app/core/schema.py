@@ -0,0 +1,173 @@
+"""
+OpenAPI schema and Swagger page of the API, built once per process.
+
+Introspecting every view and serializer takes tens of ms, so the schema
+is generated on the first request (or loaded from the SCHEMA_FILE written
+by the generate_schema command) and then served from memory, already
+compressed, with an ETag. The file is only used when it was generated
+from the same code: it is tagged with a fingerprint of the source files.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import django
+import rest_framework
+from django.conf import settings
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.translation import gettext as _   # For text translations
+
+from rest_framework.renderers import JSONOpenAPIRenderer, OpenAPIRenderer
+from rest_framework.schemas.openapi import SchemaGenerator
+from rest_framework.utils.encoders import JSONEncoder
+
+from utils.compression import compress_static, negotiate_encoding
+from utils.conditional import conditional_response, make_etag
+
+logger = logging.getLogger(__name__)
+
+TITLE = _('ZeBrands Products and Users API')
+DESCRIPTION = _('This is a basic API to manage ZeBrands products and users.<br><br>'
+                'First you need to create a token for authorization with your ZeBrands '
+                'email (user@zebrands.com) and your password.<br>'
+                'Then you need to add that token to the "Authorization" header of your requests in '
+                'the form: Token {valid_token}<br><br>'
+                'Notice that there are some public endpoints that do not need authentication.')
+
+# Renderers of the schema, by the value of the ?format= parameter
+RENDERERS = {renderer.format: renderer for renderer in (OpenAPIRenderer, JSONOpenAPIRenderer)}
+DEFAULT_FORMAT = OpenAPIRenderer.format
+PAGE = 'page'
+
+# Source directories that do not change the schema
+IGNORED_DIRS = {'__pycache__', 'tests', 'migrations', 'benchmarks'}
+
+
+def code_fingerprint(root=None):
+    """Return a hash of the Python source files of the project and of the Django and DRF versions
+
+    :param root: str Directory of the sources, BASE_DIR by default
+    """
+    root = str(root or settings.BASE_DIR)
+    digest = hashlib.sha256(f'{django.__version__}:{rest_framework.VERSION}'.encode())
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = sorted(name for name in subdirectories if name not in IGNORED_DIRS)
+        for name in sorted(files):
+            if not name.endswith('.py'):
+                continue
+            path = os.path.join(directory, name)
+            digest.update(os.path.relpath(path, root).encode())
+            with open(path, 'rb') as file:
+                digest.update(hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()
+
+
+def generate_schema():
+    """Return the OpenAPI schema of every endpoint, whatever the permissions of the client"""
+    return SchemaGenerator(title=TITLE, description=DESCRIPTION).get_schema(request=None, public=True)
+
+
+def write_schema(path, schema, fingerprint):
+    """Save a schema with the fingerprint of the code it was generated from"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Written next to the file then renamed, so a running worker never reads half a file
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump({'fingerprint': fingerprint, 'schema': schema}, file, cls=JSONEncoder)
+    os.replace(temporary, path)
+
+
+def read_schema(path, fingerprint):
+    """Return the schema saved in a file, or None if there is none for this fingerprint"""
+    try:
+        with open(path) as file:
+            saved = json.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as error:
+        logger.warning('Unreadable schema file %s: %s', path, error)
+        return None
+    if saved.get('fingerprint') != fingerprint:
+        logger.warning('Schema file %s was generated from other code, generating the schema again', path)
+        return None
+    return saved['schema']
+
+
+class Document:
+    """Bytes of a document with their compressed versions, served with an ETag and Cache-Control"""
+
+    def __init__(self, content, content_type, version):
+        """
+        :param content: bytes
+        :param content_type: str
+        :param version: str Changes whenever the content changes
+        """
+        self.content_type = content_type
+        self.variants = {None: content, **compress_static(content)}
+        # Each encoding has its own bytes, so its own strong ETag
+        self.etags = {coding: make_etag(version, coding) for coding in self.variants}
+
+    def response(self, request, max_age):
+        coding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding not in self.variants:
+            coding = None
+
+        def build():
+            response = HttpResponse(self.variants[coding], content_type=self.content_type)
+            if coding is not None:
+                response['Content-Encoding'] = coding
+            return response
+
+        response = conditional_response(request, self.etags[coding], None, build)
+        patch_vary_headers(response, ('Accept-Encoding', ))
+        patch_cache_control(response, public=True, max_age=max_age)
+        return response
+
+
+class DocumentationCache:
+    """The schema in each format and the Swagger page, built once per process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents = None
+
+    def get(self, name):
+        """Return the Document of a schema format or of the Swagger PAGE"""
+        documents = self._documents
+        if documents is None:
+            with self._lock:
+                if self._documents is None:
+                    self._documents = self._build()
+                documents = self._documents
+        return documents[name]
+
+    def clear(self):
+        with self._lock:
+            self._documents = None
+
+    def _build(self):
+        fingerprint = code_fingerprint()
+        schema = read_schema(settings.SCHEMA_FILE, fingerprint) if settings.SCHEMA_FILE else None
+        if schema is None:
+            schema = generate_schema()
+
+        documents = {
+            name: Document(renderer().render(schema), renderer.media_type, f'{fingerprint}:{name}')
+            for name, renderer in RENDERERS.items()
+        }
+        page = render_to_string('documentation.html', {
+            'schema_url': 'openapi-schema', 'swagger_ui_url': settings.SWAGGER_UI_URL
+        })
+        documents[PAGE] = Document(
+            page.encode(), 'text/html; charset=utf-8', f'{fingerprint}:{PAGE}:{settings.SWAGGER_UI_URL}'
+        )
+        return documents
+
+
+documentation_cache = DocumentationCache()
@@ -0,0 +1,160 @@
+"""
+Synthetic products and users used to test the API at production scale,
+generated by the generate_catalog command.
+
+The data only depends on the seed and the row numbers: brands follow a
+Zipf distribution, prices a log-normal distribution per category and
+visits a power law, like a real catalog where a few brands and products
+get most of the traffic.
+"""
+import csv
+import io
+import math
+import random
+from bisect import bisect
+from itertools import accumulate, count, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Product
+
+# Rows per COPY of the products and per INSERT of the users
+BATCH_SIZE = 50000
+
+# Rows generated by each random generator, a range of rows is generated
+# from the block it starts in instead of from the first row
+BLOCK_SIZE = 1000
+
+# (name, SKU code, weight, median price, price spread) of each category
+CATEGORIES = (
+    ('Colchón', 'MAT', 15, 9000, 0.45),
+    ('Base', 'BAS', 10, 5000, 0.40),
+    ('Almohada', 'PIL', 25, 700, 0.35),
+    ('Sábanas', 'SHE', 20, 1100, 0.30),
+    ('Edredón', 'DUV', 10, 1800, 0.35),
+    ('Protector', 'PRO', 15, 600, 0.30),
+    ('Cabecera', 'HEA', 5, 4000, 0.40),
+)
+CATEGORY_WEIGHTS = list(accumulate(category[2] for category in CATEGORIES))
+LINES = ('Original', 'Híbrido', 'Esencial', 'Premium', 'Cloud', 'Fresh', 'Soft', 'Firme', 'Bamboo', 'Plus')
+SIZES = ('Individual', 'Matrimonial', 'Queen', 'King')
+
+BRAND_PREFIXES = ('Lu', 'Ze', 'Ma', 'No', 'Ti', 'Su', 'Ka', 'Re', 'Do', 'Vi', 'Pa', 'Be', 'Sa', 'Mo', 'Fi', 'Cu')
+BRAND_SUFFIXES = ('una', 'nus', 'ppa', 'oz', 'dy', 'eño', 'ra', 'lux', 'vo', 'ma', 'xa', 'lo', 'rem', 'sta')
+
+FIRST_NAMES = ('Ana', 'Luis', 'Maria', 'Jose', 'Sofia', 'Diego', 'Lucia', 'Pablo', 'Elena', 'Jorge', 'Carmen',
+               'Pedro', 'Laura', 'Miguel', 'Paula', 'Andres', 'Valeria', 'Carlos', 'Daniela', 'Javier')
+LAST_NAMES = ('Garcia', 'Hernandez', 'Lopez', 'Martinez', 'Gonzalez', 'Rodriguez', 'Perez', 'Sanchez', 'Ramirez',
+              'Torres', 'Flores', 'Rivera', 'Gomez', 'Diaz', 'Cruz', 'Morales', 'Reyes', 'Ortiz', 'Castillo')
+
+MAX_VISITS = 2 ** 31 - 1  # integer column
+
+PRODUCT_COLUMNS = ('sku', 'name', 'price', 'brand', 'visits', 'updated_at')
+
+
+def brand_names(total, seed):
+    """Return `total` distinct brand names, shuffled with the seed"""
+    names = [prefix + suffix for prefix in BRAND_PREFIXES for suffix in BRAND_SUFFIXES]
+    random.Random(seed).shuffle(names)
+    # Numbered names once the syllables are exhausted
+    return [names[index % len(names)] + (f' {index // len(names) + 1}' if index >= len(names) else '')
+            for index in range(total)]
+
+
+def _blocks(seed, start, kind):
+    """Yield endless (number, generator) tuples from the row `start`, with one generator per block"""
+    for block in count(start // BLOCK_SIZE):
+        generator = random.Random(f'{seed}-{kind}-{block}')
+        for number in range(block * BLOCK_SIZE, (block + 1) * BLOCK_SIZE):
+            yield number, generator
+
+
+def generate_products(seed, brands=200, brand_skew=1.1, visits_alpha=1.16, start=0, prefix='SYN'):
+    """Yield endless (sku, name, price, brand, visits) tuples of synthetic products
+
+    :param seed: int Random seed, the same seed yields the same products
+    :param brands: int Number of brands
+    :param brand_skew: float Exponent of the Zipf distribution of the brands, 0 for uniform
+    :param visits_alpha: float Shape of the Pareto distribution of the visits, lower is more skewed
+    :param start: int Number of the first product, the products before it are skipped
+    :param prefix: str Prefix of the SKUs
+    """
+    names = brand_names(brands, seed)
+    brand_weights = list(accumulate(1 / rank ** brand_skew for rank in range(1, brands + 1)))
+    for number, generator in _blocks(seed, start, 'product'):
+        name, code, _, median, spread = CATEGORIES[
+            bisect(CATEGORY_WEIGHTS, generator.random() * CATEGORY_WEIGHTS[-1])
+        ]
+        brand = names[bisect(brand_weights, generator.random() * brand_weights[-1])]
+        # Prices end in .99, like the ones of a store
+        price = max(round(generator.lognormvariate(math.log(median), spread), -1), 10) - 0.01
+        visits = min(int(generator.paretovariate(visits_alpha)) - 1, MAX_VISITS)
+        line, size = generator.choice(LINES), generator.choice(SIZES)
+        # The skipped rows of the block are drawn too, so every row is the same whatever the start
+        if number < start:
+            continue
+        yield (
+            f'{prefix}-{code}-{number:09d}',
+            f'{name} {brand} {line} {size}',
+            price,
+            brand,
+            visits,
+        )
+
+
+def generate_users(seed, start=0):
+    """Yield endless (email, name) tuples of synthetic users"""
+    for number, generator in _blocks(seed, start, 'user'):
+        first, last = generator.choice(FIRST_NAMES), generator.choice(LAST_NAMES)
+        if number >= start:
+            yield f'{first}.{last}.{number}@zebrands.com'.lower(), f'{first} {last}'
+
+
+def load_products(products, batch_size=BATCH_SIZE):
+    """Write the product tuples with COPY, each batch in its own transaction
+
+    :return: Generator of the number of products written by each batch
+    """
+    table = Product._meta.db_table
+    updated_at = timezone.now().isoformat()
+    products = iter(products)
+    while True:
+        batch = list(islice(products, batch_size))
+        if not batch:
+            return
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows((*product, updated_at) for product in batch)
+        buffer.seek(0)
+        # copy_expert() is not wrapped by Django, its errors are converted to the Django ones here
+        with transaction.atomic(), connection.cursor() as cursor, connection.wrap_database_errors:
+            cursor.copy_expert(f'COPY {table} ({", ".join(PRODUCT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)', buffer)
+        yield len(batch)
+
+
+def load_users(users, password, batch_size=BATCH_SIZE):
+    """Create the (email, name) users, all with the same password
+
+    The password is hashed once, hashing it for each user would take a
+    few hundred ms per user.
+
+    :return: Generator of the number of users created by each batch
+    """
+    model = get_user_model()
+    password = make_password(password)
+    users = iter(users)
+    while True:
+        batch = list(islice(users, batch_size))
+        if not batch:
+            return
+        model.objects.bulk_create([model(email=email, name=name, password=password) for email, name in batch])
+        yield len(batch)
+
+
+def analyze():
+    """Update the planner statistics of the tables after a bulk load"""
+    with connection.cursor() as cursor:
+        for model in (Product, get_user_model()):
+            cursor.execute(f'ANALYZE {model._meta.db_table}')
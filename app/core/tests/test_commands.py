@@ -1,35 +1,85 @@
+import csv
+import io
+import json
 import os
+import tempfile
+from collections import Counter
+from itertools import islice
 
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import synthetic
+from core.health import backoff_delays
+from core.models import Product
+from products.cache import product_cache
+from products.catalog import IMPORT_FIELDS, Checkpoint
+from products.leaderboard import top_products
+from products.renderers import FIELDS
+from products.visits import visit_buffer
 
 
 class CommandTRests(TestCase):
 
     def test_wait_for_db_ready(self):
-        """Test waiting for DB when DB is available"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as connection_handler:
-            connection_handler.return_value = True
-            call_command('wait_for_db')
+        """Test waiting for DB when DB is available, a query is run"""
+        with patch('core.health.connections') as connections:
+            call_command('wait_for_db', stdout=io.StringIO())
 
-            # Check if our call command is called only once
-            self.assertEqual(connection_handler.call_count, 1)
+            cursor = connections['default'].cursor.return_value.__enter__.return_value
+            cursor.execute.assert_called_once_with('SELECT 1')
 
     # Mocking time.sleep in order to skip waiting time
     @patch('time.sleep', return_value=True)
     def test_wait_for_db_not_ready(self, time_sleep):
-        """Test waiting for DB"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as connection_handler:
-            # Raise OperationalError 5 times and the sixth return True
-            connection_handler.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
+        """Test waiting for DB, the attempts are retried with a growing delay"""
+        with patch('core.health.check_database') as check_database:
+            # Raise OperationalError 5 times and the sixth succeed
+            check_database.side_effect = [OperationalError('refused')] * 5 + [None]
+            call_command('wait_for_db', stdout=io.StringIO())
+
+            # Check if the DB is checked 6 times
+            self.assertEqual(check_database.call_count, 6)
+            delays = [call.args[0] for call in time_sleep.call_args_list]
+            self.assertEqual(len(delays), 5)
+            self.assertLess(delays[0], delays[-1])
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, time_sleep):
+        """Test that the command fails when the DB is not available within the timeout"""
+        with patch('core.health.check_database', side_effect=OperationalError('refused')):
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0, stdout=io.StringIO())
+
+    def test_backoff_delays(self):
+        """Test that the backoff delays double up to the max, with jitter"""
+        delays = list(islice(backoff_delays(initial=1, maximum=4), 5))
+
+        for delay, step in zip(delays, [1, 2, 4, 4, 4]):
+            self.assertTrue(step / 2 <= delay <= step)
+
+    def test_bootstrap_times_the_startup_phases(self):
+        """Test that bootstrap waits for the DB, skips the applied migrations, creates the user and the schema"""
+        stdout = io.StringIO()
 
-            # Check if our call command is called 6 times
-            self.assertEqual(connection_handler.call_count, 6)
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(SCHEMA_FILE=os.path.join(directory, 'openapi.json')), \
+                patch('core.management.commands.bootstrap.call_command', wraps=call_command) as command:
+            call_command('bootstrap', stdout=stdout)
+            self.assertTrue(os.path.exists(os.path.join(directory, 'openapi.json')))
+
+        self.assertEqual(
+            [call.args[0] for call in command.call_args_list], ['wait_for_db', 'create_user', 'generate_schema']
+        )
+        for phase in ('wait_for_db', 'migrate', 'create_user', 'generate_schema'):
+            self.assertIn(f'Startup phase {phase} took', stdout.getvalue())
+        self.assertTrue(get_user_model().objects.filter(email=os.getenv('ADMN_USER')).exists())
 
     def test_create_default_user_success(self):
         """Test that admin@zebrands.com user is created"""
@@ -37,3 +87,191 @@ class CommandTRests(TestCase):
 
         # check that the admin user exists
         self.assertTrue(get_user_model().objects.filter(email=os.getenv('ADMN_USER')).exists())
+
+
+class CatalogCommandsTests(TestCase):
+    """Test the export_products and import_products commands"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        product_cache.clear()
+        top_products.clear()
+        self.addCleanup(product_cache.clear)
+        self.addCleanup(top_products.clear)
+        self.addCleanup(visit_buffer.clear)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def create_products(self, count):
+        return Product.objects.bulk_create([
+            Product(sku=f'sku_{index:04d}', name=f'Name, "{index}"', price=10.5 + index, brand='Luuna', visits=index)
+            for index in range(count)
+        ])
+
+    def call(self, name, *args, **options):
+        call_command(name, *args, stderr=io.StringIO(), **options)
+
+    def test_export_csv(self):
+        """Test that every product is exported to CSV in batches, ordered by ID"""
+        self.create_products(5)
+
+        self.call('export_products', self.path('products.csv'), batch_size=2)
+
+        with open(self.path('products.csv'), newline='') as file:
+            rows = list(csv.DictReader(file))
+        expected = Product.objects.order_by('id').values(*FIELDS)
+        self.assertEqual(rows, [{name: str(value) for name, value in row.items()} for row in expected])
+
+    def test_export_ndjson(self):
+        """Test that NDJSON exports have one product per line"""
+        self.create_products(3)
+
+        self.call('export_products', self.path('products.ndjson'))
+
+        with open(self.path('products.ndjson')) as file:
+            rows = [json.loads(line) for line in file]
+        self.assertEqual(rows, list(Product.objects.order_by('id').values(*FIELDS)))
+
+    def test_export_resumes_from_checkpoint(self):
+        """Test that an export drops what was written after the checkpoint and continues from it"""
+        products = self.create_products(5)
+        self.call('export_products', self.path('full.csv'))
+        with open(self.path('full.csv'), 'rb') as file:
+            full = file.read()
+        # Interrupted after the first two products, while writing the third one
+        offset = len(b''.join(full.splitlines(keepends=True)[:3]))
+        with open(self.path('partial.csv'), 'wb') as file:
+            file.write(full[:offset + 5])
+        Checkpoint(self.path('checkpoint')).save(last_id=products[1].id, rows=2, offset=offset)
+
+        self.call('export_products', self.path('partial.csv'), checkpoint=self.path('checkpoint'))
+
+        with open(self.path('partial.csv'), 'rb') as file:
+            self.assertEqual(file.read(), full)
+        self.assertFalse(os.path.exists(self.path('checkpoint')))
+
+    def test_import_creates_and_updates_by_sku(self):
+        """Test that new SKUs are created, changed ones updated and invalid records skipped"""
+        unchanged, changed = Product.objects.bulk_create([
+            Product(sku='sku_0001', name='Same', price=1.0, brand='Luuna', visits=7),
+            Product(sku='sku_0002', name='Old', price=1.0, brand='Luuna', visits=3),
+        ])
+        with open(self.path('products.csv'), 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['sku', 'name', 'price', 'brand'])
+            writer.writerows([
+                ['sku_0001', 'Same', '1.0', 'Luuna'],
+                ['sku_0002', 'New', '20', 'Nooz'],
+                ['sku_0003', 'Created, "quoted"', '', 'Nooz'],
+                ['', 'No SKU', '1', 'Nooz'],
+                ['sku_0004', 'Bad price', 'abc', 'Nooz'],
+            ])
+        stderr = io.StringIO()
+
+        call_command('import_products', self.path('products.csv'), batch_size=2, stderr=stderr)
+
+        self.assertIn('1 created, 1 updated, 2 invalid', stderr.getvalue())
+        self.assertIn('Record 4: sku is required', stderr.getvalue())
+        changed.refresh_from_db()
+        self.assertEqual((changed.name, changed.price, changed.brand, changed.visits), ('New', 20.0, 'Nooz', 3))
+        self.assertEqual(Product.objects.get(sku='sku_0001').updated_at, unchanged.updated_at)
+        self.assertEqual(Product.objects.get(sku='sku_0003').name, 'Created, "quoted"')
+        self.assertFalse(Product.objects.filter(sku='sku_0004').exists())
+
+    def test_import_invalidates_the_cached_products(self):
+        """Test that a cached product and the top products show the imported update"""
+        product = Product.objects.create(sku='sku_0001', name='Old', price=1.0, brand='Luuna', visits=3)
+        url = reverse('products:product_readonly', args=[product.id])
+        self.assertEqual(self.client.get(url).json()['name'], 'Old')
+        self.assertEqual(top_products.top(1)[0]['name'], 'Old')
+        with open(self.path('products.ndjson'), 'w') as file:
+            file.write('{"sku": "sku_0001", "name": "New", "price": 2, "brand": "Luuna"}\n')
+
+        self.call('import_products', self.path('products.ndjson'))
+
+        self.assertEqual(self.client.get(url).json()['name'], 'New')
+        self.assertEqual(top_products.top(1)[0]['name'], 'New')
+
+    def test_import_ndjson_last_duplicate_wins(self):
+        """Test that NDJSON is imported and the last record of a duplicated SKU is kept"""
+        with open(self.path('products.ndjson'), 'w') as file:
+            file.write('{"sku": "sku_0001", "name": "First", "price": 1, "brand": "Luuna"}\n')
+            file.write('{"sku": "sku_0001", "name": "Last", "price": 2, "brand": "Luuna"}\n')
+            file.write('not json\n')
+
+        self.call('import_products', self.path('products.ndjson'))
+
+        self.assertEqual(list(Product.objects.values_list('sku', 'name', 'price')), [('sku_0001', 'Last', 2.0)])
+
+    def test_import_resumes_from_checkpoint(self):
+        """Test that the records before the checkpoint are not imported again"""
+        with open(self.path('products.ndjson'), 'w') as file:
+            for index in range(4):
+                file.write(json.dumps({'sku': f'sku_{index}', 'name': 'Name', 'price': 1, 'brand': 'Luuna'}) + '\n')
+        Checkpoint(self.path('checkpoint')).save(records=2, created=2, updated=0, errors=0)
+
+        self.call('import_products', self.path('products.ndjson'), checkpoint=self.path('checkpoint'))
+
+        self.assertEqual(list(Product.objects.order_by('sku').values_list('sku', flat=True)), ['sku_2', 'sku_3'])
+        self.assertFalse(os.path.exists(self.path('checkpoint')))
+
+    def test_export_import_round_trip(self):
+        """Test that an exported catalog imports back to the same products"""
+        self.create_products(5)
+        self.call('export_products', self.path('products.csv'), batch_size=2)
+        expected = list(Product.objects.order_by('sku').values_list(*IMPORT_FIELDS))
+        Product.objects.all().delete()
+
+        self.call('import_products', self.path('products.csv'), batch_size=2)
+
+        self.assertEqual(list(Product.objects.order_by('sku').values_list(*IMPORT_FIELDS)), expected)
+
+
+class GenerateCatalogCommandTests(TestCase):
+    """Test the generate_catalog command"""
+
+    def call(self, **options):
+        call_command('generate_catalog', stderr=io.StringIO(), **options)
+
+    def test_generate_catalog(self):
+        """Test that the products and users are created, users with the given password"""
+        self.call(products=250, users=20, batch_size=100, password='secret123')
+
+        self.assertEqual(Product.objects.count(), 250)
+        users = get_user_model().objects.all()
+        self.assertEqual(len(users), 20)
+        self.assertEqual(len({user.password for user in users}), 1)
+        self.assertTrue(users[0].check_password('secret123'))
+        self.assertTrue(all(user.email.endswith('@zebrands.com') for user in users))
+
+    def test_same_seed_same_data(self):
+        """Test that the data only depends on the seed, whatever the batches"""
+        self.call(products=100, users=0, seed=7, batch_size=30)
+        first = list(Product.objects.order_by('sku').values_list('sku', 'name', 'price', 'brand', 'visits'))
+        Product.objects.all().delete()
+
+        self.call(products=60, users=0, seed=7)
+        self.call(products=40, users=0, seed=7, start=60)
+
+        self.assertEqual(
+            list(Product.objects.order_by('sku').values_list('sku', 'name', 'price', 'brand', 'visits')), first
+        )
+
+    def test_skewed_distributions(self):
+        """Test that a few brands and products get most of the catalog and visits"""
+        products = list(islice(synthetic.generate_products(seed=1, brands=50), 5000))
+
+        brands = Counter(product[3] for product in products)
+        self.assertGreater(brands.most_common(1)[0][1], 5 * len(products) / 50)
+        visits = sorted((product[4] for product in products), reverse=True)
+        self.assertGreater(sum(visits[:len(visits) // 10]), sum(visits) / 2)
+        self.assertTrue(all(str(product[2]).endswith('.99') for product in products))
+
+    def test_existing_rows(self):
+        """Test that generating rows that already exist fails with a hint"""
+        self.call(products=10, users=0)
+
+        with self.assertRaisesMessage(CommandError, '--start'):
+            self.call(products=10, users=0)
@@ -0,0 +1,42 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from core.db import check_connections
+
+
+@override_settings(DB_CONN_HEALTH_CHECK_INTERVAL=10)
+class ConnectionHealthCheckTests(SimpleTestCase):
+    """Test the health checks of the persistent DB connections"""
+
+    def check(self, connection, now):
+        with mock.patch('core.db.connections') as connections, \
+                mock.patch('core.db.time.monotonic', return_value=now):
+            connections.all.return_value = [connection]
+            check_connections()
+
+    def test_idle_unusable_connection_is_closed(self):
+        """Test that a broken connection idle for too long is closed"""
+        connection = mock.Mock(last_health_check=100)
+        connection.is_usable.return_value = False
+
+        self.check(connection, now=111)
+
+        connection.close.assert_called_once()
+
+    def test_recently_used_connection_is_not_checked(self):
+        """Test that connections used recently are not checked"""
+        connection = mock.Mock(last_health_check=100)
+
+        self.check(connection, now=105)
+
+        connection.is_usable.assert_not_called()
+        self.assertEqual(connection.last_health_check, 105)
+
+    def test_closed_connection_is_skipped(self):
+        """Test that there is nothing to check without an open connection"""
+        connection = mock.Mock(connection=None)
+
+        self.check(connection, now=200)
+
+        connection.is_usable.assert_not_called()
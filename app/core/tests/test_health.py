@@ -0,0 +1,53 @@
+from unittest import mock
+
+from django.db.utils import OperationalError
+from django.test import TestCase
+from django.urls import reverse
+
+from core.health import ReadinessProbe, readiness
+
+
+class HealthEndpointsTests(TestCase):
+    """Test the liveness and readiness probes"""
+
+    def setUp(self):
+        readiness.clear()
+
+    def tearDown(self):
+        readiness.clear()
+
+    def test_healthz_does_not_query_the_db(self):
+        """Test that the liveness probe answers without any query"""
+        with self.assertNumQueries(0):
+            result = self.client.get(reverse('healthz'))
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.json(), {'status': 'ok'})
+
+    def test_readyz_checks_the_db(self):
+        """Test that the readiness probe runs a query, reused for the next probes"""
+        with self.assertNumQueries(1):
+            result = self.client.get(reverse('readyz'))
+            self.client.get(reverse('readyz'))
+
+        self.assertEqual(result.status_code, 200)
+        self.assertIn('no-cache', result['Cache-Control'])
+
+    def test_readyz_db_unavailable(self):
+        """Test that the readiness probe fails when the DB does not answer"""
+        with mock.patch('core.health.check_database', side_effect=OperationalError):
+            result = self.client.get(reverse('readyz'))
+
+        self.assertEqual(result.status_code, 503)
+        self.assertEqual(result.json(), {'status': 'unavailable'})
+
+    def test_probe_checks_again_after_ttl(self):
+        """Test that a failed check is retried once its result is stale"""
+        probe = ReadinessProbe(ttl=10)
+        with mock.patch('core.health.check_database', side_effect=[OperationalError, None]) as check_database, \
+                mock.patch('core.health.time.monotonic') as monotonic:
+            for now, ready in ((100, False), (105, False), (111, True)):
+                monotonic.return_value = now
+                self.assertEqual(probe.is_ready(), ready)
+
+        self.assertEqual(check_database.call_count, 2)
@@ -0,0 +1,114 @@
+import io
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import schema
+
+SCHEMA_URL = reverse('openapi-schema')
+
+
+class SchemaTests(TestCase):
+    """Test the OpenAPI schema and the Swagger page"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.schema_file = os.path.join(self.directory.name, 'openapi.json')
+        self.settings = override_settings(SCHEMA_FILE=self.schema_file)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        schema.documentation_cache.clear()
+        self.addCleanup(schema.documentation_cache.clear)
+
+    def test_schema_generated_once(self):
+        """Test that the schema of every endpoint is generated on the first request only"""
+        with patch('core.schema.generate_schema', wraps=schema.generate_schema) as generate:
+            first = self.client.get(SCHEMA_URL)
+            second = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['Content-Type'], 'application/vnd.oai.openapi')
+        self.assertEqual(first['Cache-Control'], 'public, max-age=300')
+        # The endpoints that need authentication are documented for everyone
+        self.assertIn(b'/api/products/manage/{product_id}/:', first.content)
+
+    def test_json_format(self):
+        """Test that the JSON schema is returned with ?format=openapi-json or the Accept header"""
+        by_param = self.client.get(SCHEMA_URL, {'format': 'openapi-json'})
+        by_accept = self.client.get(SCHEMA_URL, HTTP_ACCEPT='application/vnd.oai.openapi+json')
+
+        self.assertEqual(by_param['Content-Type'], 'application/vnd.oai.openapi+json')
+        self.assertEqual(by_param.content, by_accept.content)
+        # The format of a URL without ?format= depends on the Accept header
+        self.assertIn('Accept', [value.strip() for value in by_accept['Vary'].split(',')])
+        self.assertNotIn('Accept', [value.strip() for value in by_param.get('Vary', '').split(',')])
+        self.assertEqual(json.loads(by_param.content)['info']['title'], schema.TITLE)
+        self.assertEqual(self.client.get(SCHEMA_URL, {'format': 'xml'}).status_code, 404)
+
+    def test_compressed_and_not_modified(self):
+        """Test that the schema is sent compressed, and 304 is returned for a current ETag"""
+        identity = self.client.get(SCHEMA_URL)
+        compressed = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertLess(len(compressed.content), len(identity.content))
+        self.assertNotEqual(compressed['ETag'], identity['ETag'])
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+
+        result = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=compressed['ETag'])
+        self.assertEqual(result.status_code, 304)
+        self.assertEqual(result.content, b'')
+
+    def test_schema_file(self):
+        """Test that the schema written by generate_schema is served without introspecting the views"""
+        generated = self.client.get(SCHEMA_URL).content
+        schema.documentation_cache.clear()
+        call_command('generate_schema', stdout=io.StringIO())
+
+        with patch('core.schema.generate_schema') as generate:
+            result = self.client.get(SCHEMA_URL)
+
+        generate.assert_not_called()
+        self.assertEqual(result.content, generated)
+
+    def test_stale_schema_file(self):
+        """Test that a schema file generated from other code is ignored"""
+        schema.write_schema(self.schema_file, {'openapi': '3.0.2', 'paths': {}}, 'other code')
+
+        with self.assertLogs('core.schema', 'WARNING'):
+            result = self.client.get(SCHEMA_URL)
+
+        self.assertIn(b'/api/products/', result.content)
+
+    def test_fingerprint_changes_with_the_code(self):
+        """Test that the fingerprint changes when a source file changes, but not with the tests"""
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, 'tests'))
+            with open(os.path.join(root, 'views.py'), 'w') as file:
+                file.write('VERSION = 1\n')
+            fingerprint = schema.code_fingerprint(root)
+            with open(os.path.join(root, 'tests', 'test_views.py'), 'w') as file:
+                file.write('VERSION = 2\n')
+            self.assertEqual(schema.code_fingerprint(root), fingerprint)
+
+            with open(os.path.join(root, 'views.py'), 'w') as file:
+                file.write('VERSION = 2\n')
+            self.assertNotEqual(schema.code_fingerprint(root), fingerprint)
+
+    @override_settings(SWAGGER_UI_URL='https://cdn.zebrands.com/swagger-ui-dist@3.52.5')
+    def test_swagger_page(self):
+        """Test that the Swagger page loads the pinned assets and the schema, with an ETag"""
+        result = self.client.get(reverse('swagger-ui'))
+
+        self.assertContains(result, 'https://cdn.zebrands.com/swagger-ui-dist@3.52.5/swagger-ui-bundle.js')
+        self.assertContains(result, f'url: "{SCHEMA_URL}"')
+        self.assertEqual(
+            self.client.get(reverse('swagger-ui'), HTTP_IF_NONE_MATCH=result['ETag']).status_code, 304
+        )
@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+
+from rest_framework import authentication, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import schema
+from core.health import readiness
+from user.authentication import CachedTokenAuthentication
+from utils import profiling
+from utils.metrics import registry
+
+# Clients allowed to read /metrics when METRICS_TOKEN is not set
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+
+@never_cache
+@require_safe
+def healthz(request):
+    """Liveness probe, the process answers requests, no dependency is checked"""
+    return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+@require_safe
+def readyz(request):
+    """Readiness probe, the database answers queries"""
+    if readiness.is_ready():
+        return JsonResponse({'status': 'ok'})
+    return JsonResponse({'status': 'unavailable'}, status=503)
+
+
+@never_cache
+@require_safe
+def metrics(request):
+    """Prometheus metrics of every worker process (or of this one without METRICS_DIR)
+
+    Protected by METRICS_TOKEN, only served to local clients when it is not set.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        if not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+            return HttpResponse(status=401)
+    elif request.META.get('REMOTE_ADDR') not in LOCAL_ADDRESSES:
+        return HttpResponse(status=403)
+    return HttpResponse(registry.render(settings.METRICS_DIR), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@require_safe
+def openapi_schema(request):
+    """OpenAPI schema of the API, YAML by default, JSON with ?format=openapi-json or an Accept header"""
+    name = request.GET.get('format')
+    negotiated = name is None
+    if negotiated:
+        accept = request.META.get('HTTP_ACCEPT', '')
+        json_types = (schema.JSONOpenAPIRenderer.media_type, 'application/json')
+        name = schema.JSONOpenAPIRenderer.format if any(media in accept for media in json_types) \
+            else schema.DEFAULT_FORMAT
+    if name not in schema.RENDERERS:
+        raise Http404
+    response = schema.documentation_cache.get(name).response(request, settings.SCHEMA_MAX_AGE)
+    if negotiated:
+        # Shared caches must not send the format negotiated for one client to the others
+        patch_vary_headers(response, ('Accept', ))
+    return response
+
+
+@require_safe
+def documentation(request):
+    """Swagger page of the API"""
+    return schema.documentation_cache.get(schema.PAGE).response(request, settings.SCHEMA_MAX_AGE)
+
+
+class ProfileListView(APIView):
+    """List the captured request profiles, the slowest requests first (admins only)"""
+    authentication_classes = (CachedTokenAuthentication, authentication.SessionAuthentication)
+    permission_classes = (permissions.IsAdminUser, )
+
+    def get(self, request):
+        try:
+            limit = max(1, int(request.query_params.get('limit', 50)))
+        except ValueError:
+            limit = 50
+        return Response({'profiles': profiling.get_store().list(limit)})
+
+
+class ProfileFileView(APIView):
+    """Download a captured profile file (admins only)"""
+    authentication_classes = (CachedTokenAuthentication, authentication.SessionAuthentication)
+    permission_classes = (permissions.IsAdminUser, )
+
+    def get(self, request, name):
+        path = profiling.get_store().path(name)
+        if path is None:
+            raise Http404
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
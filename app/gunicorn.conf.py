@@ -0,0 +1,62 @@
+"""
+Gunicorn configuration for the production serving mode, every value
+can be overridden with environment variables.
+
+WSGI (threaded workers):
+    gunicorn -c gunicorn.conf.py app.wsgi
+ASGI (event loop workers):
+    WEB_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py app.asgi
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:8000')
+
+# Worker processes, by default 2 per CPU + 1
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+
+# Threads per worker. Each thread keeps its own persistent DB connection,
+# so this is the size of the DB connection pool of each worker.
+# Keep WEB_CONCURRENCY * WEB_THREADS below the Postgres max_connections.
+threads = int(os.environ.get('WEB_THREADS', 4))
+
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+
+# Recycle workers after some requests to bound memory growth
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 1000))
+
+# The app is loaded in each worker, the visits flusher and notification
+# threads must not be started before the fork
+preload_app = False
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('WEB_LOG_LEVEL', 'info')
+
+# Each worker writes its request metrics to METRICS_DIR, see utils/metrics.py
+metrics_dir = os.environ.get('METRICS_DIR')
+
+
+def on_starting(server):
+    if metrics_dir:
+        # Imported here, the app directory is added to the path after this file is read
+        from utils.metrics import clear_directory
+        clear_directory(metrics_dir)
+
+
+def worker_exit(server, worker):
+    # Runs in the worker, its last values are written before it exits
+    if metrics_dir:
+        from utils.metrics import registry
+        registry.export(metrics_dir)
+
+
+def child_exit(server, worker):
+    # The counters of a recycled worker are kept, so they never go down
+    if metrics_dir:
+        from utils.metrics import archive_process
+        archive_process(metrics_dir, worker.pid)
@@ -0,0 +1,210 @@
+"""
+Time bucketed product visits.
+
+Each flush of the visit buffer adds its visits to per-minute buckets
+with batched ``INSERT ... ON CONFLICT DO UPDATE`` statements. The
+compact_visits command, run on a schedule, rolls the minutes up into
+hours and the hours up into days, then deletes the buckets older than
+the retention of their resolution. Each rollup starts a few buckets
+before the last one written by the previous one, so it only reads the
+recent buckets.
+
+Windowed counts add, for each part of the window, the finest buckets
+that are still kept: minutes for the recent hours, then hours, then days.
+"""
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from core.models import Product, ProductVisitBucket
+from products.renderers import product_values
+from products.visits import visit_buffer
+
+MINUTE = ProductVisitBucket.MINUTE
+HOUR = ProductVisitBucket.HOUR
+DAY = ProductVisitBucket.DAY
+
+BUCKET_LENGTHS = {MINUTE: timedelta(minutes=1), HOUR: timedelta(hours=1), DAY: timedelta(days=1)}
+
+# Max buckets written by a single INSERT statement
+INSERT_BATCH_SIZE = 500
+
+# Hours and days already rolled up that each rollup computes again, to add
+# the visits committed or written by late clocks after they were rolled up
+ROLLUP_OVERLAP = 2
+
+# Windows of the query endpoints, e.g. 30m, 1h or 7d
+WINDOW_RE = re.compile(r'^(\d+)([mhd])$')
+WINDOW_UNITS = {'m': MINUTE, 'h': HOUR, 'd': DAY}
+
+TABLE = ProductVisitBucket._meta.db_table
+
+UPSERT_SQL = f"""
+INSERT INTO {TABLE} (product_id, resolution, bucket_start, count) VALUES {{values}}
+ON CONFLICT (product_id, resolution, bucket_start) DO UPDATE SET count = {TABLE}.count + EXCLUDED.count
+"""
+
+ROLLUP_SQL = f"""
+INSERT INTO {TABLE} (product_id, resolution, bucket_start, count)
+SELECT product_id, %s, date_trunc(%s, bucket_start), SUM(count)
+FROM {TABLE}
+WHERE resolution = %s AND bucket_start >= %s AND bucket_start < %s
+GROUP BY 1, 3
+ON CONFLICT (product_id, resolution, bucket_start) DO UPDATE SET count = EXCLUDED.count
+"""
+
+
+def retention():
+    """Return how long the buckets of each resolution are kept"""
+    return {
+        MINUTE: timedelta(hours=settings.PRODUCT_VISITS_MINUTE_RETENTION),
+        HOUR: timedelta(days=settings.PRODUCT_VISITS_HOUR_RETENTION),
+        DAY: timedelta(days=settings.PRODUCT_VISITS_DAY_RETENTION),
+    }
+
+
+def truncate(moment, resolution):
+    """Return the start of the bucket that contains a UTC datetime"""
+    moment = moment.replace(second=0, microsecond=0)
+    if resolution in (HOUR, DAY):
+        moment = moment.replace(minute=0)
+    if resolution == DAY:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def ceil(moment, resolution):
+    """Return the start of the first bucket that begins at or after a UTC datetime"""
+    start = truncate(moment, resolution)
+    return start if start == moment else start + BUCKET_LENGTHS[resolution]
+
+
+def parse_window(value):
+    """Return the timedelta of a window like 30m, 1h or 7d
+
+    :raise ValueError: If the window is invalid or longer than the day retention
+    """
+    match = WINDOW_RE.match(value or '')
+    if match is None:
+        raise ValueError(value)
+
+    window = int(match.group(1)) * BUCKET_LENGTHS[WINDOW_UNITS[match.group(2)]]
+    if not timedelta(0) < window <= retention()[DAY]:
+        raise ValueError(value)
+    return window
+
+
+def record_visits(visits, now=None):
+    """Add visits to the minute buckets
+
+    :param visits: dict {product_id: visits}
+    :param now: datetime Time of the visits, defaults to now
+    """
+    bucket_start = truncate(now or timezone.now(), MINUTE)
+    # Sorted, so that concurrent flushes lock the buckets in the same order
+    items = sorted(visits.items())
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(items), INSERT_BATCH_SIZE):
+            batch = items[start:start + INSERT_BATCH_SIZE]
+            params = []
+            for product_id, count in batch:
+                params.extend((product_id, MINUTE, bucket_start, count))
+            cursor.execute(UPSERT_SQL.format(values=', '.join(['(%s, %s, %s, %s)'] * len(batch))), params)
+
+
+def rollup(now=None):
+    """Compute the hour buckets from the minutes, and the day buckets from the hours
+
+    Only the complete hours and days whose buckets are all still kept are
+    computed, and they are replaced, so running it again is harmless.
+    It must run more often than the minute retention minus one hour.
+
+    The hours and days already written are skipped, except the last
+    ROLLUP_OVERLAP ones: a flush committed just after a rollup, or a
+    worker whose clock lags, can still add visits to a complete hour.
+
+    :return: dict {resolution: buckets written}
+    """
+    now = now or timezone.now()
+    kept = retention()
+    written = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for source, target in ((MINUTE, HOUR), (HOUR, DAY)):
+            start = ceil(now - kept[source], target)
+            last = ProductVisitBucket.objects.filter(resolution=target).aggregate(last=Max('bucket_start'))['last']
+            if last is not None:
+                start = max(start, last - (ROLLUP_OVERLAP - 1) * BUCKET_LENGTHS[target])
+            cursor.execute(ROLLUP_SQL, [target, target, source, start, truncate(now, target)])
+            written[target] = cursor.rowcount
+    return written
+
+
+def compact(now=None):
+    """Delete the buckets older than the retention of their resolution
+
+    :return: int Number of buckets deleted
+    """
+    now = now or timezone.now()
+    deleted = 0
+    for resolution, kept in retention().items():
+        deleted += ProductVisitBucket.objects.filter(
+            resolution=resolution, bucket_start__lt=truncate(now - kept, resolution)
+        ).delete()[0]
+    return deleted
+
+
+def _window_filter(since, now):
+    """Return the filter of the buckets covering [since, now), the finest kept ones for each part"""
+    kept = retention()
+    # Minutes cover the complete hours they are kept for, hours the complete days
+    minutes_from = ceil(now - kept[MINUTE], HOUR)
+    hours_from = ceil(now - kept[HOUR], DAY)
+
+    buckets = Q(resolution=MINUTE, bucket_start__gte=max(since, minutes_from))
+    if since < minutes_from:
+        buckets |= Q(resolution=HOUR, bucket_start__gte=max(since, hours_from), bucket_start__lt=minutes_from)
+    if since < hours_from:
+        buckets |= Q(resolution=DAY, bucket_start__gte=since, bucket_start__lt=hours_from)
+    return buckets
+
+
+def visit_count(product_id, window, now=None):
+    """Return the visits of a product during the last window
+
+    :param product_id: int Product ID
+    :param window: timedelta
+    :param now: datetime End of the window, defaults to now
+    """
+    now = now or timezone.now()
+    buckets = ProductVisitBucket.objects.filter(_window_filter(now - window, now), product_id=product_id)
+    return buckets.aggregate(visits=Sum('count'))['visits'] or 0
+
+
+def trending(window, limit, brand=None, now=None):
+    """Return the rows of the most visited products during the last window
+
+    :param window: timedelta
+    :param limit: int Number of products
+    :param brand: str Only products of this brand
+    :param now: datetime End of the window, defaults to now
+    :return: list of product rows with their `window_visits`, the most visited first
+    """
+    now = now or timezone.now()
+    buckets = ProductVisitBucket.objects.filter(_window_filter(now - window, now))
+    if brand is not None:
+        buckets = buckets.filter(product__brand=brand)
+    top = list(
+        buckets.values_list('product_id').annotate(visits=Sum('count')).order_by('-visits', 'product_id')[:limit]
+    )
+
+    products = {row['id']: row for row in product_values(Product.objects.filter(id__in=[pk for pk, _ in top]))}
+    # Buckets of deleted products are skipped
+    return [dict(products[pk], window_visits=visits) for pk, visits in top if pk in products]
+
+
+# The visits of each flush are added to the current minute bucket
+visit_buffer.add_listener(record_visits)
@@ -0,0 +1,190 @@
+"""
+Native async implementations of the hottest product read endpoints,
+to be served from the ASGI entry point (app/asgi.py).
+
+Cached products, cached tokens and visit counting are handled on the
+event loop without taking a thread. Django 3.2 has no async ORM, so the DB
+queries run in a bounded thread pool whose size is also the number of
+DB connections used by the async views of each worker.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+from django.shortcuts import get_object_or_404
+
+from rest_framework.authentication import get_authorization_header
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Product
+from products.cache import product_cache
+from products.filters import ProductFilter
+from products.serializers import ProductSerializer
+from products.visits import ATOMIC, increment_visits, visit_buffer
+from user.authentication import CachedTokenAuthentication, get_cached_credentials
+from utils.conditional import conditional_response, make_etag
+
+db_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_DB_THREADS, thread_name_prefix='async-db')
+
+# Pending flush of the buffered visits, only one is scheduled at a time
+_flush_task = None
+
+
+def _with_connection(function, *args):
+    """Run a DB function, closing the connection of the pool thread when it is obsolete"""
+    close_old_connections()
+    try:
+        return function(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_db(function, *args):
+    """Run a blocking DB function in the DB thread pool and wait for its result
+
+    It runs in the context of the caller, so its queries are counted in the request metrics.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(db_executor, functools.partial(context.run, _with_connection, function, *args))
+
+
+def _json_response(data, status=200):
+    """Return a JSON response rendered the same way as the DRF views"""
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def _error_response(error):
+    """Return the JSON response of a DRF exception"""
+    detail = error.detail if isinstance(error.detail, (dict, list)) else {'detail': error.detail}
+    return _json_response(detail, status=error.status_code)
+
+
+def _load_product(product_id):
+    """Return the product cache entry: its serialized data and last modification"""
+    product = get_object_or_404(Product, id=product_id)
+    return {'data': ProductSerializer(product).data, 'updated_at': product.updated_at}
+
+
+def _list_products(params, after, page_size):
+    """Return a page of serialized products, ordered by ID"""
+    queryset = ProductFilter().filter_queryset(SimpleNamespace(query_params=params), Product.objects.all(), None)
+    fields = ProductSerializer.Meta.fields
+    return list(queryset.filter(id__gt=after).order_by('id').values(*fields)[:page_size])
+
+
+def _token_key(request):
+    """Return the key of a well formed `Token <key>` Authorization header, else None"""
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != CachedTokenAuthentication.keyword.lower().encode():
+        return None
+    try:
+        return auth[1].decode()
+    except UnicodeError:
+        return None
+
+
+async def _is_authenticated(request):
+    """Return True if the request has a valid token, raise AuthenticationFailed if invalid"""
+    if not get_authorization_header(request):
+        return False
+
+    # A cached token is resolved on the event loop, the shared cache would block it with a network call
+    key = _token_key(request)
+    if key is not None and settings.TOKEN_AUTH_CACHE_SHARED_ALIAS is None \
+            and get_cached_credentials(key) is not None:
+        return True
+    return await run_db(CachedTokenAuthentication().authenticate, request) is not None
+
+
+def _schedule_visits_flush():
+    """Write the buffered visits in the DB thread pool without blocking the event loop"""
+    global _flush_task
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.ensure_future(run_db(visit_buffer.flush))
+
+
+async def product_detail(request, product_id):
+    """Returns a single ZeBrands product given an ID, ¡No authentication needed!"""
+    # Django 3.2 method decorators do not support async views
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    try:
+        authenticated = await _is_authenticated(request)
+    except APIException as error:
+        return _error_response(error)
+
+    visits = 0
+    if not authenticated and settings.PRODUCT_VISITS_MODE == ATOMIC:
+        # A single query counts the visit and reads the product
+        row = await run_db(increment_visits, product_id, ProductSerializer.Meta.fields)
+        if row is None:
+            return _error_response(NotFound())
+        cached = {'updated_at': row.pop('updated_at'), 'data': row}
+        product_cache.set(product_id, cached)
+        visit_buffer.record(product_id, flush=False, written=True)
+    else:
+        cached = product_cache.get(product_id)
+        if cached is None:
+            generation = product_cache.generation(product_id)
+            try:
+                cached = await run_db(_load_product, product_id)
+            except Http404:
+                return _error_response(NotFound())
+            product_cache.set(product_id, cached, generation)
+
+        # If the user is anonymous, then increment product visits
+        if not authenticated:
+            visits = visit_buffer.record(product_id, flush=False)
+
+    if visit_buffer.needs_flush():
+        _schedule_visits_flush()
+
+    def get_response():
+        data = cached['data']
+        if visits:
+            data = dict(data, visits=data['visits'] + visits)
+        return _json_response(data)
+
+    # The pending visits are part of the returned product, each counted visit changes it
+    etag = make_etag('product', product_id, cached['updated_at'].isoformat(), visits)
+    return conditional_response(request, etag, cached['updated_at'], get_response)
+
+
+async def product_list(request):
+    """Returns a page of ZeBrands products ordered by ID, ¡No authentication needed!
+
+    Accepts the same filters as the product list, `page_size` and `after`
+    (the ID of the last product of the previous page).
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    try:
+        page_size = min(int(request.GET.get('page_size', settings.PRODUCT_LIST_PAGE_SIZE)),
+                        settings.PRODUCT_LIST_MAX_PAGE_SIZE)
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        return _json_response({'detail': 'page_size and after must be integers.'}, status=400)
+    if page_size < 1:
+        return _json_response({'detail': 'page_size must be positive.'}, status=400)
+
+    try:
+        results = await run_db(_list_products, request.GET, after, page_size)
+    except ValidationError as error:
+        return _error_response(error)
+
+    next_url = None
+    if len(results) == page_size:
+        params = request.GET.copy()
+        params['after'] = results[-1]['id']
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+    return _json_response({'next': next_url, 'results': results})
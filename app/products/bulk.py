@@ -0,0 +1,97 @@
+"""
+Bulk writes of products, used to sync big catalogs with
+a few requests instead of one request per product.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from rest_framework.exceptions import ValidationError
+
+from core.models import Product
+from products.cache import product_cache
+from products.leaderboard import top_products
+from products.serializers import BulkProductSerializer
+from utils.slack_handler import create_bulk_products_notification
+
+# Fields written when an existing SKU is updated
+UPDATE_FIELDS = ('name', 'price', 'brand', 'updated_at')
+
+
+def validate_products(items):
+    """Validate the items of a bulk write
+
+    :param items: list of product dicts
+    :return: tuple (list of validated dicts, list of {'index', 'errors'} dicts)
+    """
+    serializer = BulkProductSerializer()  # Fields are built once for the whole batch
+    valid, errors, seen_skus = [], [], set()
+
+    for index, item in enumerate(items):
+        try:
+            data = serializer.run_validation(item)
+        except ValidationError as error:
+            errors.append({'index': index, 'errors': error.detail})
+            continue
+
+        if data['sku'] in seen_skus:
+            errors.append({'index': index, 'errors': {'sku': ['Duplicated sku in the batch.']}})
+            continue
+
+        seen_skus.add(data['sku'])
+        valid.append(data)
+
+    return valid, errors
+
+
+def upsert_products(products):
+    """Create or update (by SKU) many products in a single transaction
+
+    :param products: list of validated product dicts
+    :return: tuple (list of created products, list of updated products)
+    """
+    batch_size = settings.PRODUCT_BULK_BATCH_SIZE
+    with transaction.atomic():
+        existing = Product.objects.select_for_update().in_bulk(
+            [data['sku'] for data in products], field_name='sku'
+        )
+
+        to_create, to_update = [], []
+        now = timezone.now()  # bulk_update does not set auto_now fields
+        for data in products:
+            product = existing.get(data['sku'])
+            if product is None:
+                to_create.append(Product(**data))
+                continue
+            for field, value in data.items():
+                setattr(product, field, value)
+            product.updated_at = now
+            to_update.append(product)
+
+        Product.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=batch_size)
+        created = Product.objects.bulk_create(to_create, batch_size=batch_size)
+
+    product_cache.invalidate(*[product.id for product in to_update])
+    top_products.clear()
+    if created or to_update:
+        create_bulk_products_notification(created=created, updated=to_update)
+
+    return created, to_update
+
+
+def delete_products(product_ids):
+    """Delete many products given their IDs
+
+    :param product_ids: list of product IDs
+    :return: int Number of products deleted
+    """
+    with transaction.atomic():
+        products = list(Product.objects.filter(id__in=product_ids).only('id', 'sku'))
+        Product.objects.filter(id__in=[product.id for product in products]).delete()
+
+    product_cache.invalidate(*product_ids)
+    top_products.clear()
+    if products:
+        create_bulk_products_notification(deleted=products)
+
+    return len(products)
@@ -0,0 +1,129 @@
+"""
+Read-through cache of serialized products.
+
+A local-memory LRU tier with a short TTL sits in front of an optional
+shared tier (any Django cache backend, e.g. Redis or Memcached).
+Entries are invalidated by the product create, update and delete paths,
+and when buffered visits of a product are written to the DB.
+
+Each worker process has its own local tier: an invalidation removes the
+product from the local tier of its process and from the shared tier, the
+other processes keep serving their local copy for up to the local TTL.
+"""
+import itertools
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from products.visits import visit_buffer
+from utils.lru_cache import TTLCache
+
+
+class ProductCache:
+    """Two tier cache of product payloads keyed by product ID"""
+
+    def __init__(self, maxsize=10000, ttl=30, shared_alias=None, shared_ttl=300):
+        """
+        :param maxsize: int Max products in the local tier
+        :param ttl: float Seconds a product stays in the local tier
+        :param shared_alias: str Django cache alias of the shared tier, None to disable it
+        :param shared_ttl: float Seconds a product stays in the shared tier
+        """
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.shared_alias = shared_alias
+        self.shared_ttl = shared_ttl
+        self.shared_hits = 0
+        # Generation of the recently invalidated products, a payload loaded before
+        # an invalidation is not stored. Products absent from it are generation 0
+        self._generations = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._counter = itertools.count(1)
+        self._generation_lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    @staticmethod
+    def _key(product_id):
+        return f'product:{product_id}'
+
+    def get(self, product_id):
+        """Return the cached payload of a product, or None on a miss"""
+        payload = self.local.get(product_id)
+        if payload is None and self.shared is not None:
+            payload = self.shared.get(self._key(product_id))
+            if payload is not None:
+                self.shared_hits += 1
+                self.local.set(product_id, payload)
+
+        return payload
+
+    def generation(self, product_id):
+        """Return the generation of a product, read it before loading the payload to pass to set()"""
+        return self._generations.get(product_id, 0)
+
+    def set(self, product_id, payload, generation=None):
+        """Store the payload of a product in every tier
+
+        :param generation: int Generation of the product when the payload was loaded,
+            the payload is not stored if the product was invalidated since then
+        :return: bool Whether the payload was stored
+        """
+        if generation is not None and self.generation(product_id) != generation:
+            return False
+        payload = dict(payload)
+        self.local.set(product_id, payload)
+        if self.shared is not None:
+            self.shared.set(self._key(product_id), payload, self.shared_ttl)
+        return True
+
+    def get_or_load(self, product_id, loader):
+        """Return the cached payload of a product, calling loader() on a miss"""
+        payload = self.get(product_id)
+        if payload is None:
+            generation = self.generation(product_id)
+            payload = loader()
+            self.set(product_id, payload, generation)
+
+        return payload
+
+    def invalidate(self, *product_ids):
+        """Remove products from every tier"""
+        with self._generation_lock:
+            for product_id in product_ids:
+                self._generations.set(product_id, next(self._counter))
+        self.local.delete(*product_ids)
+        if self.shared is not None:
+            self.shared.delete_many([self._key(product_id) for product_id in product_ids])
+
+    def clear(self):
+        """Remove every product from the local tier and reset the counters"""
+        self.local.clear()
+        self._generations.clear()
+        self.shared_hits = 0
+
+    def stats(self):
+        """Return the hit/miss counters of the cache"""
+        local_misses = self.local.misses
+        hits = self.local.hits + self.shared_hits
+        lookups = self.local.hits + local_misses
+        return {
+            'size': len(self.local),
+            'hits': hits,
+            'misses': local_misses - self.shared_hits,
+            'local_hits': self.local.hits,
+            'shared_hits': self.shared_hits,
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+product_cache = ProductCache(
+    maxsize=settings.PRODUCT_CACHE_SIZE,
+    ttl=settings.PRODUCT_CACHE_TTL,
+    shared_alias=settings.PRODUCT_CACHE_SHARED_ALIAS,
+    shared_ttl=settings.PRODUCT_CACHE_SHARED_TTL
+)
+
+# Cached visits are stale once the buffered visits are written to the DB
+visit_buffer.add_listener(lambda visits: product_cache.invalidate(*visits))
@@ -0,0 +1,260 @@
+"""
+Export and import of the whole catalog as CSV or NDJSON files, used by
+the export_products and import_products commands.
+
+Exports read the products ordered by ID with a server side cursor.
+Imports load each batch with COPY into a temporary table and upsert it
+by SKU with a single statement. Memory does not depend on the size of
+the catalog, and both save a checkpoint after each batch so an
+interrupted run can be resumed.
+"""
+import csv
+import io
+import json
+import math
+import os
+import time
+from itertools import islice
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Product
+from products.cache import product_cache
+from products.leaderboard import top_products
+from products.renderers import FIELDS, encode_product_lines
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+FORMATS = (CSV, NDJSON)
+
+# Rows per DB fetch of the exports and per COPY of the imports
+BATCH_SIZE = 10000
+
+# Fields read by the imports, like the bulk API the visits are not imported
+IMPORT_FIELDS = ('sku', 'name', 'price', 'brand')
+MAX_LENGTHS = {name: Product._meta.get_field(name).max_length for name in ('sku', 'name', 'brand')}
+
+TABLE = Product._meta.db_table
+
+IMPORT_TABLE_SQL = """
+CREATE TEMPORARY TABLE IF NOT EXISTS product_import (
+    position integer, sku varchar(100), name varchar(200), price double precision, brand varchar(200)
+)
+"""
+
+# The last row of a duplicated SKU wins, unchanged products are not written
+UPSERT_SQL = f"""
+INSERT INTO {TABLE} (sku, name, price, brand, visits, updated_at)
+SELECT DISTINCT ON (sku) sku, name, price, brand, 0, %s FROM product_import ORDER BY sku, position DESC
+ON CONFLICT (sku) DO UPDATE
+SET name = EXCLUDED.name, price = EXCLUDED.price, brand = EXCLUDED.brand, updated_at = EXCLUDED.updated_at
+WHERE ({TABLE}.name, {TABLE}.price, {TABLE}.brand) IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.price, EXCLUDED.brand)
+RETURNING id, xmax = 0
+"""
+
+
+def guess_format(path):
+    """Return the format of a file given its extension, CSV by default"""
+    return NDJSON if path.endswith(('.ndjson', '.jsonl')) else CSV
+
+
+class Checkpoint:
+    """State of an export or import saved to a JSON file after each batch"""
+
+    def __init__(self, path=None):
+        """
+        :param path: str Path of the checkpoint file, None to disable checkpoints
+        """
+        self.path = path
+
+    def load(self):
+        """Return the saved state, an empty dict if there is none"""
+        if self.path is None or not os.path.exists(self.path):
+            return {}
+        with open(self.path) as file:
+            return json.load(file)
+
+    def save(self, **state):
+        """Save the state, replacing the file so it is never left half written"""
+        if self.path is None:
+            return
+        with open(f'{self.path}.tmp', 'w') as file:
+            json.dump(state, file)
+        os.replace(f'{self.path}.tmp', self.path)
+
+    def delete(self):
+        """Delete the checkpoint once the run is complete"""
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Progress:
+    """Writes the processed rows and their rate, at most once per interval"""
+
+    def __init__(self, write, interval=1.0, unit='products'):
+        """
+        :param write: callable that writes a line
+        :param interval: float Min seconds between two reports
+        :param unit: str Name of the processed rows
+        """
+        self.write = write
+        self.interval = interval
+        self.unit = unit
+        self.start = self.last = time.monotonic()
+
+    def update(self, rows, force=False):
+        now = time.monotonic()
+        if force or now - self.last >= self.interval:
+            self.last = now
+            elapsed = now - self.start
+            self.write(f'{rows:,} {self.unit}, {rows / elapsed if elapsed else 0:,.0f}/s')
+
+
+def _encode_csv(rows, header):
+    """Return CSV bytes of a list of product rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(FIELDS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def export_products(stream, file_format, batch_size=BATCH_SIZE, after_id=0, header=True):
+    """Write the products to a binary stream, ordered by ID
+
+    :param stream: Binary file object
+    :param file_format: str CSV or NDJSON
+    :param batch_size: int Rows per DB fetch and per write
+    :param after_id: int Only export the products with a greater ID, to resume an export
+    :param header: bool Write the CSV header
+    :return: Generator of (rows, last ID) tuples, yielded after each batch is written
+    """
+    products = Product.objects.filter(id__gt=after_id).order_by('id')
+    if file_format == CSV:
+        rows = products.values_list(*FIELDS).iterator(chunk_size=batch_size)
+        if header:
+            stream.write(_encode_csv([], header=True))
+    else:
+        rows = products.values(*FIELDS).iterator(chunk_size=batch_size)
+
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        if file_format == CSV:
+            stream.write(_encode_csv(batch, header=False))
+            last_id = batch[-1][0]
+        else:
+            stream.write(encode_product_lines(batch))
+            last_id = batch[-1]['id']
+        yield len(batch), last_id
+
+
+def _read_records(stream, file_format):
+    """Yield the (record number, record) of a binary stream, or the error of an unreadable record"""
+    lines = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    try:
+        if file_format == CSV:
+            yield from enumerate(csv.DictReader(lines), start=1)
+            return
+
+        number = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                yield number, json.loads(line)
+            except ValueError as error:
+                yield number, ValueError(f'Invalid JSON - {error}')
+    finally:
+        # The stream is closed by its owner
+        lines.detach()
+
+
+def clean_record(record):
+    """Return the (sku, name, price, brand) of an imported record
+
+    :raise ValueError: If the record is not a valid product
+    """
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError('Expected an object')
+
+    values = {}
+    for name, max_length in MAX_LENGTHS.items():
+        value = str(record.get(name) or '').strip()
+        if not value:
+            raise ValueError(f'{name} is required')
+        if len(value) > max_length:
+            raise ValueError(f'{name} is longer than {max_length} characters')
+        values[name] = value
+
+    price = record.get('price')
+    try:
+        price = float(price) if price not in (None, '') else 0.0
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid price {price!r}')
+    if not math.isfinite(price):
+        raise ValueError(f'Invalid price {price!r}')
+
+    return values['sku'], values['name'], price, values['brand']
+
+
+def _load_batch(products):
+    """Upsert a batch of (sku, name, price, brand) tuples by SKU
+
+    :return: tuple (products created, products updated)
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows((position, *product) for position, product in enumerate(products))
+    buffer.seek(0)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(IMPORT_TABLE_SQL)
+        cursor.execute('TRUNCATE product_import')
+        cursor.copy_expert('COPY product_import (position, sku, name, price, brand) FROM STDIN WITH (FORMAT csv)',
+                           buffer)
+        cursor.execute(UPSERT_SQL, [timezone.now()])
+        written = cursor.fetchall()
+
+    updated = [product_id for product_id, created in written if not created]
+    # Only the caches of this process and the shared tier, the other processes
+    # serve their local copies until PRODUCT_CACHE_TTL and PRODUCT_TOP_TTL
+    product_cache.invalidate(*updated)
+    if written:
+        top_products.clear()
+    return len(written) - len(updated), len(updated)
+
+
+def import_products(stream, file_format, batch_size=BATCH_SIZE, skip=0):
+    """Create or update (by SKU) the products of a binary stream
+
+    Each batch is written in its own transaction, so running an
+    interrupted import again only writes the products that changed.
+
+    :param stream: Binary file object
+    :param file_format: str CSV or NDJSON
+    :param batch_size: int Records per COPY
+    :param skip: int Records to skip, to resume an import
+    :return: Generator of dicts with the `records`, `created` and `updated` counts and the
+        `errors` (list of (record number, message)) of each batch, yielded once it is written
+    """
+    records = islice(_read_records(stream, file_format), skip, None)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+
+        products, errors = [], []
+        for number, record in batch:
+            try:
+                products.append(clean_record(record))
+            except ValueError as error:
+                errors.append((number, str(error)))
+
+        created, updated = _load_batch(products) if products else (0, 0)
+        yield {'records': len(batch), 'created': created, 'updated': updated, 'errors': errors}
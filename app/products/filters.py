@@ -0,0 +1,57 @@
+from django.utils.translation import gettext as _   # For text translations
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+
+class ProductFilter(BaseFilterBackend):
+    """Filters products by brand, price range and name
+
+    Every filter is backed by an index of the core_product table.
+    """
+
+    @staticmethod
+    def _price_param(params, name):
+        value = params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            raise ValidationError({name: _('A valid number is required.')})
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        brand = params.get('brand')
+        if brand:
+            queryset = queryset.filter(brand=brand)
+
+        min_price = self._price_param(params, 'min_price')
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+
+        max_price = self._price_param(params, 'max_price')
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
+
+        name_prefix = params.get('name_prefix')
+        if name_prefix:
+            queryset = queryset.filter(name__istartswith=name_prefix)
+
+        name = params.get('name')
+        if name:
+            queryset = queryset.filter(name__icontains=name)
+
+        return queryset
+
+
+class ProductOrderingFilter(OrderingFilter):
+    """Orders products by the `ordering` query param, ties are ordered by ID"""
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view))
+        if 'id' not in ordering and '-id' not in ordering:
+            ordering.append('id')
+
+        return ordering
@@ -0,0 +1,112 @@
+"""
+Leaderboard of the most visited products, overall and per brand.
+
+Each board holds the top products of the catalog or of a brand in
+memory, sorted by visits. It is loaded the first time it is read with
+an index scan of the (visits) or (brand, visits) indexes, then kept up
+to date with the visits written by each flush of the visit buffer, so
+reads never sort the catalog. Boards expire after a TTL to pick up the
+visits written by other processes.
+"""
+import threading
+
+from django.conf import settings
+
+from core.models import Product
+from products.renderers import product_values
+from products.visits import visit_buffer
+from utils.lru_cache import TTLCache
+
+# Key of the board of the whole catalog
+ALL_BRANDS = None
+
+
+def _rank(row):
+    """Sort key of the board rows, most visited first and then by ID"""
+    return -row['visits'], row['id']
+
+
+class Leaderboard:
+    """Top visited products of the catalog and of each brand"""
+
+    def __init__(self, size=100, ttl=60, max_boards=1000):
+        """
+        :param size: int Products kept by each board, the max N of a top-N read
+        :param ttl: float Seconds a board is used before it is loaded again
+        :param max_boards: int Max boards in memory, the least recently read are evicted
+        """
+        self.size = size
+        self.boards = TTLCache(maxsize=max_boards, ttl=ttl)
+        self._lock = threading.Lock()  # Guards the board updates
+        self._version = 0              # Incremented by every update
+
+    def top(self, limit, brand=ALL_BRANDS):
+        """Return the rows of the most visited products
+
+        :param limit: int Number of products, at most the board size
+        :param brand: str Brand of the products, ALL_BRANDS for the whole catalog
+        :return: list of product rows, the most visited first
+        """
+        board = self.boards.get(brand)
+        if board is None:
+            version = self._version
+            board = self._load(brand)
+            with self._lock:
+                # Visits written while loading may be missing from the board
+                if version == self._version:
+                    self.boards.set(brand, board)
+
+        return board[:limit]
+
+    def _load(self, brand):
+        """Return the board of a brand read from the DB"""
+        products = Product.objects.order_by('-visits', 'id')
+        if brand is not ALL_BRANDS:
+            products = products.filter(brand=brand)
+
+        return list(product_values(products)[:self.size])
+
+    def update(self, visits):
+        """Update the boards with the visits written to the DB
+
+        :param visits: dict {product_id: visits}
+        """
+        with self._lock:
+            self._version += 1
+            boards = self.boards.items()
+            if not boards:
+                return
+
+            rows = list(product_values(Product.objects.filter(id__in=list(visits))))
+            for brand, board in boards:
+                candidates = [row for row in rows if brand is ALL_BRANDS or row['brand'] == brand]
+                if candidates:
+                    self._merge(board, candidates)
+
+    def _merge(self, board, candidates):
+        """Merge the updated rows into a board, in place so its TTL is kept"""
+        # Visits only grow, so a product out of a full board only gets
+        # in when it reaches the visits of the last one
+        cutoff = _rank(board[-1]) if len(board) >= self.size else None
+        merged = {row['id']: row for row in board}
+        for row in candidates:
+            if row['id'] in merged or cutoff is None or _rank(row) < cutoff:
+                merged[row['id']] = row
+
+        board[:] = sorted(merged.values(), key=_rank)[:self.size]
+
+    def clear(self):
+        """Drop every board, they are loaded again when read"""
+        with self._lock:
+            self._version += 1
+            self.boards.clear()
+
+
+top_products = Leaderboard(
+    size=settings.PRODUCT_TOP_SIZE,
+    ttl=settings.PRODUCT_TOP_TTL,
+    max_boards=settings.PRODUCT_TOP_BRANDS
+)
+
+# Incremental update of the boards with the visits of each flush
+visit_buffer.add_listener(top_products.update)
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from products.analytics import DAY, HOUR, compact, rollup
+
+
+class Command(BaseCommand):
+    """Django command to roll up the product visit buckets and delete the expired ones
+
+    Run it at least every hour, e.g. from cron or with --interval.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Run again every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            written = rollup()
+            deleted = compact()
+            self.stdout.write(self.style.SUCCESS(
+                f'Rolled up {written[HOUR]} hour and {written[DAY]} day buckets, deleted {deleted} expired buckets'
+            ))
+            if not options['interval']:
+                return
+
+            # Do not keep a DB connection open between runs
+            connections.close_all()
+            time.sleep(options['interval'])
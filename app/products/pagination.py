@@ -0,0 +1,9 @@
+from django.conf import settings
+
+from utils.pagination import OptInCursorPagination
+
+
+class ProductCursorPagination(OptInCursorPagination):
+    """Keyset pagination of products ordered by ID, see OptInCursorPagination"""
+    page_size = settings.PRODUCT_LIST_PAGE_SIZE
+    max_page_size = settings.PRODUCT_LIST_MAX_PAGE_SIZE
@@ -0,0 +1,57 @@
+import json
+
+import msgpack
+from django.conf import settings
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+
+class NDJSONParser(BaseParser):
+    """Parses newline delimited JSON, one object per line, into a list"""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        items = []
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line.decode(encoding)))
+            except ValueError as error:
+                raise ParseError(f'NDJSON parse error on line {number} - {error}')
+
+        return items
+
+
+class ColumnarParser(JSONParser):
+    """Parses a JSON object with one array of values per field into a list of objects"""
+    media_type = 'application/vnd.zebrands.columnar+json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        columns = super().parse(stream, media_type, parser_context)
+        if not isinstance(columns, dict) or not all(isinstance(values, list) for values in columns.values()):
+            raise ParseError('Columnar parse error - expected an object of arrays')
+        if len({len(values) for values in columns.values()}) > 1:
+            raise ParseError('Columnar parse error - the arrays have different lengths')
+
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+class MessagePackParser(BaseParser):
+    """Parses MessagePack"""
+    media_type = 'application/x-msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError) as error:
+            raise ParseError(f'MessagePack parse error - {error}')
+
+
+# Parsers of the bulk product writes
+BULK_PARSERS = (JSONParser, NDJSONParser, ColumnarParser, MessagePackParser)
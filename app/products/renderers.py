@@ -0,0 +1,122 @@
+"""
+Fast path of the product list responses.
+
+The rows are read with ``values()``, without creating model instances
+or running ``ProductSerializer``, and encoded with orjson. The output is byte for byte the one of ``ProductSerializer``
+and the DRF ``JSONRenderer``: rows orjson would write differently
+(floats in exponent notation, NaN) are encoded with the json module.
+"""
+import json
+
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+from products.serializers import ProductSerializer
+
+FIELDS = ProductSerializer.Meta.fields
+
+
+def product_values(queryset, fields=None):
+    """Return the queryset rows as the dicts ProductSerializer would return
+
+    :param fields: Names of the fields to read, in any order, None for all of them
+    """
+    if fields is None:
+        return queryset.values(*FIELDS)
+    # Keys keep the order of the serializer fields
+    return queryset.values(*[name for name in FIELDS if name in fields])
+
+
+def _same_float_format(value):
+    """Return True if orjson and the json module write the float the same way"""
+    return value == 0 or 1e-4 <= abs(value) < 1e16
+
+
+def _orjson_compatible(rows):
+    """Return True if orjson encodes all the product rows like the json module"""
+    return all(type(row) is dict and _same_float_format(row.get('price', 0)) for row in rows)
+
+
+def _json_dumps(data):
+    """Encode data to JSON bytes with the json module, like the DRF JSON renderer does"""
+    return json.dumps(data, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def encode_products(rows):
+    """Return the JSON array of a list of product rows"""
+    if _orjson_compatible(rows):
+        return orjson.dumps(rows)
+    return _json_dumps(rows)
+
+
+def encode_product_lines(rows):
+    """Return the product rows as newline delimited JSON"""
+    dumps = orjson.dumps if _orjson_compatible(rows) else _json_dumps
+    return b''.join(dumps(row) + b'\n' for row in rows)
+
+
+class ProductJSONRenderer(JSONRenderer):
+    """JSON renderer of the product lists, encodes compact lists of product rows with orjson"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data.get('results') if isinstance(data, dict) else data
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if (not isinstance(rows, list) or indent is not None or not self.compact or self.ensure_ascii
+                or not _orjson_compatible(rows)):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Escaped by JSONRenderer, as they are not valid in JavaScript strings
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def to_columns(rows):
+    """Return a list of product rows as one list of values per field"""
+    if not rows:
+        return {}
+    return {name: [row[name] for row in rows] for name in rows[0]}
+
+
+class ProductColumnarRenderer(BaseRenderer):
+    """Renders product lists as JSON with one array per field instead of one object per product
+
+    Paginated lists keep their links, with the columns in `results`.
+    Any other data, like errors, is rendered as plain JSON.
+    """
+    media_type = 'application/vnd.zebrands.columnar+json'
+    format = 'columnar'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if isinstance(data, list):
+            data = to_columns(data)
+        elif isinstance(data, dict) and isinstance(data.get('results'), list):
+            data = dict(data, results=to_columns(data['results']))
+
+        return orjson.dumps(data, default=encoders.JSONEncoder().default)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders any data as MessagePack"""
+    media_type = 'application/x-msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encoders.JSONEncoder().default)
+
+
+# Renderers of the product lists
+PRODUCT_RENDERERS = (ProductJSONRenderer, ProductColumnarRenderer, MessagePackRenderer)
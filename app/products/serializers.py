@@ -1,24 +1,48 @@
 from rest_framework import serializers
 
 from core.models import Product
+from products.cache import product_cache
+from utils.instrumentation import TimedListSerializer, TimedSerializerMixin
 from utils.slack_handler import create_product_update_notification
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Product Objects"""
 
     class Meta:
         model = Product
         fields = ('id', 'sku', 'name', 'price', 'brand', 'visits')
         read_only_fields = ('id', 'visits')
+        list_serializer_class = TimedListSerializer
 
     def create(self, validated_data):
-        """Create a new user with encrypted password and return it"""
-        return Product.objects.create(**validated_data)
+        """Create a new product and return it"""
+        product = Product.objects.create(**validated_data)
+        product_cache.invalidate(product.id)
+        return product
 
     def update(self, instance, validated_data):
         """Update a product and return it"""
-        product = super().update(instance, validated_data)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        # Only the edited columns are written, so visits counted meanwhile are kept
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        product_cache.invalidate(instance.id)
         # Send a slack notification each time a Product is Updated
-        create_product_update_notification(product)
-        return product
+        create_product_update_notification(instance)
+        return instance
+
+
+class BulkProductSerializer(ProductSerializer):
+    """Serializer to validate the items of bulk product writes
+
+    The SKU is not checked for uniqueness, existing SKUs are updated.
+    """
+
+    class Meta(ProductSerializer.Meta):
+        extra_kwargs = {'sku': {'validators': []}}
+
+
+class BulkDeleteSerializer(serializers.Serializer):
+    """Serializer for the IDs of a bulk product delete"""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
@@ -0,0 +1,64 @@
+"""
+Streaming responses for the product list, rows are read from the DB
+with a server side cursor and sent in chunks so that memory usage
+does not depend on the size of the catalog.
+"""
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from products.renderers import encode_product_lines, encode_products, product_values
+
+STREAM_CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _serialized_chunks(queryset, fields):
+    """Yield lists with the product rows of each chunk"""
+    chunk_size = settings.PRODUCT_STREAM_CHUNK_SIZE
+    chunk = []
+    if not queryset.ordered:
+        queryset = queryset.order_by('id')
+    for product in product_values(queryset, fields).iterator(chunk_size=chunk_size):
+        chunk.append(product)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _stream_json(queryset, fields):
+    """Yield a JSON array of products, one chunk of rows at a time"""
+    separator = b'['
+    for chunk in _serialized_chunks(queryset, fields):
+        yield separator + encode_products(chunk)[1:-1]
+        separator = b','
+    yield b']' if separator == b',' else b'[]'
+
+
+def _stream_ndjson(queryset, fields):
+    """Yield one JSON document per line for each product"""
+    for chunk in _serialized_chunks(queryset, fields):
+        yield encode_product_lines(chunk)
+
+
+STREAMERS = {
+    'json': _stream_json,
+    'ndjson': _stream_ndjson,
+}
+
+
+def stream_products(queryset, stream_format, fields=None):
+    """Return a streaming response with the products of the queryset
+
+    :param queryset: Product queryset
+    :param stream_format: str 'json' or 'ndjson'
+    :param fields: Names of the product fields to send, None for all of them
+    :return: StreamingHttpResponse
+    """
+    return StreamingHttpResponse(
+        STREAMERS[stream_format](queryset, fields),
+        content_type=STREAM_CONTENT_TYPES[stream_format]
+    )
@@ -0,0 +1,118 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TransactionTestCase, override_settings
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Product
+
+from products import async_views
+
+from products.cache import product_cache
+from products.serializers import ProductSerializer
+from products.visits import ATOMIC, visit_buffer
+from user.authentication import token_cache
+
+ASYNC_LIST_PRODUCTS_URL = reverse('products:async_list')
+
+
+def unique_product_async_url(product_id=1):
+    """Return async product single view URL"""
+    return reverse('products:async_product_readonly', args=[product_id])
+
+
+# The async views query the DB from a thread pool, with their own
+# connections, so the test data must be committed
+class AsyncProductViewsTests(TransactionTestCase):
+    """Test the async product read endpoints"""
+
+    def setUp(self):
+        self.product = Product.objects.create(sku='sku_0001', name='Test Name', price=10.0, brand='Luuna')
+        product_cache.clear()
+        visit_buffer.clear()
+        token_cache.clear()
+
+    def tearDown(self):
+        product_cache.clear()
+        visit_buffer.clear()
+        token_cache.clear()
+
+    async def test_product_detail_counts_anonymous_visits(self):
+        """Test that the async detail returns the product and counts visits"""
+        url = unique_product_async_url(self.product.id)
+
+        first = await self.async_client.get(url)
+        second = await self.async_client.get(url)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['sku'], 'sku_0001')
+        self.assertEqual([first.json()['visits'], second.json()['visits']], [1, 2])
+
+    @override_settings(PRODUCT_VISITS_MODE=ATOMIC)
+    async def test_product_detail_counts_atomic_visits(self):
+        """Test that in the atomic mode the visits are written by the detail requests"""
+        url = unique_product_async_url(self.product.id)
+
+        await self.async_client.get(url)
+        result = await self.async_client.get(url)
+        missing = await self.async_client.get(unique_product_async_url(0))
+
+        self.assertEqual(result.json()['visits'], 2)
+        self.assertEqual(visit_buffer.pending(self.product.id), 0)
+        self.assertEqual(missing.status_code, 404)
+
+    def test_product_detail_matches_sync_view(self):
+        """Test that the async detail has the same body as the sync view for authenticated users"""
+        user = get_user_model().objects.create_user('user@zebrands.com', 'pass123')
+        token = Token.objects.create(user=user)
+
+        result = self.client.get(
+            unique_product_async_url(self.product.id), HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+
+        self.assertEqual(result.json(), ProductSerializer(self.product).data)
+        self.assertEqual(visit_buffer.pending(self.product.id), 0)
+
+    def test_cached_token_resolved_on_the_loop(self):
+        """Test that a cached token does not take a thread of the DB pool"""
+        user = get_user_model().objects.create_user('user@zebrands.com', 'pass123')
+        token = Token.objects.create(user=user)
+        url = unique_product_async_url(self.product.id)
+        self.client.get(url, HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        with mock.patch('products.async_views.run_db', wraps=async_views.run_db) as run_db:
+            result = self.client.get(url, HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        self.assertEqual(result.status_code, 200)
+        run_db.assert_not_called()
+        self.assertEqual(visit_buffer.pending(self.product.id), 0)
+
+    async def test_product_detail_not_found(self):
+        """Test that an unknown product returns 404"""
+        result = await self.async_client.get(unique_product_async_url(0))
+
+        self.assertEqual(result.status_code, 404)
+
+    async def test_product_detail_invalid_token(self):
+        """Test that an invalid token is rejected"""
+        result = await self.async_client.get(
+            unique_product_async_url(self.product.id), AUTHORIZATION='Token invalid'
+        )
+
+        self.assertEqual(result.status_code, 401)
+
+    def test_product_list_pages(self):
+        """Test that the async list returns filtered pages ordered by ID"""
+        Product.objects.create(sku='sku_0002', name='Test Name 2', price=20.0, brand='Luuna')
+        Product.objects.create(sku='sku_0003', name='Test Name 3', price=30.0, brand='Nooz')
+
+        result = self.client.get(ASYNC_LIST_PRODUCTS_URL, {'brand': 'Luuna', 'page_size': 1})
+        second = self.client.get(result.json()['next'])
+
+        self.assertEqual([product['sku'] for product in result.json()['results']], ['sku_0001'])
+        self.assertEqual([product['sku'] for product in second.json()['results']], ['sku_0002'])
+        self.assertEqual(second.json()['results'], ProductSerializer(
+            Product.objects.filter(sku='sku_0002'), many=True
+        ).data)
@@ -0,0 +1,140 @@
+import json
+
+import msgpack
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from unittest import mock
+
+from core.models import Product
+
+BULK_PRODUCTS_URL = reverse('products:bulk')
+
+
+class PublicBulkProductsAPITests(TestCase):
+    """Test the bulk products API without authentication"""
+
+    def test_bulk_write_fails_when_unauthorized(self):
+        """Test that bulk writes need authentication"""
+        result = APIClient().post(BULK_PRODUCTS_URL, [], format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@mock.patch('products.bulk.create_bulk_products_notification', return_value=True)
+class PrivateBulkProductsAPITests(TestCase):
+    """Test the bulk products API"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('user@zebrands.com', 'pass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_and_update_by_sku(self, notification):
+        """Test that new SKUs are created and existing SKUs updated"""
+        Product.objects.create(sku='sku_0001', name='Old Name', price=1.0, brand='Old Brand')
+        data = [
+            {'sku': 'sku_0001', 'name': 'New Name', 'price': 10.0, 'brand': 'Test Brand'},
+            {'sku': 'sku_0002', 'name': 'Test Name 2', 'price': 20.0, 'brand': 'Test Brand'},
+        ]
+
+        result = self.client.post(BULK_PRODUCTS_URL, data, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual((result.data['created'], result.data['updated']), (1, 1))
+        self.assertEqual(Product.objects.get(sku='sku_0001').name, 'New Name')
+        self.assertTrue(Product.objects.filter(sku='sku_0002').exists())
+        # A single notification for the whole batch
+        notification.assert_called_once()
+
+    def test_bulk_create_reports_item_errors(self, notification):
+        """Test that invalid items are reported and valid items are written"""
+        data = [
+            {'sku': 'sku_0001', 'name': 'Test Name', 'price': 10.0, 'brand': 'Test Brand'},
+            {'sku': '', 'name': 'Test Name', 'brand': 'Test Brand'},
+            {'sku': 'sku_0001', 'name': 'Duplicated', 'brand': 'Test Brand'},
+        ]
+
+        result = self.client.post(BULK_PRODUCTS_URL, data, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(result.data['created'], 1)
+        self.assertEqual([error['index'] for error in result.data['errors']], [1, 2])
+        self.assertIn('sku', result.data['errors'][0]['errors'])
+
+    def test_bulk_create_with_ndjson(self, notification):
+        """Test that products can be sent as newline delimited JSON"""
+        lines = [
+            {'sku': f'sku_{index:04d}', 'name': f'Test Name {index}', 'price': 10.0, 'brand': 'Test Brand'}
+            for index in range(3)
+        ]
+        body = '\n'.join(json.dumps(line) for line in lines)
+
+        result = self.client.post(BULK_PRODUCTS_URL, body, content_type='application/x-ndjson')
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(Product.objects.count(), 3)
+
+    def test_bulk_create_with_columnar_json(self, notification):
+        """Test that products can be sent as one array per field"""
+        columns = {'sku': ['sku_0001', 'sku_0002'], 'name': ['A', 'B'], 'price': [1.0, 2.0], 'brand': ['X', 'Y']}
+
+        result = self.client.post(
+            BULK_PRODUCTS_URL, json.dumps(columns), content_type='application/vnd.zebrands.columnar+json'
+        )
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(Product.objects.order_by('sku').values_list('sku', 'brand')),
+                         [('sku_0001', 'X'), ('sku_0002', 'Y')])
+
+    def test_bulk_create_with_uneven_columns_fails(self, notification):
+        """Test that columns of different lengths are a parse error"""
+        columns = {'sku': ['sku_0001', 'sku_0002'], 'name': ['A']}
+
+        result = self.client.post(
+            BULK_PRODUCTS_URL, json.dumps(columns), content_type='application/vnd.zebrands.columnar+json'
+        )
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Product.objects.count(), 0)
+
+    def test_bulk_create_with_msgpack(self, notification):
+        """Test that products can be sent and the result received as MessagePack"""
+        items = [{'sku': 'sku_0001', 'name': 'Test Name', 'price': 10.0, 'brand': 'Test Brand'}, {'sku': ''}]
+
+        result = self.client.post(
+            BULK_PRODUCTS_URL, msgpack.packb(items), content_type='application/x-msgpack',
+            HTTP_ACCEPT='application/x-msgpack'
+        )
+
+        data = msgpack.unpackb(result.content)
+        self.assertEqual(result.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(result['Content-Type'], 'application/x-msgpack')
+        self.assertEqual(data['created'], 1)
+        self.assertIn('sku', data['errors'][0]['errors'])
+
+    def test_bulk_create_fails_when_not_a_list(self, notification):
+        """Test that the body must be a list of products"""
+        result = self.client.post(BULK_PRODUCTS_URL, {'sku': 'sku_0001'}, format='json')
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete(self, notification):
+        """Test deleting many products given their IDs"""
+        products = [
+            Product.objects.create(sku=f'sku_{index:04d}', name='Test Name', price=10.0, brand='Test Brand')
+            for index in range(3)
+        ]
+
+        result = self.client.delete(
+            BULK_PRODUCTS_URL, {'ids': [products[0].id, products[1].id]}, format='json'
+        )
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data['deleted'], 2)
+        self.assertEqual(list(Product.objects.values_list('id', flat=True)), [products[2].id])
+        notification.assert_called_once()
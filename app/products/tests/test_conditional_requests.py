@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from unittest import mock
+
+from core.models import Product
+
+from products.cache import product_cache
+from products.visits import visit_buffer
+
+LIST_PRODUCTS_URL = reverse('products:list')
+
+
+def unique_product_url(product_id):
+    """Return product manage URL"""
+    return reverse('products:product', args=[product_id])
+
+
+def unique_product_anonymous_url(product_id=1):
+    """Return product single view URL"""
+    return reverse('products:product_readonly', args=[product_id])
+
+
+class ProductConditionalRequestsTests(TestCase):
+    """Test ETag and Last-Modified support of the product endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.product = Product.objects.create(sku='sku_0001', name='Test Name', price=10.0, brand='Test Brand')
+        product_cache.clear()
+        visit_buffer.clear()
+
+    def tearDown(self):
+        product_cache.clear()
+        visit_buffer.clear()
+
+    def test_product_not_modified(self):
+        """Test that a product is not sent again when the client has the current version"""
+        url = unique_product_anonymous_url(self.product.id)
+        result = self.client.get(url, {'fields': 'id,name'})
+        self.assertIn('Last-Modified', result)
+
+        result = self.client.get(url, {'fields': 'id,name'}, HTTP_IF_NONE_MATCH=result['ETag'])
+
+        self.assertEqual(result.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(result.content, b'')
+        # The visit is counted anyway
+        self.assertEqual(visit_buffer.pending(self.product.id), 2)
+
+    def test_counted_visit_changes_etag(self):
+        """Test that each counted visit changes the ETag of a product returned with its visits"""
+        url = unique_product_anonymous_url(self.product.id)
+        first = self.client.get(url)
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        third = self.client.get(url, HTTP_IF_NONE_MATCH=second['ETag'])
+
+        self.assertEqual([result.status_code for result in (first, second, third)], [status.HTTP_200_OK] * 3)
+        self.assertEqual([result.data['visits'] for result in (first, second, third)], [1, 2, 3])
+        self.assertEqual(len({result['ETag'] for result in (first, second, third)}), 3)
+
+    def test_updated_product_is_sent_again(self):
+        """Test that a changed product does not match the old ETag"""
+        user = get_user_model().objects.create_user('user@zebrands.com', 'pass123')
+        self.client.force_authenticate(user)
+        url = unique_product_url(self.product.id)
+        etag = self.client.get(url)['ETag']
+
+        with mock.patch('products.serializers.create_product_update_notification', return_value=True):
+            self.client.patch(url, {'name': 'New Name'})
+        result = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data['name'], 'New Name')
+        self.assertNotEqual(result['ETag'], etag)
+
+    def test_product_list_not_modified_with_single_query(self):
+        """Test that a current list is answered with the aggregate query only"""
+        etag = self.client.get(LIST_PRODUCTS_URL)['ETag']
+
+        with self.assertNumQueries(1):
+            result = self.client.get(LIST_PRODUCTS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(result.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_product_list_changes_when_product_deleted(self):
+        """Test that deleting a product changes the list ETag"""
+        Product.objects.create(sku='sku_0002', name='Test Name 2', price=20.0, brand='Test Brand')
+        etag = self.client.get(LIST_PRODUCTS_URL)['ETag']
+
+        self.product.delete()
+        result = self.client.get(LIST_PRODUCTS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(result.data), 1)
+
+    def test_product_list_etag_depends_on_query(self):
+        """Test that different filters have different ETags"""
+        etag = self.client.get(LIST_PRODUCTS_URL)['ETag']
+
+        result = self.client.get(LIST_PRODUCTS_URL, {'brand': 'Other'}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from unittest import mock
+
+from core.models import Product
+
+from products.cache import product_cache
+from products.visits import visit_buffer
+
+CACHE_STATS_URL = reverse('products:cache_stats')
+
+
+def unique_product_url(product_id):
+    """Return product manage URL"""
+    return reverse('products:product', args=[product_id])
+
+
+def unique_product_anonymous_url(product_id=1):
+    """Return product single view URL"""
+    return reverse('products:product_readonly', args=[product_id])
+
+
+class ProductCacheTests(TestCase):
+    """Test the read-through cache of the single product endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('user@zebrands.com', 'pass123')
+        self.client = APIClient()
+        self.product = Product.objects.create(sku='sku_0001', name='Test Name', price=10.0, brand='Test Brand')
+        product_cache.clear()
+        visit_buffer.clear()
+
+    def tearDown(self):
+        product_cache.clear()
+        visit_buffer.clear()
+
+    def test_cached_read_does_not_query_db(self):
+        """Test that the second read of a product is served from the cache"""
+        self.client.force_authenticate(self.user)
+        url = unique_product_url(self.product.id)
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            result = self.client.get(url)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data['sku'], self.product.sku)
+        self.assertEqual(product_cache.stats()['hits'], 1)
+
+    def test_visits_are_counted_on_cached_reads(self):
+        """Test that anonymous visits keep being counted when the product is cached"""
+        url = unique_product_anonymous_url(self.product.id)
+
+        visits = [self.client.get(url).data['visits'] for _ in range(3)]
+        visit_buffer.flush()
+        visits.append(self.client.get(url).data['visits'])
+
+        self.assertEqual(visits, [1, 2, 3, 4])
+
+    def test_invalidation_during_load_is_not_lost(self):
+        """Test that a payload loaded while the product is invalidated is not cached"""
+        def loader():
+            # e.g. a visits flush or an edit in another thread
+            product_cache.invalidate(self.product.id)
+            return {'data': {'name': 'Stale'}}
+
+        self.assertEqual(product_cache.get_or_load(self.product.id, loader)['data']['name'], 'Stale')
+        self.assertIsNone(product_cache.get(self.product.id))
+
+        product_cache.get_or_load(self.product.id, lambda: {'data': {'name': 'Current'}})
+        self.assertEqual(product_cache.get(self.product.id)['data']['name'], 'Current')
+
+    def test_update_invalidates_cache(self):
+        """Test that an updated product is not served stale from the cache"""
+        self.client.force_authenticate(self.user)
+        url = unique_product_url(self.product.id)
+        self.client.get(url)
+
+        with mock.patch('products.serializers.create_product_update_notification', return_value=True):
+            self.client.patch(url, {'name': 'New Name'})
+        result = self.client.get(url)
+
+        self.assertEqual(result.data['name'], 'New Name')
+
+    def test_delete_invalidates_cache(self):
+        """Test that a deleted product is not served from the cache"""
+        self.client.force_authenticate(self.user)
+        url = unique_product_url(self.product.id)
+        self.client.get(url)
+
+        self.client.delete(url)
+        result = self.client.get(url)
+
+        self.assertEqual(result.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cache_stats_only_for_admin_users(self):
+        """Test that the cache counters are only exposed to admin users"""
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(CACHE_STATS_URL).status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = get_user_model().objects.create_superuser('admin_user@zebrands.com', 'pass123')
+        self.client.force_authenticate(admin)
+        result = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertIn('hit_ratio', result.data)
@@ -10,6 +10,7 @@ from unittest import mock
 from core.models import Product
 
 from products.serializers import ProductSerializer
+from products.visits import visit_buffer
 
 LIST_PRODUCTS_URL = reverse('products:list')
 CREATE_PRODUCT_URL = reverse('products:create')
@@ -31,6 +32,10 @@ class PublicProductsAPITests(TestCase):
     def setUp(self):
         self.client = APIClient()
 
+    def tearDown(self):
+        # Discard the buffered visits of the anonymous requests
+        visit_buffer.clear()
+
     def test_retrieve_products_success(self):
         """Test that all products are retrieved for anyusers"""
         # First populate the DB with some dummy products
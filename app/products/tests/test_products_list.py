@@ -0,0 +1,307 @@
+import gzip
+import json
+from unittest import mock
+
+import msgpack
+from django.db import connection
+from django.urls import reverse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Product
+
+from products.cache import product_cache
+from products.renderers import product_values
+from products.serializers import ProductSerializer
+from products.visits import visit_buffer
+
+LIST_PRODUCTS_URL = reverse('products:list')
+
+
+def create_products(count):
+    """Help function to create some dummy products"""
+    return Product.objects.bulk_create([
+        Product(sku=f'sku_{index:04d}', name=f'Test Name {index}', price=10.0 + index, brand='Test Brand')
+        for index in range(count)
+    ])
+
+
+class ProductListPaginationTests(TestCase):
+    """Test the cursor pagination of the product list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        create_products(5)
+
+    def test_list_is_paginated_with_page_size(self):
+        """Test that products are returned page by page, ordered by ID"""
+        result = self.client.get(LIST_PRODUCTS_URL, {'page_size': 2})
+
+        products = Product.objects.order_by('id')
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data['results'], ProductSerializer(products[:2], many=True).data)
+        self.assertIsNone(result.data['previous'])
+        self.assertIsNotNone(result.data['next'])
+
+    def test_following_cursor_returns_all_products(self):
+        """Test that following the next links returns every product once"""
+        url = f'{LIST_PRODUCTS_URL}?page_size=2'
+        skus = []
+        while url:
+            result = self.client.get(url)
+            skus.extend(product['sku'] for product in result.data['results'])
+            url = result.data['next']
+
+        self.assertEqual(skus, list(Product.objects.order_by('id').values_list('sku', flat=True)))
+
+
+class ProductListStreamingTests(TestCase):
+    """Test the streaming modes of the product list"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_stream_json(self):
+        """Test that the streamed JSON array contains every product"""
+        create_products(3)
+
+        result = self.client.get(LIST_PRODUCTS_URL, {'stream': 'json'})
+        content = b''.join(result.streaming_content)
+
+        products = Product.objects.order_by('id')
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(content), ProductSerializer(products, many=True).data)
+
+    def test_stream_json_empty_catalog(self):
+        """Test that an empty catalog is streamed as an empty array"""
+        result = self.client.get(LIST_PRODUCTS_URL, {'stream': 'json'})
+
+        self.assertEqual(json.loads(b''.join(result.streaming_content)), [])
+
+    def test_stream_ndjson(self):
+        """Test that NDJSON has one product per line"""
+        create_products(3)
+
+        result = self.client.get(LIST_PRODUCTS_URL, {'stream': 'ndjson'})
+        lines = b''.join(result.streaming_content).splitlines()
+
+        products = Product.objects.order_by('id')
+        self.assertEqual(result['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line) for line in lines], ProductSerializer(products, many=True).data)
+
+    def test_stream_invalid_format(self):
+        """Test that an unknown stream format returns an error"""
+        result = self.client.get(LIST_PRODUCTS_URL, {'stream': 'xml'})
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductListFilterTests(TestCase):
+    """Test the filters and ordering of the product list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        Product.objects.create(sku='sku_0001', name='Blue Pillow', price=10.0, brand='Luuna', visits=5)
+        Product.objects.create(sku='sku_0002', name='Red Pillow', price=30.0, brand='Luuna', visits=1)
+        Product.objects.create(sku='sku_0003', name='Blue Mattress', price=50.0, brand='Nooz', visits=9)
+
+    def get_skus(self, params):
+        result = self.client.get(LIST_PRODUCTS_URL, params)
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        return [product['sku'] for product in result.data]
+
+    def test_filter_by_brand(self):
+        """Test filtering products by brand"""
+        self.assertEqual(self.get_skus({'brand': 'Luuna'}), ['sku_0001', 'sku_0002'])
+
+    def test_filter_by_price_range(self):
+        """Test filtering products by min and max price"""
+        self.assertEqual(self.get_skus({'min_price': 20, 'max_price': 50}), ['sku_0002', 'sku_0003'])
+
+    def test_filter_by_invalid_price(self):
+        """Test that an invalid price returns an error"""
+        result = self.client.get(LIST_PRODUCTS_URL, {'min_price': 'cheap'})
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_by_name(self):
+        """Test filtering products by name prefix and substring, ignoring case"""
+        self.assertEqual(self.get_skus({'name_prefix': 'blue'}), ['sku_0001', 'sku_0003'])
+        self.assertEqual(self.get_skus({'name': 'PILLOW'}), ['sku_0001', 'sku_0002'])
+
+    def test_ordering_by_visits(self):
+        """Test ordering products by visits"""
+        self.assertEqual(self.get_skus({'ordering': '-visits'}), ['sku_0003', 'sku_0001', 'sku_0002'])
+
+    def test_ordering_with_pagination(self):
+        """Test that pages follow the requested ordering"""
+        result = self.client.get(LIST_PRODUCTS_URL, {'ordering': 'price', 'page_size': 2, 'brand': 'Luuna'})
+
+        self.assertEqual([product['sku'] for product in result.data['results']], ['sku_0001', 'sku_0002'])
+        self.assertIsNone(result.data['next'])
+
+
+class ProductListRenderingTests(TestCase):
+    """Test that the fast path of the product list renders like ProductSerializer and JSONRenderer"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def assert_rendered_like_serializer(self, params=None):
+        products = ProductSerializer(Product.objects.order_by('id'), many=True).data
+
+        result = self.client.get(LIST_PRODUCTS_URL, params or {})
+
+        data = result.data['results'] if params else result.data
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(data, products)
+        self.assertEqual(result.content, JSONRenderer().render(result.data))
+
+    def test_list_renders_like_json_renderer(self):
+        """Test that the list and its pages are byte for byte the DRF JSON output"""
+        Product.objects.create(sku='sku_0001', name='Almohada Ñandú \u2028 "test"', price=10.5, brand='Luuna')
+        Product.objects.create(sku='sku_0002', name='Colchón', price=1999.99, brand='Nooz')
+
+        self.assert_rendered_like_serializer()
+        self.assert_rendered_like_serializer({'page_size': 10})
+
+    def test_list_renders_exponent_prices_like_json_renderer(self):
+        """Test that prices written in exponent notation by Python keep their format"""
+        Product.objects.create(sku='sku_0001', name='Tiny', price=0.00001, brand='Luuna')
+        Product.objects.create(sku='sku_0002', name='Huge', price=1e16, brand='Luuna')
+
+        self.assert_rendered_like_serializer()
+        self.assertIn(b'1e-05', self.client.get(LIST_PRODUCTS_URL).content)
+
+    def test_list_does_not_create_model_instances(self):
+        """Test that the list rows are read without creating Product instances"""
+        create_products(3)
+
+        with mock.patch.object(Product, 'from_db', side_effect=AssertionError) as from_db:
+            self.client.get(LIST_PRODUCTS_URL)
+
+        from_db.assert_not_called()
+
+
+class ProductFieldsTests(TestCase):
+    """Test the `fields` query param of the product endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        create_products(3)
+
+    def tearDown(self):
+        product_cache.clear()
+        visit_buffer.clear()
+
+    def test_list_returns_requested_fields(self):
+        """Test that the list only has the requested fields, in the serializer order"""
+        with CaptureQueriesContext(connection) as queries:
+            result = self.client.get(LIST_PRODUCTS_URL, {'fields': 'price,id,sku'})
+
+        expected = list(Product.objects.order_by('id').values('id', 'sku', 'price'))
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data, expected)
+        self.assertEqual(result.content, JSONRenderer().render(expected))
+        self.assertNotIn('"name"', queries[-1]['sql'])
+
+    def test_list_fields_with_pagination(self):
+        """Test that pages without the ordering field can still be followed"""
+        url = f'{LIST_PRODUCTS_URL}?fields=sku&ordering=-price&page_size=2'
+        rows = []
+        while url:
+            result = self.client.get(url)
+            rows.extend(result.data['results'])
+            url = result.data['next']
+
+        self.assertEqual(rows, list(Product.objects.order_by('-price').values('sku')))
+
+    def test_stream_returns_requested_fields(self):
+        """Test that the streamed products only have the requested fields"""
+        result = self.client.get(LIST_PRODUCTS_URL, {'fields': 'id,price', 'stream': 'ndjson'})
+
+        lines = b''.join(result.streaming_content).splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines], list(Product.objects.order_by('id').values('id', 'price'))
+        )
+
+    def test_unknown_fields_are_rejected(self):
+        """Test that fields out of the allow-list are a bad request"""
+        for fields in ('id,password', 'updated_at', ','):
+            result = self.client.get(LIST_PRODUCTS_URL, {'fields': fields})
+
+            self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('fields', result.data)
+
+    def test_product_returns_requested_fields(self):
+        """Test that a single product only has the requested fields, visits included"""
+        product = Product.objects.order_by('id').first()
+        url = reverse('products:product_readonly', args=[product.id])
+
+        full = self.client.get(url)
+        result = self.client.get(url, {'fields': 'id,visits'})
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data, {'id': product.id, 'visits': 2})
+        self.assertNotEqual(result['ETag'], full['ETag'])
+
+    def test_product_unknown_fields_are_rejected(self):
+        """Test that a single product with unknown fields is a bad request"""
+        product = Product.objects.first()
+        url = reverse('products:product_readonly', args=[product.id])
+
+        result = self.client.get(url, {'fields': 'secret'})
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductListFormatsTests(TestCase):
+    """Test the columnar, MessagePack and compressed product lists"""
+
+    def setUp(self):
+        self.client = APIClient()
+        create_products(50)
+        self.rows = list(product_values(Product.objects.order_by('id')))
+
+    def test_columnar_list(self):
+        """Test that the columnar list has one array per field"""
+        result = self.client.get(LIST_PRODUCTS_URL, HTTP_ACCEPT='application/vnd.zebrands.columnar+json')
+
+        columns = json.loads(result.content)
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(columns), list(ProductSerializer.Meta.fields))
+        self.assertEqual([dict(zip(columns, values)) for values in zip(*columns.values())], self.rows)
+
+    def test_columnar_page(self):
+        """Test that columnar pages keep their links"""
+        result = self.client.get(
+            LIST_PRODUCTS_URL, {'page_size': 2, 'fields': 'sku'}, HTTP_ACCEPT='application/vnd.zebrands.columnar+json'
+        )
+
+        data = json.loads(result.content)
+        self.assertEqual(data['results'], {'sku': ['sku_0000', 'sku_0001']})
+        self.assertIsNotNone(data['next'])
+
+    def test_msgpack_list(self):
+        """Test that the list can be requested as MessagePack"""
+        result = self.client.get(LIST_PRODUCTS_URL, HTTP_ACCEPT='application/x-msgpack')
+
+        self.assertEqual(result['Content-Type'], 'application/x-msgpack')
+        self.assertEqual(msgpack.unpackb(result.content), self.rows)
+
+    def test_compressed_list_not_modified(self):
+        """Test that a gzip list has a weak ETag that still validates the client copy"""
+        result = self.client.get(LIST_PRODUCTS_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(result['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(result.content)), self.rows)
+        self.assertTrue(result['ETag'].startswith('W/'))
+
+        result = self.client.get(LIST_PRODUCTS_URL, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=result['ETag'])
+
+        self.assertEqual(result.status_code, status.HTTP_304_NOT_MODIFIED)
@@ -0,0 +1,119 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Product
+
+from products.leaderboard import Leaderboard, top_products
+from products.serializers import ProductSerializer
+from products.visits import VisitBuffer
+
+TOP_PRODUCTS_URL = reverse('products:top')
+
+
+def unique_product_url(product_id=1):
+    """Return product manage URL"""
+    return reverse('products:product', args=[product_id])
+
+
+class LeaderboardTests(TestCase):
+    """Test the in-memory leaderboard of the most visited products"""
+
+    def setUp(self):
+        self.leaderboard = Leaderboard(size=2, ttl=60)
+        # No background thread, flushes are triggered by the tests
+        self.buffer = VisitBuffer(flush_interval=None, flush_size=100)
+        self.buffer.add_listener(self.leaderboard.update)
+        self.product_1 = Product.objects.create(sku='sku_0001', name='Test 1', price=10.0, brand='Luuna', visits=5)
+        self.product_2 = Product.objects.create(sku='sku_0002', name='Test 2', price=20.0, brand='Luuna', visits=3)
+        self.product_3 = Product.objects.create(sku='sku_0003', name='Test 3', price=30.0, brand='Nooz', visits=4)
+
+    def test_top_products_are_sorted_by_visits(self):
+        """Test that the board has the most visited products, overall and per brand"""
+        self.assertEqual([row['sku'] for row in self.leaderboard.top(2)], ['sku_0001', 'sku_0003'])
+        self.assertEqual([row['sku'] for row in self.leaderboard.top(2, brand='Luuna')], ['sku_0001', 'sku_0002'])
+        self.assertEqual(self.leaderboard.top(1), ProductSerializer([self.product_1], many=True).data)
+
+    def test_loaded_board_is_read_from_memory(self):
+        """Test that only the first read of a board queries the DB"""
+        self.leaderboard.top(2)
+
+        with self.assertNumQueries(0):
+            self.leaderboard.top(2)
+
+    def test_flushed_visits_update_the_board(self):
+        """Test that a product enters a full board when its flushed visits reach it"""
+        self.leaderboard.top(2)
+        self.leaderboard.top(2, brand='Luuna')
+        self.buffer.record(self.product_2.id, count=10)
+
+        self.buffer.flush()
+
+        with self.assertNumQueries(0):
+            overall = self.leaderboard.top(2)
+            luuna = self.leaderboard.top(2, brand='Luuna')
+        self.assertEqual([(row['sku'], row['visits']) for row in overall], [('sku_0002', 13), ('sku_0001', 5)])
+        self.assertEqual([row['sku'] for row in luuna], ['sku_0002', 'sku_0001'])
+
+    def test_board_is_not_stored_when_visits_are_written_while_loading(self):
+        """Test that a board that may miss a flush is loaded again on the next read"""
+        load = self.leaderboard._load
+
+        def load_during_flush(brand):
+            board = load(brand)
+            self.leaderboard.update({self.product_2.id: 10})
+            return board
+
+        with mock.patch.object(self.leaderboard, '_load', side_effect=load_during_flush):
+            self.leaderboard.top(2)
+
+        self.assertEqual(len(self.leaderboard.boards), 0)
+
+
+class TopProductsApiTests(TestCase):
+    """Test the most visited products endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        top_products.clear()
+        Product.objects.create(sku='sku_0001', name='Test 1', price=10.0, brand='Luuna', visits=5)
+        Product.objects.create(sku='sku_0002', name='Test 2', price=20.0, brand='Nooz', visits=9)
+
+    def tearDown(self):
+        top_products.clear()
+
+    def test_top_products(self):
+        """Test that the most visited products are returned first"""
+        result = self.client.get(TOP_PRODUCTS_URL, {'limit': 1})
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['sku'] for row in result.data], ['sku_0002'])
+
+    def test_top_products_of_a_brand(self):
+        """Test the most visited products of a brand"""
+        result = self.client.get(TOP_PRODUCTS_URL, {'brand': 'Luuna'})
+
+        self.assertEqual([row['sku'] for row in result.data], ['sku_0001'])
+
+    def test_invalid_limit(self):
+        """Test that the limit must be between 1 and the board size"""
+        for limit in ('0', 'ten', top_products.size + 1):
+            result = self.client.get(TOP_PRODUCTS_URL, {'limit': limit})
+
+            self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_product_writes_reset_the_boards(self):
+        """Test that deleted products leave the leaderboard"""
+        self.client.get(TOP_PRODUCTS_URL)
+        user = get_user_model().objects.create_user('test@zebrands.com', 'pass123')
+        self.client.force_authenticate(user)
+
+        self.client.delete(unique_product_url(Product.objects.get(sku='sku_0002').id))
+        result = self.client.get(TOP_PRODUCTS_URL)
+
+        self.assertEqual([row['sku'] for row in result.data], ['sku_0001'])
@@ -0,0 +1,188 @@
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.test import TestCase, override_settings
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Product, ProductVisitBucket
+
+from products import analytics
+from products.visits import visit_buffer
+
+TRENDING_PRODUCTS_URL = reverse('products:trending')
+
+# Fixed end of the windows used by the tests
+NOW = datetime(2024, 1, 10, 12, 30, tzinfo=timezone.utc)
+
+
+def at(day, hour, minute=0):
+    """Return a datetime of January 2024"""
+    return datetime(2024, 1, day, hour, minute, tzinfo=timezone.utc)
+
+
+def product_visits_url(product_id=1):
+    """Return product visits URL"""
+    return reverse('products:product_visits', args=[product_id])
+
+
+def buckets(resolution):
+    """Return the {bucket_start: count} of a resolution"""
+    return dict(ProductVisitBucket.objects.filter(resolution=resolution).values_list('bucket_start', 'count'))
+
+
+@override_settings(PRODUCT_VISITS_MINUTE_RETENTION=2, PRODUCT_VISITS_HOUR_RETENTION=2, PRODUCT_VISITS_DAY_RETENTION=30)
+class VisitAnalyticsTests(TestCase):
+    """Test the time bucketed product visits"""
+
+    def setUp(self):
+        self.product = Product.objects.create(sku='sku_0001', name='Test Name', price=10.0, brand='Luuna')
+
+    def add_bucket(self, resolution, bucket_start, count):
+        ProductVisitBucket.objects.create(
+            product=self.product, resolution=resolution, bucket_start=bucket_start, count=count
+        )
+
+    def test_record_visits_adds_to_minute_buckets(self):
+        """Test that the visits of the same minute are added to a single bucket"""
+        analytics.record_visits({self.product.id: 2}, now=at(10, 12, 5))
+        analytics.record_visits({self.product.id: 3}, now=at(10, 12, 5).replace(second=40))
+        analytics.record_visits({self.product.id: 1}, now=at(10, 12, 6))
+
+        self.assertEqual(buckets(analytics.MINUTE), {at(10, 12, 5): 5, at(10, 12, 6): 1})
+
+    def test_rollup_is_idempotent(self):
+        """Test that complete hours and days are computed from the finer buckets"""
+        self.add_bucket(analytics.MINUTE, at(10, 11, 5), 2)
+        self.add_bucket(analytics.MINUTE, at(10, 11, 50), 3)
+        self.add_bucket(analytics.MINUTE, at(10, 12, 10), 4)  # Current hour, not complete
+        self.add_bucket(analytics.HOUR, at(9, 1), 6)
+        self.add_bucket(analytics.HOUR, at(9, 2), 1)
+
+        analytics.rollup(now=NOW)
+        analytics.rollup(now=NOW)
+
+        self.assertEqual(buckets(analytics.HOUR), {at(9, 1): 6, at(9, 2): 1, at(10, 11): 5})
+        self.assertEqual(buckets(analytics.DAY), {at(9, 0): 7})
+
+    @override_settings(PRODUCT_VISITS_MINUTE_RETENTION=24)
+    def test_rollup_only_reads_the_recent_buckets(self):
+        """Test that the hours rolled up before the last ROLLUP_OVERLAP ones are not computed again"""
+        for hour in (7, 8, 9):
+            self.add_bucket(analytics.MINUTE, at(10, hour, 45), 2)
+        analytics.rollup(now=at(10, 10, 5))
+        ProductVisitBucket.objects.filter(bucket_start=at(10, 7, 45)).update(count=100)
+        self.add_bucket(analytics.MINUTE, at(10, 11, 5), 3)
+
+        written = analytics.rollup(now=NOW)
+
+        self.assertEqual(written, {analytics.HOUR: 3, analytics.DAY: 0})
+        self.assertEqual(buckets(analytics.HOUR), {at(10, 7): 2, at(10, 8): 2, at(10, 9): 2, at(10, 11): 3})
+
+    def test_rollup_adds_late_visits(self):
+        """Test that visits written in an hour already rolled up reach its hour and day buckets"""
+        self.add_bucket(analytics.MINUTE, at(10, 23, 30), 2)
+        analytics.rollup(now=at(11, 0, 5))
+        # E.g. a flush of 23:59 committed after the rollup
+        self.add_bucket(analytics.MINUTE, at(10, 23, 59), 3)
+
+        analytics.rollup(now=at(11, 0, 15))
+
+        self.assertEqual(buckets(analytics.HOUR), {at(10, 23): 5})
+        self.assertEqual(buckets(analytics.DAY), {at(10, 0): 5})
+
+    def test_compact_deletes_expired_buckets(self):
+        """Test that buckets older than their retention are deleted"""
+        self.add_bucket(analytics.MINUTE, at(10, 10, 29), 1)
+        self.add_bucket(analytics.MINUTE, at(10, 10, 30), 1)
+        self.add_bucket(analytics.HOUR, at(8, 11), 1)
+        self.add_bucket(analytics.HOUR, at(8, 12), 1)
+
+        deleted = analytics.compact(now=NOW)
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(list(buckets(analytics.MINUTE)), [at(10, 10, 30)])
+        self.assertEqual(list(buckets(analytics.HOUR)), [at(8, 12)])
+
+    def test_visit_count_uses_the_finest_kept_buckets(self):
+        """Test that windows add minutes, then hours, then days"""
+        self.add_bucket(analytics.MINUTE, at(10, 12, 10), 3)
+        self.add_bucket(analytics.MINUTE, at(10, 11, 5), 2)
+        self.add_bucket(analytics.MINUTE, at(10, 10, 50), 7)   # Counted in the 10:00 hour
+        self.add_bucket(analytics.HOUR, at(10, 10), 7)
+        self.add_bucket(analytics.HOUR, at(10, 11), 2)         # Counted in the minutes
+        self.add_bucket(analytics.DAY, at(8, 0), 100)
+        self.add_bucket(analytics.DAY, at(9, 0), 50)           # Counted in the hours
+
+        self.assertEqual(analytics.visit_count(self.product.id, analytics.parse_window('1h'), now=NOW), 3)
+        self.assertEqual(analytics.visit_count(self.product.id, analytics.parse_window('3h'), now=NOW), 12)
+        self.assertEqual(analytics.visit_count(self.product.id, analytics.parse_window('3d'), now=NOW), 112)
+
+    def test_parse_window(self):
+        """Test that windows must be positive and within the day retention"""
+        self.assertEqual(analytics.parse_window('90m'), analytics.parse_window('1h') * 1.5)
+        for window in ('', '1w', '0h', '31d', '-1d'):
+            with self.assertRaises(ValueError):
+                analytics.parse_window(window)
+
+    def test_compact_visits_command(self):
+        """Test that the command rolls up and compacts the buckets"""
+        self.add_bucket(analytics.MINUTE, at(1, 10, 0), 1)
+
+        out = StringIO()
+        call_command('compact_visits', stdout=out)
+
+        self.assertIn('deleted 1 expired buckets', out.getvalue())
+
+        self.assertFalse(ProductVisitBucket.objects.filter(resolution=analytics.MINUTE).exists())
+
+
+class VisitAnalyticsApiTests(TestCase):
+    """Test the product visits analytics endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        visit_buffer.clear()
+        self.product_1 = Product.objects.create(sku='sku_0001', name='Test 1', price=10.0, brand='Luuna')
+        self.product_2 = Product.objects.create(sku='sku_0002', name='Test 2', price=20.0, brand='Nooz')
+
+    def tearDown(self):
+        visit_buffer.clear()
+
+    def test_flushed_visits_are_counted(self):
+        """Test that anonymous visits are in the window count once flushed"""
+        url = reverse('products:product_readonly', args=[self.product_1.id])
+        self.client.get(url)
+        self.client.get(url)
+        visit_buffer.flush()
+
+        result = self.client.get(product_visits_url(self.product_1.id), {'window': '1h'})
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data, {'id': self.product_1.id, 'window': '1h', 'visits': 2})
+
+    def test_product_visits_not_found(self):
+        """Test that the visits of an unknown product return 404"""
+        result = self.client.get(product_visits_url(0))
+
+        self.assertEqual(result.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_window(self):
+        """Test that an invalid window returns an error"""
+        result = self.client.get(TRENDING_PRODUCTS_URL, {'window': 'week'})
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_trending_products(self):
+        """Test that trending products are sorted by their visits in the window"""
+        analytics.record_visits({self.product_1.id: 2, self.product_2.id: 5})
+
+        result = self.client.get(TRENDING_PRODUCTS_URL, {'window': '30m'})
+        luuna = self.client.get(TRENDING_PRODUCTS_URL, {'brand': 'Luuna'})
+
+        self.assertEqual([(row['sku'], row['window_visits']) for row in result.data],
+                         [('sku_0002', 5), ('sku_0001', 2)])
+        self.assertEqual([row['sku'] for row in luuna.data], ['sku_0001'])
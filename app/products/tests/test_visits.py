@@ -0,0 +1,219 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from unittest import mock
+
+from core.models import Product
+
+from products.cache import product_cache
+from products.serializers import ProductSerializer
+from products.visits import ATOMIC, VisitBuffer, visit_buffer
+
+
+def unique_product_anonymous_url(product_id=1):
+    """Return product single view URL"""
+    return reverse('products:product_readonly', args=[product_id])
+
+
+class VisitBufferTests(TestCase):
+    """Test the buffered product visits counter"""
+
+    def setUp(self):
+        # No background thread, flushes are triggered by the tests
+        self.buffer = VisitBuffer(flush_interval=None, flush_size=100)
+        self.product_1 = Product.objects.create(sku='sku_0001', name='Test Name', price=10.0, brand='Test Brand')
+        self.product_2 = Product.objects.create(sku='sku_0002', name='Test Name 2', price=20.0, brand='Test Brand')
+
+    def test_record_does_not_write_until_flush(self):
+        """Test that recorded visits are only pending until flushed"""
+        self.assertEqual(self.buffer.record(self.product_1.id), 1)
+        self.assertEqual(self.buffer.record(self.product_1.id), 2)
+
+        self.product_1.refresh_from_db()
+        self.assertEqual(self.product_1.visits, 0)
+        self.assertEqual(self.buffer.pending(self.product_1.id), 2)
+
+    def test_flush_writes_all_pending_visits(self):
+        """Test that a flush increments the visits of many products at once"""
+        for _ in range(3):
+            self.buffer.record(self.product_1.id)
+        self.buffer.record(self.product_2.id, count=5)
+
+        updated = self.buffer.flush()
+
+        self.product_1.refresh_from_db()
+        self.product_2.refresh_from_db()
+        self.assertEqual(updated, 2)
+        self.assertEqual(self.product_1.visits, 3)
+        self.assertEqual(self.product_2.visits, 5)
+        self.assertEqual(self.buffer.pending(self.product_1.id), 0)
+
+    def test_flush_size_triggers_flush(self):
+        """Test that reaching the flush size writes the visits immediately"""
+        buffer = VisitBuffer(flush_interval=None, flush_size=3)
+        for _ in range(3):
+            buffer.record(self.product_1.id)
+
+        self.product_1.refresh_from_db()
+        self.assertEqual(self.product_1.visits, 3)
+
+    def test_failed_flush_keeps_pending_visits(self):
+        """Test that visits are not lost when the DB write fails"""
+        self.buffer.record(self.product_1.id, count=4)
+
+        with mock.patch.object(VisitBuffer, '_write', side_effect=Exception('DB down')), \
+                self.assertLogs('products.visits', level='ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+
+        self.assertEqual(self.buffer.pending(self.product_1.id), 4)
+
+    def test_flush_notifies_listeners(self):
+        """Test that listeners receive the flushed visits"""
+        listener = mock.Mock()
+        self.buffer.add_listener(listener)
+        self.buffer.record(self.product_2.id, count=2)
+
+        self.buffer.flush()
+
+        listener.assert_called_once_with({self.product_2.id: 2})
+
+    def test_written_visits_only_notify_listeners(self):
+        """Test that visits already written to the DB are passed to the listeners but not written again"""
+        listener = mock.Mock()
+        self.buffer.add_listener(listener)
+        self.buffer.record(self.product_1.id, count=2, written=True)
+        self.buffer.record(self.product_1.id)
+
+        self.assertEqual(self.buffer.pending(self.product_1.id), 1)
+        self.buffer.flush()
+
+        self.product_1.refresh_from_db()
+        self.assertEqual(self.product_1.visits, 1)
+        listener.assert_called_once_with({self.product_1.id: 3})
+
+
+class ProductVisitsAPITests(TestCase):
+    """Test visits counting through the anonymous product endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        visit_buffer.clear()
+
+    def tearDown(self):
+        visit_buffer.clear()
+
+    def test_anonymous_visits_are_counted(self):
+        """Test that every anonymous visit is returned and written on flush"""
+        product = Product.objects.create(sku='sku_0001', name='Test Name', price=10.0, brand='Test Brand')
+        url = unique_product_anonymous_url(product.id)
+
+        for visit in range(1, 4):
+            result = self.client.get(url)
+            self.assertEqual(result.status_code, status.HTTP_200_OK)
+            self.assertEqual(result.data['visits'], visit)
+
+        visit_buffer.flush()
+
+        product.refresh_from_db()
+        self.assertEqual(product.visits, 3)
+
+
+@override_settings(PRODUCT_VISITS_MODE=ATOMIC)
+class AtomicProductVisitsAPITests(TestCase):
+    """Test the atomic visits counting of the anonymous product endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.product = Product.objects.create(sku='sku_0001', name='Test Name', price=10.0, brand='Test Brand')
+        product_cache.clear()
+        visit_buffer.clear()
+
+    def tearDown(self):
+        product_cache.clear()
+        visit_buffer.clear()
+
+    def test_visit_is_counted_with_a_single_query(self):
+        """Test that a single query counts the visit and returns the product"""
+        url = unique_product_anonymous_url(self.product.id)
+
+        for visit in range(1, 3):
+            with self.assertNumQueries(1):
+                result = self.client.get(url)
+
+            self.assertEqual(result.status_code, status.HTTP_200_OK)
+            self.assertEqual(result.data, dict(ProductSerializer(self.product).data, visits=visit))
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.visits, 2)
+        self.assertEqual(visit_buffer.pending(self.product.id), 0)
+
+    def test_visit_of_missing_product(self):
+        """Test that a missing product is a 404"""
+        result = self.client.get(unique_product_anonymous_url(self.product.id + 1))
+
+        self.assertEqual(result.status_code, status.HTTP_404_NOT_FOUND)
+
+
+# Each thread uses its own DB connection, the data must be committed
+@override_settings(PRODUCT_VISITS_MODE=ATOMIC)
+class AtomicProductVisitsConcurrencyTests(TransactionTestCase):
+    """Test that concurrent visits and edits of a product are not lost"""
+
+    def setUp(self):
+        self.product = Product.objects.create(sku='sku_0001', name='Test Name', price=10.0, brand='Test Brand')
+        self.user = get_user_model().objects.create_user('user@zebrands.com', 'pass123')
+        product_cache.clear()
+        visit_buffer.clear()
+
+    def tearDown(self):
+        product_cache.clear()
+        visit_buffer.clear()
+
+    def run_threads(self, *targets):
+        errors = []
+
+        def run(target):
+            try:
+                target()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(target, )) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    @mock.patch('products.serializers.create_product_update_notification')
+    def test_concurrent_visits_and_edits(self, notification):
+        """Test that every visit is counted once and concurrent edits are kept"""
+        url = unique_product_anonymous_url(self.product.id)
+        visits = []
+
+        def visit():
+            client = APIClient()
+            for _ in range(10):
+                visits.append(client.get(url).data['visits'])
+
+        def edit():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            for price in range(20, 25):
+                client.patch(reverse('products:product', args=[self.product.id]), {'name': 'New Name', 'price': price})
+
+        self.run_threads(*[visit] * 8, edit)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.visits, 80)
+        self.assertEqual(sorted(visits), list(range(1, 81)))
+        self.assertEqual((self.product.name, self.product.price), ('New Name', 24))
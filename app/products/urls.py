@@ -1,12 +1,19 @@
 from django.urls import path
 
-from products import views
+from products import async_views, views
 
 app_name = 'products'
 
 urlpatterns = [
     path('', views.ProductViewSet.as_view({'get': 'list'}), name='list'),
+    path('async/', async_views.product_list, name='async_list'),
+    path('async/<int:product_id>/', async_views.product_detail, name='async_product_readonly'),
+    path('bulk/', views.BulkProductView.as_view(), name='bulk'),
     path('create/', views.CreateProductView.as_view(), name='create'),
     path('manage/<int:product_id>/', views.ManageProductView.as_view(), name='product'),
+    path('top/', views.TopProductsView.as_view(), name='top'),
+    path('trending/', views.TrendingProductsView.as_view(), name='trending'),
+    path('cache/stats/', views.ProductCacheStatsView.as_view(), name='cache_stats'),
     path('<int:product_id>/', views.ProductView.as_view(), name='product_readonly'),
+    path('<int:product_id>/visits/', views.ProductVisitsView.as_view(), name='product_visits'),
 ]
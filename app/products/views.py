@@ -1,41 +1,182 @@
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Count, Max
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
+from django.utils.translation import gettext as _   # For text translations
 
-from rest_framework import generics, viewsets
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework import generics, status, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+from rest_framework.schemas.openapi import AutoSchema
+from rest_framework.views import APIView
 
 from core.models import Product
-from products import serializers
+from products import analytics, serializers
+from products.bulk import delete_products, upsert_products, validate_products
+from products.cache import product_cache
+from products.filters import ProductFilter, ProductOrderingFilter
+from products.leaderboard import top_products
+from products.pagination import ProductCursorPagination
+from products.parsers import BULK_PARSERS
+from products.renderers import FIELDS, PRODUCT_RENDERERS, product_values
+from products.streaming import STREAMERS, stream_products
+from products.visits import ATOMIC, increment_visits, visit_buffer
+from user.authentication import CachedTokenAuthentication
+from utils.conditional import conditional_response, make_etag
+from utils.sparse_fields import parse_fields
+
+
+def get_limit(request, max_limit, default=10):
+    """Return the `limit` query param, between 1 and max_limit"""
+    try:
+        limit = int(request.query_params.get('limit', default))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= max_limit:
+        raise ValidationError({'limit': _('Must be an integer between 1 and %d.') % max_limit})
+    return limit
+
+
+def get_fields(request):
+    """Return the product fields of the `fields` query param, None for all of them"""
+    return parse_fields(request.query_params.get('fields'), FIELDS)
+
+
+def get_window(request):
+    """Return the timedelta of the `window` query param"""
+    try:
+        return analytics.parse_window(request.query_params.get('window', '1h'))
+    except ValueError:
+        raise ValidationError({'window': _('Invalid window, use e.g. 30m, 1h or 7d, up to the visits retention.')})
+
+
+class CachedProductMixin:
+    """Serves a single product from the product cache, supporting conditional GET requests"""
+
+    def load_cached_product(self):
+        """Return the cache entry of the product: its serialized data and last modification"""
+        product = self.get_object()
+        return {'data': self.get_serializer(product).data, 'updated_at': product.updated_at}
+
+    def cached_product_response(self, request, count_visit=False):
+        """Return the product response, or 304 if the client copy is current
+
+        :param request: Request
+        :param count_visit: bool Record a visit to the product
+        """
+        product_id = self.kwargs['product_id']
+        fields = get_fields(request)
+        visits = 0
+        if count_visit and settings.PRODUCT_VISITS_MODE == ATOMIC:
+            # A single query counts the visit and reads the product
+            row = increment_visits(product_id, FIELDS)
+            if row is None:
+                raise Http404
+            cached = {'updated_at': row.pop('updated_at'), 'data': row}
+            product_cache.set(product_id, cached)
+            visit_buffer.record(product_id, written=True)
+        else:
+            # The cache holds every field, the requested ones are picked from it
+            cached = product_cache.get_or_load(product_id, self.load_cached_product)
+            # Visits are buffered and written to the DB in batches, the
+            # returned product includes the visits that are still pending
+            visits = visit_buffer.record(product_id) if count_visit else 0
+
+        def get_response():
+            data = cached['data']
+            if visits:
+                data = dict(data, visits=data['visits'] + visits)
+            if fields is not None:
+                data = {name: data[name] for name in FIELDS if name in fields}
+            return Response(data)
+
+        # The pending visits are part of the returned product, each counted visit changes it
+        returned_visits = visits if fields is None or 'visits' in fields else 0
+        etag = make_etag(
+            'product', product_id, cached['updated_at'].isoformat(), returned_visits, *sorted(fields or ())
+        )
+        return conditional_response(request, etag, cached['updated_at'], get_response)
 
 
 class ProductViewSet(viewsets.ModelViewSet):
     """
     list:
         Returns all ZeBrands Products in the database, ¡No authentication needed!
+        Filter them with the `brand`, `min_price`, `max_price`, `name` (contains) and
+        `name_prefix` query params, and sort them with `ordering` (`price`, `visits`, `id`,
+        prefixed with `-` for descending order).
+        Use the `page_size` and `cursor` query params to get the products page by page,
+        or `stream=json` / `stream=ndjson` to stream the whole catalog.
+        Use `fields` to get only some fields of the products, e.g. `fields=id,sku,price`.
+        Send `Accept: application/vnd.zebrands.columnar+json` to get one array per field,
+        or `Accept: application/x-msgpack` to get MessagePack.
     """
     serializer_class = serializers.ProductSerializer
     queryset = Product.objects.all()
+    pagination_class = ProductCursorPagination
+    renderer_classes = (*PRODUCT_RENDERERS, BrowsableAPIRenderer)
+    filter_backends = (ProductFilter, ProductOrderingFilter)
+    ordering_fields = ('id', 'price', 'visits')
+    ordering = ('id', )
+
+    def list(self, request, *args, **kwargs):
+        fields = get_fields(request)
+        stream_format = request.query_params.get('stream')
+        if stream_format is not None:
+            if stream_format not in STREAMERS:
+                raise ValidationError({'stream': _('Invalid format, choose one of: %s') % ', '.join(STREAMERS)})
+            return stream_products(self.filter_queryset(self.get_queryset()), stream_format, fields)
+
+        # The list only changes when a product is created, updated or deleted,
+        # a single aggregate query tells if the client copy is current
+        state = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            count=Count('id'), last_modified=Max('updated_at')
+        )
+        etag = make_etag(
+            'products', request.get_full_path(), request.META.get('HTTP_ACCEPT', ''),
+            state['count'], state['last_modified']
+        )
+        return conditional_response(request, etag, state['last_modified'], lambda: self.list_response(fields))
+
+    def list_response(self, fields=None):
+        """Return the product list, read as plain rows instead of serializing model instances
+
+        :param fields: Names of the product fields to return, None for all of them
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        if not self.paginator.is_requested(self.request):
+            return Response(list(product_values(queryset, fields)))
 
+        # The page cursors are made from the ordering field of the rows, it is
+        # read even when not requested and removed once the links are built
+        ordering = self.paginator.get_ordering(self.request, queryset, self)[0].lstrip('-')
+        page = self.paginate_queryset(product_values(queryset, fields and [*fields, ordering]))
+        response = self.get_paginated_response(page)
+        if fields is not None and ordering not in fields:
+            for row in page:
+                del row[ordering]
+        return response
 
-class ProductView(generics.RetrieveAPIView):
+
+class ProductView(CachedProductMixin, generics.RetrieveAPIView):
     """
     get:
         Returns a single ZeBrands product given an ID, ¡No authentication needed!
+        Use `fields` to get only some fields of the product, e.g. `fields=id,sku,price`.
     """
     serializer_class = serializers.ProductSerializer
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (CachedTokenAuthentication, )
 
     def get_object(self):
-        product = get_object_or_404(Product, id=self.kwargs['product_id'])
+        """ Retrieves and return a product, given its ID"""
+        return get_object_or_404(Product, id=self.kwargs['product_id'])
 
+    def retrieve(self, request, *args, **kwargs):
         # If the user is anonymous, then increment product visits
-        if not self.request.user.is_authenticated:
-            product.visits += 1
-            product.save()
-
-        # product = get_object_or_404(Product, id=self.kwargs['product_id'])
-        return product
+        return self.cached_product_response(request, count_visit=not request.user.is_authenticated)
 
 
 class CreateProductView(generics.CreateAPIView):
@@ -43,12 +184,16 @@ class CreateProductView(generics.CreateAPIView):
     post:
         Creates a ZeBrands product, ¡Authentication needed!
     """
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (CachedTokenAuthentication, )
     permission_classes = (IsAuthenticated, )
     serializer_class = serializers.ProductSerializer
 
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        top_products.clear()
 
-class ManageProductView(generics.RetrieveUpdateDestroyAPIView):
+
+class ManageProductView(CachedProductMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     get:
         Returns single ZeBrands product given an ID, ¡Authentication needed!
@@ -62,17 +207,136 @@ class ManageProductView(generics.RetrieveUpdateDestroyAPIView):
     delete:
         Deletes a ZeBrands product given an ID, ¡Authentication needed!
     """
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (CachedTokenAuthentication, )
     permission_classes = (IsAuthenticated, )
     serializer_class = serializers.ProductSerializer
+    # The public ProductView already has the retrieveProduct operation
+    schema = AutoSchema(operation_id_base='ManagedProduct')
 
     def get_object(self):
         """ Retrieves and return a product, given its ID"""
         product = get_object_or_404(Product, id=self.kwargs['product_id'])
         return product
 
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_product_response(request)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        top_products.clear()
+
     def delete(self, request, *args, **kwargs):
         product = get_object_or_404(Product, id=self.kwargs['product_id'])
         product.delete()
+        product_cache.invalidate(self.kwargs['product_id'])
+        top_products.clear()
 
         return HttpResponse(status=200)
+
+
+class BulkProductView(APIView):
+    """
+    post:
+        Creates or updates (by SKU) many ZeBrands products given a list of products,
+        as a JSON array, NDJSON, MessagePack or columnar JSON (one array per field), ¡Authentication needed!
+        Returns the number of products created and updated, and the errors of the invalid items.
+
+    delete:
+        Deletes many ZeBrands products given their IDs in `ids`, ¡Authentication needed!
+    """
+    authentication_classes = (CachedTokenAuthentication, )
+    permission_classes = (IsAuthenticated, )
+    parser_classes = BULK_PARSERS
+    renderer_classes = (*PRODUCT_RENDERERS, BrowsableAPIRenderer)
+
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'detail': _('Expected a list of products.')})
+        if len(items) > settings.PRODUCT_BULK_MAX_ITEMS:
+            raise ValidationError({'detail': _('At most %d products per request.') % settings.PRODUCT_BULK_MAX_ITEMS})
+
+        products, errors = validate_products(items)
+        try:
+            created, updated = upsert_products(products)
+        except IntegrityError:
+            # Another request created some of the SKUs at the same time
+            return Response({'detail': _('Conflicting concurrent write, please retry.')}, status=status.HTTP_409_CONFLICT)
+
+        return Response(
+            {'created': len(created), 'updated': len(updated), 'errors': errors},
+            status=status.HTTP_207_MULTI_STATUS if errors else status.HTTP_200_OK
+        )
+
+    def delete(self, request, *args, **kwargs):
+        serializer = serializers.BulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        deleted = delete_products(serializer.validated_data['ids'])
+
+        return Response({'deleted': deleted})
+
+
+class TopProductsView(APIView):
+    """
+    get:
+        Returns the most visited ZeBrands products, ¡No authentication needed!
+        Use `limit` to set the number of products (default 10) and `brand` to get
+        the most visited products of a brand.
+    """
+    authentication_classes = (CachedTokenAuthentication, )
+    renderer_classes = (*PRODUCT_RENDERERS, BrowsableAPIRenderer)
+
+    def get(self, request, *args, **kwargs):
+        limit = get_limit(request, top_products.size)
+
+        return Response(top_products.top(limit, brand=request.query_params.get('brand')))
+
+
+class ProductVisitsView(APIView):
+    """
+    get:
+        Returns the visits of a ZeBrands product during the last `window`
+        (e.g. `30m`, `1h`, `7d`, default `1h`), ¡No authentication needed!
+    """
+    authentication_classes = (CachedTokenAuthentication, )
+
+    def get(self, request, *args, **kwargs):
+        product = get_object_or_404(Product.objects.only('id'), id=self.kwargs['product_id'])
+        window = get_window(request)
+
+        return Response({
+            'id': product.id,
+            'window': request.query_params.get('window', '1h'),
+            'visits': analytics.visit_count(product.id, window),
+        })
+
+
+class TrendingProductsView(APIView):
+    """
+    get:
+        Returns the most visited ZeBrands products during the last `window`
+        (e.g. `30m`, `1h`, `7d`, default `1h`), ¡No authentication needed!
+        Use `limit` to set the number of products (default 10) and `brand`
+        to get the trending products of a brand.
+    """
+    authentication_classes = (CachedTokenAuthentication, )
+    renderer_classes = (*PRODUCT_RENDERERS, BrowsableAPIRenderer)
+
+    def get(self, request, *args, **kwargs):
+        window = get_window(request)
+        limit = get_limit(request, settings.PRODUCT_TOP_SIZE)
+
+        return Response(analytics.trending(window, limit, brand=request.query_params.get('brand')))
+
+
+class ProductCacheStatsView(APIView):
+    """
+    get:
+        Returns the hit/miss counters of the products cache, ¡Admin users only!
+    """
+    authentication_classes = (CachedTokenAuthentication, )
+    permission_classes = (IsAdminUser, )
+
+    def get(self, request, *args, **kwargs):
+        return Response(product_cache.stats())
@@ -0,0 +1,204 @@
+"""
+Buffered visit counter for products.
+
+Anonymous product reads only record the visit in memory, a background
+thread periodically writes all the pending counts with batched
+``UPDATE ... SET visits = visits + n`` statements.
+
+In the atomic mode (PRODUCT_VISITS_MODE) each read increments the visits
+of the product with a single ``UPDATE ... RETURNING`` that also returns
+the row to serialize. The buffer then only batches the visits for its
+listeners.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from core.models import Product
+
+logger = logging.getLogger(__name__)
+
+# Max number of products updated by a single UPDATE statement
+UPDATE_BATCH_SIZE = 500
+
+# Visit modes, see PRODUCT_VISITS_MODE
+BUFFERED = 'buffered'
+ATOMIC = 'atomic'
+
+INCREMENT_SQL = f"""
+UPDATE {Product._meta.db_table} SET visits = visits + %s, updated_at = %s WHERE id = %s
+RETURNING {{columns}}
+"""
+
+
+def increment_visits(product_id, fields, count=1):
+    """Increment the visits of a product and return its updated row, in a single query
+
+    :param product_id: int Product ID
+    :param fields: Names of the product fields of the returned row
+    :param count: int Number of visits
+    :return: dict Row with the fields and `updated_at`, None if the product does not exist
+    """
+    names = [*fields, 'updated_at']
+    columns = ', '.join(connection.ops.quote_name(Product._meta.get_field(name).column) for name in names)
+    with connection.cursor() as cursor:
+        cursor.execute(INCREMENT_SQL.format(columns=columns), [count, timezone.now(), product_id])
+        row = cursor.fetchone()
+
+    return dict(zip(names, row)) if row is not None else None
+
+
+class VisitBuffer:
+    """Aggregates product visits in memory and flushes them in batches"""
+
+    def __init__(self, flush_interval=5.0, flush_size=1000):
+        """
+        :param flush_interval: float Seconds between background flushes,
+            a falsy value disables the background thread
+        :param flush_size: int Pending visits that trigger an immediate flush
+        """
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._pending = Counter()
+        self._written = Counter()  # Visits already in the DB, only for the listeners
+        self._pending_total = 0
+        self._lock = threading.Lock()        # Guards the pending counters
+        self._flush_lock = threading.Lock()  # Only one flush at a time
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    def record(self, product_id, count=1, flush=True, written=False):
+        """Record visits for a product
+
+        :param product_id: int Product ID
+        :param count: int Number of visits
+        :param flush: bool Flush right away when the flush size is reached,
+            callers that must not block check needs_flush() instead
+        :param written: bool The visits are already written to the DB,
+            the next flush only passes them to the listeners
+        :return: int Visits of the product not yet written to the DB
+        """
+        with self._lock:
+            if written:
+                self._written[product_id] += count
+            else:
+                self._pending[product_id] += count
+            self._pending_total += count
+            pending = self._pending.get(product_id, 0)
+
+        self.start()
+        if flush and self.needs_flush():
+            self.flush()
+
+        return pending
+
+    def needs_flush(self):
+        """Return True if the pending visits reached the flush size"""
+        return self._pending_total >= self.flush_size
+
+    def pending(self, product_id):
+        """Return the visits of a product that are not yet written to the DB"""
+        with self._lock:
+            return self._pending.get(product_id, 0)
+
+    def add_listener(self, callback):
+        """Register a callback called with the {product_id: visits} written on each flush"""
+        self._listeners.append(callback)
+
+    def clear(self):
+        """Discard all the pending visits"""
+        with self._lock:
+            self._pending = Counter()
+            self._written = Counter()
+            self._pending_total = 0
+
+    def flush(self):
+        """Write all the pending visits to the DB
+
+        :return: int Number of products updated
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+                written, self._written = self._written, Counter()
+                self._pending_total = 0
+
+            if not pending and not written:
+                return 0
+
+            try:
+                if pending:
+                    self._write(pending)
+            except Exception:
+                logger.exception('Unable to flush %s product visits', sum(pending.values()))
+                # Put the visits back, so they are written on the next flush
+                with self._lock:
+                    self._pending.update(pending)
+                    self._written.update(written)
+                    self._pending_total += sum(pending.values()) + sum(written.values())
+                return 0
+
+        visits = pending + written
+        for callback in self._listeners:
+            try:
+                callback(dict(visits))
+            except Exception:
+                logger.exception('Visit flush listener %r failed', callback)
+
+        return len(visits)
+
+    @staticmethod
+    def _write(pending):
+        """Increment the visits of many products with batched UPDATE statements"""
+        items = list(pending.items())
+        now = timezone.now()
+        with transaction.atomic():
+            for start in range(0, len(items), UPDATE_BATCH_SIZE):
+                batch = items[start:start + UPDATE_BATCH_SIZE]
+                increment = Case(
+                    *[When(id=product_id, then=Value(count)) for product_id, count in batch],
+                    output_field=IntegerField()
+                )
+                Product.objects.filter(
+                    id__in=[product_id for product_id, _ in batch]
+                ).update(visits=F('visits') + increment, updated_at=now)
+
+    def start(self):
+        """Start the background flusher thread if it is not running"""
+        if self._thread is not None or not self.flush_interval:
+            return
+
+        with self._flush_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='visit-buffer-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the background flusher and write the remaining visits"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop_event.clear()
+        self.flush()
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            if self.flush():
+                # Do not keep a DB connection open between flushes
+                connections.close_all()
+
+
+visit_buffer = VisitBuffer(
+    flush_interval=settings.PRODUCT_VISITS_FLUSH_INTERVAL,
+    flush_size=settings.PRODUCT_VISITS_FLUSH_SIZE
+)
@@ -0,0 +1,162 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model, load_backend, user_login_failed
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+from django.contrib.auth.hashers import check_password, make_password
+
+from rest_framework.authentication import TokenAuthentication
+
+from utils.instrumentation import AUTH, timing
+from utils.lru_cache import TTLCache
+from utils.pool import BoundedPool
+
+# token key: (version, (user, token)), the version is the one of the shared cache when it was cached
+token_cache = TTLCache(maxsize=settings.TOKEN_AUTH_CACHE_SIZE, ttl=settings.TOKEN_AUTH_CACHE_TTL)
+
+# Version of the cached tokens in the shared cache, bumped by every invalidation
+# so that the other worker processes drop the tokens they cached before it
+VERSION_KEY = 'token-auth:version'
+
+# Password hashes are checked by a few threads, so that a burst of logins
+# can not use every CPU and every request thread of the workers
+hashing_pool = BoundedPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    name='password-hashing'
+)
+
+
+def shared_cache():
+    """Return the Django cache shared by the worker processes, None if there is none"""
+    alias = settings.TOKEN_AUTH_CACHE_SHARED_ALIAS
+    return caches[alias] if alias else None
+
+
+def cache_version():
+    """Return the current version of the cached tokens, always 0 without a shared cache"""
+    shared = shared_cache()
+    return shared.get(VERSION_KEY, 0) if shared is not None else 0
+
+
+def bump_cache_version():
+    """Invalidate the tokens cached by every worker process"""
+    shared = shared_cache()
+    if shared is None:
+        return
+    # The version never expires, an expired one would go back to a value already cached
+    shared.add(VERSION_KEY, 0, timeout=None)
+    try:
+        shared.incr(VERSION_KEY)
+    except ValueError:
+        # Evicted between add() and incr()
+        shared.set(VERSION_KEY, 1, timeout=None)
+
+
+def get_cached_credentials(key):
+    """Return the cached (user, token) of a token key, or None if it is not cached or outdated"""
+    entry = token_cache.get(key)
+    if entry is None:
+        return None
+    version, credentials = entry
+    if version != cache_version():
+        token_cache.delete(key)
+        return None
+    return credentials
+
+
+def invalidate_token(key):
+    """Remove a token from the authentication cache"""
+    token_cache.delete(key)
+    bump_cache_version()
+
+
+def invalidate_user(user_id):
+    """Remove every cached token of a user"""
+    token_cache.delete_where(lambda entry: entry[1][0].pk == user_id)
+    bump_cache_version()
+
+
+def authenticate_password(email, password, request=None):
+    """Return the active user with the given email and password, or None
+
+    Works like django.contrib.auth.authenticate: every AUTHENTICATION_BACKENDS
+    is tried in order and user_login_failed is sent when none accepts the
+    credentials. The only difference is the ModelBackend, replaced by
+    check_model_password so its password hash is checked in the hashing pool.
+
+    :raise PoolFull: If too many passwords are being checked
+    """
+    for path in settings.AUTHENTICATION_BACKENDS:
+        backend = load_backend(path)
+        try:
+            if type(backend).authenticate is ModelBackend.authenticate:
+                user = check_model_password(email, password, backend)
+            else:
+                user = backend.authenticate(request, username=email, password=password)
+        except PermissionDenied:
+            # The backend rejects the credentials, the next ones are not tried
+            break
+        if user is not None:
+            user.backend = path
+            return user
+
+    user_login_failed.send(
+        sender=__name__, credentials={'email': email, 'password': '*' * 20}, request=request
+    )
+    return None
+
+
+def check_model_password(email, password, backend):
+    """Return the user of the ModelBackend with the given email and password, or None
+
+    The user is read in the calling thread, the password hash is checked in the hashing pool.
+    """
+    user_model = get_user_model()
+    try:
+        user = user_model._default_manager.get_by_natural_key(email)
+    except user_model.DoesNotExist:
+        # Hash the password anyway, so that unknown emails take as long as wrong passwords
+        hashing_pool.run(make_password, password)
+        return None
+
+    outdated = []  # The setter is only called when the hash must be updated
+    if not hashing_pool.run(check_password, password, user.password, outdated.append) \
+            or not backend.user_can_authenticate(user):
+        return None
+
+    if outdated:
+        # Rehash with the current hasher and number of iterations
+        user.password = hashing_pool.run(make_password, password)
+        user.save(update_fields=['password'])
+
+    return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the token -> user resolution
+
+    Drop-in replacement of the DRF TokenAuthentication, valid tokens are
+    kept in a bounded in-memory cache for a short TTL so that repeated
+    requests with the same token do not query the DB.
+    Invalid tokens and inactive users are never cached.
+
+    Each worker process has its own cache. With TOKEN_AUTH_CACHE_SHARED_ALIAS
+    every hit checks the version of the shared cache, so a deleted token or
+    a deactivated user is rejected by every worker right away. Without it, the
+    other workers accept them until their cached entry expires.
+    """
+
+    def authenticate(self, request):
+        with timing(AUTH):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        credentials = get_cached_credentials(key)
+        if credentials is None:
+            # Read before the token, an invalidation while it is read makes the entry outdated
+            version = cache_version()
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(key, (version, credentials))
+
+        return credentials
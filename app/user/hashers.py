@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2 hasher whose number of iterations is set with PASSWORD_HASH_ITERATIONS
+
+    Passwords hashed with a different number of iterations are rehashed
+    the next time their user logs in.
+    """
+    iterations = settings.PASSWORD_HASH_ITERATIONS
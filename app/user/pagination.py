@@ -0,0 +1,9 @@
+from django.conf import settings
+
+from utils.pagination import OptInCursorPagination
+
+
+class UserCursorPagination(OptInCursorPagination):
+    """Keyset pagination of users ordered by ID, see OptInCursorPagination"""
+    page_size = settings.USER_LIST_PAGE_SIZE
+    max_page_size = settings.USER_LIST_MAX_PAGE_SIZE
@@ -1,17 +1,26 @@
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
 from django.utils.translation import ugettext_lazy as _  # For text translation
 
 from rest_framework import serializers
+from rest_framework.exceptions import Throttled
 
+from user.authentication import authenticate_password
+from utils.instrumentation import TimedListSerializer, TimedSerializerMixin
+from utils.pool import PoolFull
+from utils.sparse_fields import SparseFieldsSerializerMixin
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(TimedSerializerMixin, SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer for the users object"""
 
     class Meta:
         model = get_user_model()
-        fields = ('id', 'email', 'password', 'name')
-        read_only_fields = ('id', )
+        fields = ('id', 'email', 'password', 'name', 'groups', 'user_permissions')
+        read_only_fields = ('id', 'groups', 'user_permissions')
+        # Only output when requested with ?fields=
+        optional_fields = ('groups', 'user_permissions')
         extra_kwargs = {'password': {'write_only': True}}  # Extra Args for Password
+        list_serializer_class = TimedListSerializer
 
     def create(self, validated_data):
         """Create a new user with encrypted password and return it"""
@@ -42,11 +51,11 @@ class AuthTokenSerializer(serializers.Serializer):
         email = attrs.get('email')
         password = attrs.get('password')
 
-        user = authenticate(
-            request=self.context.get('request'),
-            username=email,
-            password=password
-        )
+        try:
+            user = authenticate_password(email, password, self.context.get('request'))
+        except PoolFull:
+            # Too many logins are being checked, the client should retry soon
+            raise Throttled(wait=1)
 
         if not user:
             msg = _('Unable to authenticate with provided credentials')
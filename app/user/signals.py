@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_token, invalidate_user
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """A deleted token can not be used anymore"""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, **kwargs):
+    """Drop the cached user, it may have been deactivated or changed"""
+    invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=get_user_model())
+def user_deleted(sender, instance, **kwargs):
+    """A deleted user can not be authenticated anymore"""
+    invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+@receiver(m2m_changed, sender=get_user_model().user_permissions.through)
+def user_relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Bump the updated_at of the users whose groups or permissions changed
+
+    The user ETags are built from updated_at, which the many-to-many fields do not change.
+    """
+    user_model = get_user_model()
+    if not reverse:
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        user_ids = [instance.pk]
+    elif action in ('post_add', 'post_remove'):
+        user_ids = list(pk_set)
+    elif action == 'pre_clear':
+        # Once cleared, the users of the group or permission are not known anymore
+        field = 'groups' if sender is user_model.groups.through else 'user_permissions'
+        user_ids = list(user_model.objects.filter(**{field: instance}).values_list('pk', flat=True))
+    else:
+        return
+
+    user_model.objects.filter(pk__in=user_ids).update(updated_at=timezone.now())
+    for user_id in user_ids:
+        # The cached users keep their previous permissions
+        invalidate_user(user_id)
@@ -0,0 +1,214 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model, user_login_failed
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import authenticate_password, bump_cache_version, hashing_pool, token_cache
+from user.hashers import PBKDF2PasswordHasher
+from user.throttling import LoginRateThrottle
+from utils.pool import PoolFull
+
+LIST_USERS_URL = reverse('user:list')
+TOKEN_URL = reverse('user:token')
+
+
+class LockedEmailBackend:
+    """Authentication backend that rejects the credentials of locked@zebrands.com"""
+
+    def authenticate(self, request, username=None, password=None):
+        if username == 'locked@zebrands.com':
+            raise PermissionDenied
+        return None
+
+
+def unique_user_url(user_id=1):
+    """Return user manage URL"""
+    return reverse('user:user', args=[user_id])
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test the cached token authentication"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@zebrands.com',
+            password='pass123',
+            name='User Full Name'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def test_token_is_resolved_from_cache(self):
+        """Test that only the first request with a token queries it"""
+        url = unique_user_url(self.user.id)
+        self.client.get(url)
+
+        # Only the user query is run
+        with self.assertNumQueries(1):
+            result = self.client.get(url)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+
+    def test_invalid_token_fails(self):
+        """Test that an unknown token is rejected"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        result = self.client.get(LIST_USERS_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_is_invalidated(self):
+        """Test that a cached token can not be used once deleted"""
+        self.client.get(LIST_USERS_URL)
+
+        self.token.delete()
+        result = self.client.get(LIST_USERS_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_invalidated(self):
+        """Test that a cached token of a deactivated user is rejected"""
+        self.client.get(LIST_USERS_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        result = self.client.get(LIST_USERS_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_is_invalidated(self):
+        """Test that the token of a user deleted through the API is rejected"""
+        self.client.get(LIST_USERS_URL)
+
+        result = self.client.delete(unique_user_url(self.user.id))
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+
+        result = self.client.get(LIST_USERS_URL)
+        self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(
+        CACHES={**settings.CACHES, 'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                              'LOCATION': 'token-auth-tests'}},
+        TOKEN_AUTH_CACHE_SHARED_ALIAS='shared'
+    )
+    def test_invalidation_by_another_worker(self):
+        """Test that a token revoked by another worker is rejected once the shared version is bumped"""
+        self.client.get(LIST_USERS_URL)
+        # Deleted without signals, like by another process whose invalidation only reaches the shared cache
+        Token.objects.filter(key=self.token.key)._raw_delete('default')
+        self.assertEqual(self.client.get(LIST_USERS_URL).status_code, status.HTTP_200_OK)
+
+        bump_cache_version()
+        result = self.client.get(LIST_USERS_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TokenIssuanceTests(TestCase):
+    """Test the token endpoint password checks, token reuse and throttling"""
+
+    def setUp(self):
+        cache.clear()  # Throttling history
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(email='test@zebrands.com', password='pass123')
+        self.client = APIClient()
+        self.credentials = {'email': 'test@zebrands.com', 'password': 'pass123'}
+
+    def tearDown(self):
+        cache.clear()
+        token_cache.clear()
+
+    def test_valid_token_is_returned_without_hashing(self):
+        """Test that a request with a valid token gets it back without checking the password"""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        with mock.patch.object(hashing_pool, 'run') as run:
+            result = self.client.post(TOKEN_URL, {'email': 'test@zebrands.com'})
+
+        run.assert_not_called()
+        self.assertEqual(result.data, {'token': token.key})
+
+    def test_token_of_another_user_checks_the_password(self):
+        """Test that a valid token of another email does not skip the password check"""
+        other = get_user_model().objects.create_user(email='other@zebrands.com', password='pass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=other).key}')
+
+        result = self.client.post(TOKEN_URL, {'email': 'test@zebrands.com', 'password': 'wrong'})
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_logins_are_throttled_per_email_and_ip(self):
+        """Test that token requests beyond the login rate are rejected"""
+        with mock.patch.object(LoginRateThrottle, 'rate', '2/min', create=True):
+            results = [self.client.post(TOKEN_URL, self.credentials).status_code for _ in range(3)]
+            other_email = self.client.post(TOKEN_URL, {'email': 'other@zebrands.com', 'password': 'pass123'})
+
+        self.assertEqual(results, [status.HTTP_200_OK, status.HTTP_200_OK, status.HTTP_429_TOO_MANY_REQUESTS])
+        self.assertEqual(other_email.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_busy_hashing_pool_rejects_logins(self):
+        """Test that logins are rejected when the hashing pool is full"""
+        with mock.patch.object(hashing_pool, 'run', side_effect=PoolFull):
+            result = self.client.post(TOKEN_URL, self.credentials)
+
+        self.assertEqual(result.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', result)
+
+    def test_password_is_rehashed_with_the_current_iterations(self):
+        """Test that a password hashed with other iterations is updated on login"""
+        hasher = PBKDF2PasswordHasher()
+        self.user.password = hasher.encode('pass123', hasher.salt(), iterations=1000)
+        self.user.save()
+
+        self.assertEqual(authenticate_password('test@zebrands.com', 'pass123'), self.user)
+
+        self.user.refresh_from_db()
+        self.assertEqual(hasher.decode(self.user.password)['iterations'], settings.PASSWORD_HASH_ITERATIONS)
+
+    def test_inactive_user_is_not_authenticated(self):
+        """Test that the password of an inactive user is rejected"""
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(authenticate_password('test@zebrands.com', 'pass123'))
+
+    def test_failed_login_is_signaled(self):
+        """Test that user_login_failed is sent without the password when the credentials are wrong"""
+        handler = mock.Mock()
+        user_login_failed.connect(handler)
+        self.addCleanup(user_login_failed.disconnect, handler)
+
+        result = self.client.post(TOKEN_URL, {'email': 'test@zebrands.com', 'password': 'wrong'})
+
+        self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+        handler.assert_called_once()
+        self.assertEqual(handler.call_args.kwargs['credentials']['email'], 'test@zebrands.com')
+        self.assertNotIn('wrong', handler.call_args.kwargs['credentials'].values())
+        self.assertIsNotNone(handler.call_args.kwargs['request'])
+
+    def test_authentication_backends_are_used(self):
+        """Test that the backends before the ModelBackend can reject credentials"""
+        get_user_model().objects.create_user(email='locked@zebrands.com', password='pass123')
+        backends = ['user.tests.test_authentication.LockedEmailBackend', 'django.contrib.auth.backends.ModelBackend']
+
+        with override_settings(AUTHENTICATION_BACKENDS=backends):
+            locked = authenticate_password('locked@zebrands.com', 'pass123')
+            user = authenticate_password('test@zebrands.com', 'pass123')
+
+        self.assertIsNone(locked)
+        self.assertEqual(user, self.user)
+        self.assertEqual(user.backend, 'django.contrib.auth.backends.ModelBackend')
@@ -1,5 +1,6 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
 from django.urls import reverse
 
 from rest_framework.test import APIClient   # To make requests to our API
@@ -232,3 +233,126 @@ class PrivateUserAPITests(TestCase):
         response = self.client.put(url, data)
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UserConditionalRequestsTests(TestCase):
+    """Test ETag support of the user read endpoints"""
+
+    def setUp(self):
+        self.user = create_user(email='test@zebrands.com', password='pass123', name='User Full Name')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_user_list_not_modified(self):
+        """Test that a current user list is not sent again"""
+        etag = self.client.get(LIST_USERS_URL)['ETag']
+
+        result = self.client.get(LIST_USERS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(result.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_user_list_changes_when_user_created(self):
+        """Test that a new user changes the list ETag"""
+        etag = self.client.get(LIST_USERS_URL)['ETag']
+
+        create_user(email='user1@zebrands.com', password='p111', name='User One')
+        result = self.client.get(LIST_USERS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+
+    def test_user_not_modified_until_updated(self):
+        """Test the ETag of a single user"""
+        url = unique_user_url(self.user.id)
+        etag = self.client.get(url)['ETag']
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(url, {'name': 'New Name'})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_groups_change_the_etags(self):
+        """Test that adding or removing the groups of a user changes its ETags"""
+        group = Group.objects.create(name='Editors')
+        url = unique_user_url(self.user.id)
+        etag = self.client.get(url)['ETag']
+        list_etag = self.client.get(LIST_USERS_URL, {'fields': 'id,groups'})['ETag']
+
+        self.user.groups.add(group)
+        result = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        result = self.client.get(LIST_USERS_URL, {'fields': 'id,groups'}, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+
+        # Cleared from the group side
+        etag = self.client.get(url)['ETag']
+        group.user_set.clear()
+        result = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+
+
+class UserListFieldsTests(TestCase):
+    """Test the sparse fieldsets and the pagination of the user list"""
+
+    def setUp(self):
+        self.user = create_user(email='test@zebrands.com', password='pass123', name='User Full Name')
+        self.group = Group.objects.create(name='Managers')
+        self.user.groups.add(self.group)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_users(self, count):
+        """Create users with a group and a permission, without hashing passwords"""
+        start = get_user_model().objects.count()
+        users = get_user_model().objects.bulk_create([
+            get_user_model()(email=f'user{index}@zebrands.com', name=f'User {index}', password='!')
+            for index in range(start, start + count)
+        ])
+        permission = Permission.objects.first()
+        for user in users:
+            user.groups.add(self.group)
+            user.user_permissions.add(permission)
+
+    def test_list_with_requested_fields(self):
+        """Test that only the requested fields are returned"""
+        result = self.client.get(LIST_USERS_URL, {'fields': 'id,email'})
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(result.data, [{'id': self.user.id, 'email': self.user.email}])
+
+    def test_list_with_related_fields(self):
+        """Test that optional related fields are only returned when requested"""
+        default = self.client.get(LIST_USERS_URL)
+        result = self.client.get(LIST_USERS_URL, {'fields': 'email,groups'})
+
+        self.assertNotIn('groups', default.data[0])
+        self.assertEqual(result.data, [{'email': self.user.email, 'groups': [self.group.id]}])
+
+    def test_list_with_unknown_field(self):
+        """Test that unknown and write only fields can not be requested"""
+        for fields in ('id,salary', 'password', ''):
+            result = self.client.get(LIST_USERS_URL, {'fields': fields})
+
+            self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_is_paginated_with_page_size(self):
+        """Test that page_size returns a page of users and a link to the next one"""
+        self.create_users(2)
+
+        result = self.client.get(LIST_USERS_URL, {'page_size': 2, 'fields': 'email'})
+        second = self.client.get(result.data['next'])
+
+        self.assertEqual(len(result.data['results']), 2)
+        self.assertEqual(second.data['results'], [{'email': 'user2@zebrands.com'}])
+        self.assertIsNone(second.data['next'])
+
+    def test_number_of_queries_does_not_depend_on_the_users(self):
+        """Test that the list runs the same queries for any number of users"""
+        params = {'fields': 'id,email,groups,user_permissions'}
+        for count in (1, 10, 50):
+            self.create_users(count - get_user_model().objects.count())
+
+            # ETag aggregate, users, groups and permissions
+            with self.assertNumQueries(4):
+                result = self.client.get(LIST_USERS_URL, params)
+
+            self.assertEqual(len(result.data), count)
@@ -0,0 +1,21 @@
+import hashlib
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginRateThrottle(SimpleRateThrottle):
+    """Limits the token requests of each email from each IP, see the `login` rate
+
+    Requests authenticated with a valid token are not throttled, they get
+    their token back without checking a password.
+    """
+    scope = 'login'
+
+    def get_cache_key(self, request, view):
+        if request.auth is not None:
+            return None
+
+        email = request.data.get('email', '') if hasattr(request.data, 'get') else ''
+        # Hashed, emails may have characters that are not valid in cache keys
+        ident = hashlib.md5(f'{str(email).lower()}:{self.get_ident(request)}'.encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -1,12 +1,19 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Max
 from django.shortcuts import get_object_or_404
 from django.http import HttpResponse
 
-from rest_framework import authentication, generics, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from user.authentication import CachedTokenAuthentication
+from user.pagination import UserCursorPagination
 from user.serializers import UserSerializer, AuthTokenSerializer
+from user.throttling import LoginRateThrottle
+from utils.conditional import conditional_response, make_etag
+from utils.sparse_fields import SparseFieldsetMixin
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -15,7 +22,7 @@ class CreateUserView(generics.CreateAPIView):
         Creates a ZeBrands user in the system, ¡Authentication needed!
     """
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     # Only authenticated users can Create new Users
     permission_classes = (permissions.IsAuthenticated,)
 
@@ -24,21 +31,48 @@ class CreateTokenView(ObtainAuthToken):
     """
     post:
         Creates a new Token for a ZeBrands user, ¡Authentication needed!
+        Requests authenticated with a valid token get it back without checking the password.
     """
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    authentication_classes = (CachedTokenAuthentication,)
+    throttle_classes = (LoginRateThrottle,)
 
+    def post(self, request, *args, **kwargs):
+        # The password hash is expensive, a still valid token is returned as is
+        if request.auth is not None and isinstance(request.data, dict) \
+                and request.data.get('email', request.user.email) == request.user.email:
+            return Response({'token': request.auth.key})
 
-class UserViewSet(generics.ListAPIView):
+        return super().post(request, *args, **kwargs)
+
+
+class UserViewSet(SparseFieldsetMixin, generics.ListAPIView):
     """
     get:
         Returns all ZeBrands users in the database, ¡Authentication needed!
+        Use `fields` to choose the fields of each user (e.g. `?fields=id,email,groups`),
+        and the `page_size` and `cursor` query params to get the users page by page.
     """
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = UserCursorPagination
     queryset = get_user_model().objects.all()
 
+    def list(self, request, *args, **kwargs):
+        # A single aggregate query tells if the client copy of the list is current
+        state = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            count=Count('id'), last_modified=Max('updated_at')
+        )
+        etag = make_etag(
+            'users', request.get_full_path(), request.META.get('HTTP_ACCEPT', ''),
+            state['count'], state['last_modified']
+        )
+        return conditional_response(
+            request, etag, state['last_modified'], lambda: super(UserViewSet, self).list(request, *args, **kwargs)
+        )
+
 
 class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
 
@@ -56,7 +90,7 @@ class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
         Deletes a ZeBrands user given an ID, ¡Authentication needed!
     """
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
@@ -64,6 +98,13 @@ class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
         user = get_object_or_404(get_user_model(), id=self.kwargs['user_id'])
         return user
 
+    def retrieve(self, request, *args, **kwargs):
+        user = self.get_object()
+        etag = make_etag('user', user.id, user.updated_at.isoformat())
+        return conditional_response(
+            request, etag, user.updated_at, lambda: Response(self.get_serializer(user).data)
+        )
+
     def delete(self, request, *args, **kwargs):
         user = get_object_or_404(get_user_model(), id=self.kwargs['user_id'])
         user.delete()
@@ -0,0 +1,114 @@
+"""
+Compression of the responses with the best encoding the client accepts:
+brotli, else gzip. Responses
+smaller than COMPRESSION_MIN_SIZE are sent as they are, as compressing
+them costs more time than it saves on the wire.
+"""
+import gzip
+
+import brotli
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+# Encodings in order of preference
+ENCODINGS = ('br', 'gzip')
+
+# Content types worth compressing, already compressed formats are skipped
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/x-ndjson', 'application/x-msgpack',
+                      'application/vnd.zebrands.columnar+json', 'application/javascript', 'application/xml',
+                      'application/openapi')
+
+
+def negotiate_encoding(accept_encoding):
+    """Return the preferred encoding accepted by an Accept-Encoding header, or None
+
+    :param accept_encoding: str e.g. 'gzip, br;q=0.9'
+    """
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        name, _, value = params.partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    default = accepted.get('*', 0.0)
+    # The highest quality wins, ties are broken by our preference
+    quality, _, coding = max(
+        (accepted.get(coding, default), -index, coding) for index, coding in enumerate(ENCODINGS)
+    )
+    return coding if quality > 0 else None
+
+
+def _brotli_compress(content):
+    return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+
+def _brotli_sequence(sequence):
+    """Yield the brotli compressed chunks of a sequence, flushed after each chunk"""
+    compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+    for item in sequence:
+        yield compressor.process(item) + compressor.flush()
+    yield compressor.finish()
+
+
+COMPRESSORS = {'br': _brotli_compress, 'gzip': compress_string}
+STREAM_COMPRESSORS = {'br': _brotli_sequence, 'gzip': compress_sequence}
+
+# Compressors of the responses built once and served many times, with a higher quality
+# (brotli 11 is 8 times slower than 9 for 9% smaller responses)
+STATIC_COMPRESSORS = {
+    'br': lambda content: brotli.compress(content, quality=9),
+    'gzip': lambda content: gzip.compress(content, compresslevel=9, mtime=0),
+}
+
+
+def compress_static(content):
+    """Return the {encoding: bytes} versions of a content, only the ones smaller than the content"""
+    variants = {}
+    for coding in ENCODINGS:
+        compressed = STATIC_COMPRESSORS[coding](content)
+        if len(compressed) < len(content):
+            variants[coding] = compressed
+    return variants
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compresses the responses with brotli or gzip, depending on the Accept-Encoding of the request"""
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '')
+        if response.has_header('Content-Encoding') or not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding', ))
+        coding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = STREAM_COMPRESSORS[coding](response.streaming_content)
+            # The compressed length is not known in advance
+            del response['Content-Length']
+        else:
+            content = COMPRESSORS[coding](response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        # The compressed bytes are not the ones the strong ETag was made for
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+
+        return response
@@ -0,0 +1,36 @@
+"""
+This file contains helpers for conditional GET requests,
+answering 304 Not Modified when the client copy is current
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Return a strong ETag built from the given version parts"""
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def conditional_response(request, etag, last_modified, get_response):
+    """Return 304 if the request validators match, else the response of get_response()
+
+    :param request: Request with the If-None-Match / If-Modified-Since headers
+    :param etag: str ETag of the current representation
+    :param last_modified: datetime Last modification of the representation, or None
+    :param get_response: callable that builds the full response, only called when needed
+    :return: Response with the ETag and Last-Modified headers
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = get_response()
+
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+
+    return response
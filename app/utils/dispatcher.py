@@ -0,0 +1,125 @@
+"""
+This file contains a background dispatcher to send
+notifications outside of the request thread
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # Sentinel to stop the workers
+
+
+class NotificationDispatcher:
+    """Sends notifications with a pool of worker threads fed by a bounded queue.
+
+    Notifications submitted with the same key inside the coalesce window
+    are merged, only the last payload is sent together with the number
+    of notifications it replaces.
+    """
+
+    def __init__(self, send, workers=2, queue_size=1000, coalesce_window=2.0):
+        """
+        :param send: callable(payload, count) that delivers a notification
+        :param workers: int Number of worker threads
+        :param queue_size: int Max notifications waiting to be sent
+        :param coalesce_window: float Seconds to wait for more notifications with the same key
+        """
+        self.send = send
+        self.workers = workers
+        self.coalesce_window = coalesce_window
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = {}  # key: [deadline, payload, count]
+        self._lock = threading.Lock()
+        self._flush_event = threading.Event()  # Set to send pending notifications right away
+        self._threads = []
+
+    def submit(self, key, payload):
+        """Queue a notification, never blocks the caller
+
+        :param key: Hashable key used to coalesce notifications
+        :param payload: Notification payload given to the send callable
+        :return: bool False if the notification was dropped because the queue is full
+        """
+        self.start()
+
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is not None:
+                # A notification for the same key is waiting, replace its payload
+                entry[1] = payload
+                entry[2] += 1
+                return True
+
+            try:
+                self._queue.put_nowait(key)
+            except queue.Full:
+                logger.warning('Notification queue is full, dropping notification %r', key)
+                return False
+            self._pending[key] = [time.monotonic() + self.coalesce_window, payload, 1]
+
+        return True
+
+    def start(self):
+        """Start the worker threads if they are not running"""
+        if self._threads:
+            return
+
+        with self._lock:
+            if self._threads:
+                return
+            self._flush_event.clear()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'notification-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            atexit.register(self.stop)
+
+    def stop(self, timeout=10):
+        """Send the pending notifications and stop the workers
+
+        :param timeout: float Max seconds to wait for each worker
+        """
+        if not self._threads:
+            return
+
+        self._flush_event.set()
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def join(self):
+        """Block until every queued notification has been processed"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            key = self._queue.get()
+            try:
+                if key is _STOP:
+                    return
+                self._process(key)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, key):
+        with self._lock:
+            deadline = self._pending[key][0]
+
+        # Wait for the end of the coalesce window, unless we are stopping
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            self._flush_event.wait(remaining)
+
+        with self._lock:
+            _, payload, count = self._pending.pop(key)
+
+        try:
+            self.send(payload, count)
+        except Exception:
+            logger.exception('Unable to send notification %r', key)
@@ -0,0 +1,230 @@
+"""
+Per request performance instrumentation.
+
+InstrumentationMiddleware measures the total time of each request, the
+number and time of its SQL queries, recorded by a DB execute wrapper,
+and the time of its phases: the token authentication, the serializers
+and the rendering. They are sent in the Server-Timing header, written
+as a structured log line and added to the per route metrics of /metrics.
+"""
+import asyncio
+import json
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.deprecation import MiddlewareMixin
+
+from rest_framework import serializers
+
+from utils.metrics import Counter, Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+AUTH = 'auth'
+SERIALIZE = 'serialize'
+RENDER = 'render'
+PHASES = (AUTH, SERIALIZE, RENDER)
+
+# Route label of the requests that match no URL pattern
+UNMATCHED_ROUTE = '<unmatched>'
+
+request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Duration of the HTTP requests', ('method', 'route', 'status')
+))
+request_queries = registry.register(Counter(
+    'http_request_db_queries_total', 'SQL queries run by the HTTP requests', ('route', )
+))
+request_db_time = registry.register(Counter(
+    'http_request_db_seconds_total', 'Time spent in SQL queries by the HTTP requests', ('route', )
+))
+request_phase_time = registry.register(Counter(
+    'http_request_phase_seconds_total', 'Time spent in each phase of the HTTP requests', ('route', 'phase')
+))
+
+# Metrics of the request being handled, None outside of a request
+current_metrics = ContextVar('request_metrics', default=None)
+
+# Measures of the finished requests not yet added to the metrics. Appending
+# to a deque needs no lock, they are added in batches of PENDING_LIMIT or
+# when the metrics are exported.
+pending = deque()
+PENDING_LIMIT = 1000
+
+
+class RequestMetrics:
+    """Queries and phase timings of a request"""
+    __slots__ = ('queries', 'db_time', 'phases', 'active')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.phases = {}  # Phase -> seconds
+        self.active = set()  # Phases being timed, nested timings are not counted twice
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self, total):
+        """Return the Server-Timing header value of the metrics, in milliseconds"""
+        metrics = [f'db;desc="{self.queries} queries";dur={self.db_time * 1000:.2f}']
+        metrics.extend(f'{phase};dur={self.phases[phase] * 1000:.2f}' for phase in PHASES if phase in self.phases)
+        metrics.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(metrics)
+
+
+@contextmanager
+def timing(phase):
+    """Add the time spent in the block to a phase of the current request"""
+    metrics = current_metrics.get()
+    if metrics is None or phase in metrics.active:
+        yield
+        return
+
+    metrics.active.add(phase)
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(phase, perf_counter() - start)
+        metrics.active.discard(phase)
+
+
+def record_query(execute, sql, params, many, context):
+    """DB execute wrapper that counts the queries of the current request and their time"""
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver that adds record_query to the wrappers of the connection
+
+    The wrappers belong to the connection object of each thread, which is
+    kept when the DB connection is reopened.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """List serializer whose output is timed as the serialize phase"""
+
+    @property
+    def data(self):
+        with timing(SERIALIZE):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """Serializer whose output is timed as the serialize phase
+
+    Lists are timed as a whole when the Meta of the serializer sets
+    `list_serializer_class = TimedListSerializer`.
+    """
+
+    @property
+    def data(self):
+        with timing(SERIALIZE):
+            return super().data
+
+
+@registry.add_collector
+def aggregate_pending():
+    """Add the measures of the finished requests to the metrics"""
+    while True:
+        try:
+            method, route, status, total, queries, db_time, phases = pending.popleft()
+        except IndexError:
+            return
+        request_duration.observe(total, method, route, str(status))
+        request_queries.inc(queries, route)
+        request_db_time.inc(db_time, route)
+        for phase, seconds in phases.items():
+            request_phase_time.inc(seconds, route, phase)
+
+
+def get_route(request):
+    """Return the URL pattern matched by a request, a label with a bounded number of values"""
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else UNMATCHED_ROUTE
+
+
+class InstrumentationMiddleware(MiddlewareMixin):
+    """Measures each request, placed first so the time of every other middleware is included"""
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self._async = asyncio.iscoroutinefunction(get_response)
+        self.server_timing = settings.INSTRUMENTATION_SERVER_TIMING
+        if settings.METRICS_DIR:
+            registry.start_exporter(settings.METRICS_DIR, settings.METRICS_EXPORT_INTERVAL)
+
+    def __call__(self, request):
+        if self._async:
+            return self.__acall__(request)
+
+        start = perf_counter()
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = perf_counter()
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, perf_counter() - start)
+
+    def process_template_response(self, request, response):
+        """Time the rendering of DRF and template responses, which happens after the view"""
+        metrics = current_metrics.get()
+        if metrics is not None:
+            start = perf_counter()
+            response.add_post_render_callback(lambda rendered: metrics.add(RENDER, perf_counter() - start))
+        return response
+
+    def finish(self, request, response, metrics, total):
+        route = get_route(request)
+        if self.server_timing:
+            response['Server-Timing'] = metrics.server_timing(total)
+
+        pending.append((request.method, route, response.status_code, total, metrics.queries, metrics.db_time,
+                        metrics.phases))
+        if len(pending) >= PENDING_LIMIT:
+            aggregate_pending()
+
+        if logger.isEnabledFor(logging.INFO):
+            line = {
+                'method': request.method,
+                'path': request.path,
+                'route': route,
+                'status': response.status_code,
+                'duration_ms': round(total * 1000, 2),
+                'db_queries': metrics.queries,
+                'db_ms': round(metrics.db_time * 1000, 2),
+            }
+            line.update((f'{phase}_ms', round(seconds * 1000, 2)) for phase, seconds in metrics.phases.items())
+            logger.info(json.dumps(line))
+
+        return response
@@ -0,0 +1,245 @@
+"""
+In-process metrics exposed in the Prometheus text format by /metrics.
+
+Each process (e.g. each gunicorn worker) keeps its own metrics, they are
+cheap to update: a lock and a few additions per observation. With a
+metrics directory, each process also writes its values to a `<pid>.json`
+file every few seconds, and /metrics adds up the files of every process,
+like the multiprocess mode of prometheus_client. The values of the
+workers that exited are kept in ARCHIVE_FILE by the gunicorn master, so
+the counters never go down when a worker is recycled.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+
+ARCHIVE_FILE = 'archived.json'
+
+# Upper bounds in seconds of the request latency buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    """Escape a label value of the text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, **extra):
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _add(value, other):
+    """Add two values of a metric, numbers or the [bucket counts, total] of a histogram"""
+    if isinstance(value, list):
+        return [[count + other_count for count, other_count in zip(value[0], other[0])], value[1] + other[1]]
+    return value + other
+
+
+def merge_values(values, exported):
+    """Add the exported [[label values], value] pairs of a metric to a {label values: value} dict"""
+    for label_values, value in exported:
+        label_values = tuple(label_values)
+        values[label_values] = _add(values[label_values], value) if label_values in values else value
+    return values
+
+
+def _write_json(path, data):
+    """Write a JSON file atomically, readers never see half a file"""
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(data, file)
+    os.replace(temporary, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        # Removed or archived meanwhile
+        return {}
+
+
+def archive_process(directory, pid):
+    """Add the values of an exited process to the archive of the directory, called by the gunicorn master"""
+    path = os.path.join(directory, f'{pid}.json')
+    exported = _read_json(path)
+    if not exported:
+        return
+    archive_path = os.path.join(directory, ARCHIVE_FILE)
+    archive = _read_json(archive_path)
+    for name, values in exported.items():
+        merged = merge_values(merge_values({}, archive.get(name, [])), values)
+        archive[name] = [[list(label_values), value] for label_values, value in merged.items()]
+    _write_json(archive_path, archive)
+    os.remove(path)
+
+
+def clear_directory(directory):
+    """Remove the files of the previous runs, called by the gunicorn master when it starts"""
+    os.makedirs(directory, exist_ok=True)
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.json'):
+            os.remove(entry.path)
+
+
+class Counter:
+    """Counter with one value per combination of label values"""
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def export(self):
+        """Return the [[label values], value] pairs of the metric, to be written as JSON"""
+        with self._lock:
+            return [[list(label_values), self._copy(value)] for label_values, value in self._values.items()]
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def samples(self, values=None):
+        """Yield the lines of the samples
+
+        :param values: dict {label values: value} to export instead of the ones of this process
+        """
+        if values is None:
+            with self._lock:
+                values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield f'{self.name}{_labels(self.labels, label_values)} {value}'
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(Counter):
+    """Histogram with one series of buckets per combination of label values"""
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        # Counts are stored per bucket and made cumulative when exported
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *label_values):
+        series = self._values.get(label_values)
+        return sum(series[0]) if series else 0
+
+    @staticmethod
+    def _copy(value):
+        return [list(value[0]), value[1]]
+
+    def samples(self, values=None):
+        if values is None:
+            with self._lock:
+                values = {label_values: self._copy(series) for label_values, series in self._values.items()}
+        for label_values, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels(self.labels, label_values, le=bound)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labels, label_values)} {total}'
+            yield f'{self.name}_count{_labels(self.labels, label_values)} {cumulative}'
+
+
+class Registry:
+    """Set of metrics exported together"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+        self._exporter = None
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """Register a function called before each export, to update metrics computed lazily"""
+        self.collectors.append(collector)
+        return collector
+
+    def collect(self):
+        for collector in self.collectors:
+            collector()
+
+    def export(self, directory):
+        """Write the values of this process to its file of the metrics directory"""
+        self.collect()
+        os.makedirs(directory, exist_ok=True)
+        _write_json(os.path.join(directory, f'{os.getpid()}.json'),
+                    {metric.name: metric.export() for metric in self.metrics})
+
+    def start_exporter(self, directory, interval):
+        """Export the values of this process every `interval` seconds in a background thread"""
+        if self._exporter is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                self.export(directory)
+
+        self._exporter = threading.Thread(target=run, name='metrics-exporter', daemon=True)
+        self._exporter.start()
+
+    def render(self, directory=None):
+        """Return the metrics in the Prometheus text format
+
+        :param directory: str Metrics directory, to add up the values of every process
+        """
+        values = {}
+        if directory is None:
+            self.collect()
+        else:
+            # The values of this process are up to date, the ones of the others are from their last export
+            self.export(directory)
+            # The archive is read first: a process archived meanwhile is then still read from its own file
+            names = sorted(entry.name for entry in os.scandir(directory) if entry.name.endswith('.json'))
+            names.sort(key=lambda name: name != ARCHIVE_FILE)
+            for name in names:
+                for metric_name, exported in _read_json(os.path.join(directory, name)).items():
+                    merge_values(values.setdefault(metric_name, {}), exported)
+
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples(values.get(metric.name, {}) if directory is not None else None))
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        """Reset every metric, used by the tests"""
+        for metric in self.metrics:
+            metric.clear()
+
+
+registry = Registry()
@@ -0,0 +1,22 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptInCursorPagination(CursorPagination):
+    """Keyset pagination ordered by ID
+
+    Pagination is only applied when the client asks for it with the
+    `cursor` or `page_size` query params, so the full list keeps working.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+
+    def is_requested(self, request):
+        """Return True if the client asked for a page"""
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        return super().paginate_queryset(queryset, request, view)
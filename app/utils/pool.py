@@ -0,0 +1,37 @@
+"""
+This file contains a thread pool with a bounded number of
+pending tasks, used to cap CPU heavy work such as password hashing
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PoolFull(Exception):
+    """Raised when a task is submitted to a pool that has too many pending tasks"""
+
+
+class BoundedPool:
+    """Runs tasks in a fixed number of threads, rejecting them when too many are pending"""
+
+    def __init__(self, workers=2, queue_size=32, name='pool'):
+        """
+        :param workers: int Number of worker threads, the max tasks running at once
+        :param queue_size: int Max tasks waiting for a worker
+        :param name: str Prefix of the thread names
+        """
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def run(self, function, *args):
+        """Run a function in the pool, wait for it and return its result
+
+        :raise PoolFull: If the workers and the queue are busy
+        """
+        if not self._slots.acquire(blocking=False):
+            raise PoolFull()
+
+        try:
+            return self._executor.submit(function, *args).result()
+        finally:
+            self._slots.release()
@@ -0,0 +1,296 @@
+"""
+Opt-in profiling of the requests, enabled with PROFILING_ENABLED.
+
+A fraction of the requests (PROFILING_SAMPLE_RATE) is profiled with
+cProfile and tracemalloc, and saved as a `.prof` file that pstats,
+snakeviz or any cProfile viewer can load. The other requests have their
+stack sampled in the background (every PROFILING_SAMPLE_INTERVAL
+seconds), and the samples of the ones slower than PROFILING_SLOW_THRESHOLD
+are saved as a `.folded` flame graph, loaded by speedscope or
+flamegraph.pl. Each profile has a `.json` file with the details of its
+request, listed by the /api/profiles/ admin endpoint.
+"""
+import asyncio
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.deprecation import MiddlewareMixin
+
+CPROFILE = 'cprofile'
+SAMPLER = 'sampler'
+EXTENSIONS = {CPROFILE: '.prof', SAMPLER: '.folded'}
+
+# Allocation sites reported for the cProfile captures
+TOP_ALLOCATIONS = 20
+
+
+class StackSampler:
+    """Background thread that samples the stacks of the threads handling a request
+
+    The samples of a thread count how many times each stack was seen,
+    stacks are tuples of code objects, the outermost first.
+    """
+
+    def __init__(self, interval=0.01):
+        """
+        :param interval: float Seconds between two samples
+        """
+        self.interval = interval
+        self._samples = {}  # Thread ID -> Counter of stacks
+        self._lock = threading.Lock()
+        self._active = threading.Event()  # Set while some thread is sampled
+        self._thread = None
+
+    def start(self, thread_id):
+        """Start sampling a thread and return its samples, filled until stop() is called"""
+        samples = Counter()
+        with self._lock:
+            self._samples[thread_id] = samples
+            self._active.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+        return samples
+
+    def stop(self, thread_id):
+        with self._lock:
+            self._samples.pop(thread_id, None)
+            if not self._samples:
+                self._active.clear()
+
+    def sample(self):
+        """Add the current stack of every sampled thread to its samples"""
+        with self._lock:
+            sampled = list(self._samples.items())
+        frames = sys._current_frames()
+        for thread_id, samples in sampled:
+            frame = frames.get(thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if stack:
+                samples[tuple(reversed(stack))] += 1
+
+    def _run(self):
+        while True:
+            self._active.wait()
+            time.sleep(self.interval)
+            self.sample()
+
+
+def fold(samples):
+    """Return the samples in the folded stacks format of flame graphs, one `a;b;c count` line per stack"""
+    lines = []
+    for stack, count in samples.most_common():
+        frames = ';'.join(
+            f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})' for code in stack
+        )
+        lines.append(f'{frames} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def take_snapshot():
+    """Return a tracemalloc snapshot without the allocations of tracemalloc itself"""
+    return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+
+def top_allocations(before, after, limit=TOP_ALLOCATIONS):
+    """Return the lines that allocated the most memory between two tracemalloc snapshots"""
+    return [
+        {'line': str(stat.traceback), 'size_kb': round(stat.size_diff / 1024, 1), 'count': stat.count_diff}
+        for stat in after.compare_to(before, 'lineno')[:limit]
+        if stat.size_diff > 0
+    ]
+
+
+class ProfileStore:
+    """Directory of the captured profiles and their `.json` details, only the newest ones are kept"""
+
+    def __init__(self, directory, max_profiles=100):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def save(self, kind, details, write):
+        """Save a profile and its details
+
+        :param kind: str CPROFILE or SAMPLER
+        :param details: dict Details of the request
+        :param write: callable(path) that writes the profile file
+        :return: dict The saved details, with the `name` of the profile file
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        stem = f'{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}'
+        details = {'name': stem + EXTENSIONS[kind], 'kind': kind, **details}
+        with self._lock:
+            write(os.path.join(self.directory, details['name']))
+            with open(os.path.join(self.directory, stem + '.json'), 'w') as file:
+                json.dump(details, file)
+            self._prune()
+        return details
+
+    def _prune(self):
+        """Delete the oldest profiles beyond max_profiles"""
+        captures = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')),
+            key=lambda entry: entry.name
+        )
+        for entry in captures[:max(0, len(captures) - self.max_profiles)]:
+            stem = entry.name[:-len('.json')]
+            for extension in ('.json', *EXTENSIONS.values()):
+                try:
+                    os.remove(os.path.join(self.directory, stem + extension))
+                except FileNotFoundError:
+                    pass
+
+    def list(self, limit=50):
+        """Return the details of the saved profiles, the slowest requests first"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                with open(entry.path) as file:
+                    profiles.append(json.load(file))
+            except (OSError, ValueError):
+                # Deleted or being written by another process
+                continue
+        profiles.sort(key=lambda details: details['duration_ms'], reverse=True)
+        return profiles[:limit]
+
+    def path(self, name):
+        """Return the path of a profile file, or None if there is no such profile"""
+        if os.path.basename(name) != name or not name.endswith(tuple(EXTENSIONS.values())):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+
+def get_store():
+    return ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_PROFILES)
+
+
+class Capture:
+    """Profiling of a single request, with cProfile or the stack sampler"""
+
+    # Only one request at a time traces its allocations, tracemalloc is global to the process
+    _tracemalloc_lock = threading.Lock()
+
+    def __init__(self, kind, sampler=None, allocations=False):
+        self.kind = kind
+        self.sampler = sampler
+        self.thread_id = threading.get_ident()
+        self.snapshot = None
+        self.allocations = None
+        if kind == CPROFILE:
+            if allocations and self._tracemalloc_lock.acquire(blocking=False):
+                # Tracing may have been started by PYTHONTRACEMALLOC, it is then left on
+                self.started_tracemalloc = not tracemalloc.is_tracing()
+                if self.started_tracemalloc:
+                    tracemalloc.start()
+                self.snapshot = take_snapshot()
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.samples = sampler.start(self.thread_id)
+        self.start = time.perf_counter()
+
+    def stop(self):
+        """Stop profiling, return the duration of the request in seconds"""
+        duration = time.perf_counter() - self.start
+        if self.kind == CPROFILE:
+            self.profiler.disable()
+            if self.snapshot is not None:
+                self.allocations = top_allocations(self.snapshot, take_snapshot())
+                if self.started_tracemalloc:
+                    tracemalloc.stop()
+                self._tracemalloc_lock.release()
+        else:
+            self.sampler.stop(self.thread_id)
+        return duration
+
+    def write(self, path):
+        if self.kind == CPROFILE:
+            self.profiler.dump_stats(path)
+        else:
+            with open(path, 'w') as file:
+                file.write(fold(self.samples))
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """Profiles a sample of the requests and the slow ones, not installed when PROFILING_ENABLED is off"""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self._async = asyncio.iscoroutinefunction(get_response)
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.slow_threshold = settings.PROFILING_SLOW_THRESHOLD
+        self.sampler = StackSampler(settings.PROFILING_SAMPLE_INTERVAL) if self.slow_threshold else None
+        self.store = get_store()
+
+    def start_capture(self):
+        """Return the capture of a request, None if it is not profiled"""
+        if self.sample_rate and random.random() < self.sample_rate:
+            return Capture(CPROFILE, allocations=settings.PROFILING_TRACEMALLOC)
+        if self.sampler is not None:
+            return Capture(SAMPLER, self.sampler)
+        return None
+
+    def __call__(self, request):
+        if self._async:
+            return self.__acall__(request)
+
+        capture = self.start_capture()
+        if capture is None:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            duration = capture.stop()
+        self.save(request, response, capture, duration)
+        return response
+
+    async def __acall__(self, request):
+        # The profiles of async requests include the other tasks of the event loop
+        capture = self.start_capture()
+        if capture is None:
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            duration = capture.stop()
+        self.save(request, response, capture, duration)
+        return response
+
+    def save(self, request, response, capture, duration):
+        """Save the profile of a sampled request, or of a slow one"""
+        if capture.kind == SAMPLER and duration < self.slow_threshold:
+            return
+        match = getattr(request, 'resolver_match', None)
+        details = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'route': match.route if match is not None else None,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'captured_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        if capture.allocations is not None:
+            details['allocations'] = capture.allocations
+        self.store.save(capture.kind, details, capture.write)
@@ -2,12 +2,33 @@
 This file contain functions to help interact
 with slack related tasks
 """
+import itertools
 import os
+import time
+
 import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from utils.dispatcher import NotificationDispatcher
+
+# Response status codes worth retrying
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Max SKUs listed in a bulk notification
+BULK_NOTIFICATION_MAX_SKUS = 10
+
+# Unique keys, bulk notifications are never coalesced
+_bulk_notification_ids = itertools.count()
+
+# HTTP session shared by the notification workers, keeps the connections alive
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_maxsize=settings.SLACK_NOTIFICATION_WORKERS))
+_session.mount('http://', HTTPAdapter(pool_maxsize=settings.SLACK_NOTIFICATION_WORKERS))
 
 
 def _send_slack_message(title, content, color='good'):
-    """ Sends a slack notification
+    """ Sends a slack notification, retrying with exponential backoff
 
     Args:
         title: str Title of the notification
@@ -23,24 +44,91 @@ def _send_slack_message(title, content, color='good'):
     attachment = {'title': title, 'text': content, 'color': color}
     message = {'attachments': [attachment]}
 
-    try:
-        response = requests.post(slack_webhook, json=message)
-        return str(response.status_code)
-    except Exception as error:
-        return str(error)
+    result = None
+    for attempt in range(settings.SLACK_MAX_RETRIES + 1):
+        if attempt:
+            time.sleep(settings.SLACK_RETRY_BACKOFF * 2 ** (attempt - 1))
+        try:
+            response = _session.post(slack_webhook, json=message, timeout=settings.SLACK_TIMEOUT)
+            result = str(response.status_code)
+            if response.status_code not in RETRY_STATUS_CODES:
+                break
+        except requests.RequestException as error:
+            result = str(error)
+        except Exception as error:
+            # Invalid webhook or payload, retrying will not help
+            return str(error)
+
+    return result
+
+
+def _send_product_update(payload, count):
+    """Send a (possibly coalesced) product update notification
+
+    :param payload: tuple (title, content) of the last update
+    :param count: int Number of updates merged into this notification
+    """
+    title, content = payload
+    if count > 1:
+        content += f'_{count} updates in the last {settings.SLACK_COALESCE_WINDOW:g} seconds_\n'
+
+    return _send_slack_message(title, content)
+
+
+slack_dispatcher = NotificationDispatcher(
+    send=_send_product_update,
+    workers=settings.SLACK_NOTIFICATION_WORKERS,
+    queue_size=settings.SLACK_NOTIFICATION_QUEUE_SIZE,
+    coalesce_window=settings.SLACK_COALESCE_WINDOW
+)
 
 
 def create_product_update_notification(product):
-    """Create a message to be sent with the product information
+    """Create a message with the product information and queue it to be sent
+
+    The message is sent in the background, several updates of the same
+    product inside the coalesce window are sent as a single message.
 
     :param product: Product updated
 
-    :return: send_slack_message response
+    :return: bool True if the notification was queued
     """
+    if not os.getenv('SLACK_WEBHOOK'):
+        return False
+
     title = f'Product {product.sku} updated'
     content = f'New product information:\n' \
               f'- *Name:* {product.name}\n' \
               f'- *Price:* {product.price}\n' \
               f'- *Brand:* {product.brand}\n'
 
-    return _send_slack_message(title, content)
+    return slack_dispatcher.submit(product.pk, (title, content))
+
+
+def _format_skus(products):
+    """Return a short list of the SKUs of some products"""
+    skus = ', '.join(product.sku for product in products[:BULK_NOTIFICATION_MAX_SKUS])
+    if len(products) > BULK_NOTIFICATION_MAX_SKUS:
+        skus += f' and {len(products) - BULK_NOTIFICATION_MAX_SKUS} more'
+    return skus
+
+
+def create_bulk_products_notification(created=(), updated=(), deleted=()):
+    """Create a single message summarizing a bulk write and queue it to be sent
+
+    :param created: list of Products created
+    :param updated: list of Products updated
+    :param deleted: list of Products deleted
+
+    :return: bool True if the notification was queued
+    """
+    if not os.getenv('SLACK_WEBHOOK'):
+        return False
+
+    title = 'Products bulk update'
+    content = ''
+    for action, products in (('Created', created), ('Updated', updated), ('Deleted', deleted)):
+        if products:
+            content += f'- *{action} {len(products)}:* {_format_skus(products)}\n'
+
+    return slack_dispatcher.submit(('bulk', next(_bulk_notification_ids)), (title, content))
@@ -0,0 +1,121 @@
+"""
+This file contains the sparse fieldsets of the API: clients choose the
+fields of the response with `?fields=a,b`, and the queryset only reads
+what those fields need
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.translation import gettext as _   # For text translations
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+class SparseFieldsSerializerMixin:
+    """Serializer that only outputs the fields given in its `fields` argument
+
+    The fields in `Meta.optional_fields` are only output when requested.
+    Write only fields are always kept, so the serializer can still be used
+    for writes.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        optional = getattr(self.Meta, 'optional_fields', ())
+        for name in list(self.fields):
+            if self.fields[name].write_only:
+                continue
+            requested = name in fields if fields is not None else name not in optional
+            if not requested:
+                self.fields.pop(name)
+
+    @classmethod
+    def readable_field_names(cls):
+        """Return the names of every field that can be requested, optional ones included"""
+        return [name for name, field in cls().get_fields().items() if not field.write_only]
+
+
+def _is_serializer(field):
+    """Return True if the serializer field is a nested serializer"""
+    field = getattr(field, 'child_relation', getattr(field, 'child', field))
+    return isinstance(field, serializers.BaseSerializer)
+
+
+def project_queryset(queryset, serializer):
+    """Return the queryset reading only what the fields of the serializer need
+
+    Model fields are read with only(), foreign keys of nested serializers
+    with select_related() and many to many or reverse relations with
+    prefetch_related(), so the number of queries does not grow with the
+    number of rows.
+    """
+    columns, joins, prefetches = [], [], []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        try:
+            model_field = queryset.model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            # A method or '*' source, it may need any column
+            return queryset
+
+        if model_field.many_to_many or model_field.one_to_many:
+            prefetches.append(field.source)
+        elif model_field.is_relation and _is_serializer(field):
+            joins.append(field.source)
+        else:
+            columns.append(field.source)
+
+    queryset = queryset.only(*columns, *joins)
+    if joins:
+        queryset = queryset.select_related(*joins)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
+
+
+def parse_fields(value, allowed, param='fields'):
+    """Return the list of fields of a `fields` query param value
+
+    :param value: str Comma separated field names, None if the param is missing
+    :param allowed: Names of the fields that can be requested
+    :param param: str Name of the query param, for the error message
+    :return: list of field names, or None if the param is missing
+    :raise ValidationError: If a field is not allowed or no field is given
+    """
+    if value is None:
+        return None
+
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = set(fields) - set(allowed)
+    if unknown or not fields:
+        raise ValidationError({param: _('Unknown fields: %s') % ', '.join(sorted(unknown))})
+    return fields
+
+
+class SparseFieldsetMixin:
+    """View mixin that applies the `fields` query param to its serializer and queryset
+
+    The serializer class must use SparseFieldsSerializerMixin.
+    """
+    fields_query_param = 'fields'
+
+    def get_requested_fields(self):
+        """Return the list of requested fields, or None if all the default fields are requested"""
+        return parse_fields(
+            self.request.query_params.get(self.fields_query_param),
+            self.get_serializer_class().readable_field_names(),
+            self.fields_query_param
+        )
+
+    def get_serializer(self, *args, **kwargs):
+        # The schema generator creates the views without a request
+        if self.request is not None and self.request.method == 'GET':
+            kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request is None or self.request.method != 'GET':
+            return queryset
+        return project_queryset(queryset, self.get_serializer())
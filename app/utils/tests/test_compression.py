@@ -0,0 +1,78 @@
+import gzip
+from unittest import mock
+
+import brotli
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from utils.compression import CompressionMiddleware, negotiate_encoding
+
+CONTENT = b'{"sku": "sku_0001", "name": "Test Name"}' * 100
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024, COMPRESSION_BROTLI_QUALITY=4)
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test the negotiated compression of the responses"""
+
+    def get_response(self, accept_encoding, response):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_negotiate_encoding(self):
+        """Test that the accepted encoding with the highest quality is chosen"""
+        with mock.patch('utils.compression.ENCODINGS', ('br', 'gzip')):
+            self.assertEqual(negotiate_encoding('gzip, deflate, br'), 'br')
+            self.assertEqual(negotiate_encoding('gzip;q=1.0, br;q=0.5'), 'gzip')
+            self.assertEqual(negotiate_encoding('*'), 'br')
+            self.assertEqual(negotiate_encoding('*, br;q=0'), 'gzip')
+            self.assertIsNone(negotiate_encoding('identity'))
+            self.assertIsNone(negotiate_encoding(''))
+
+    def test_gzip_response(self):
+        """Test that large responses are compressed, with a weak ETag"""
+        response = HttpResponse(CONTENT, content_type='application/json')
+        response['ETag'] = '"abc"'
+
+        response = self.get_response('gzip', response)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+
+    def test_brotli_response(self):
+        """Test that brotli is preferred when the client accepts it"""
+        response = self.get_response('gzip, br', HttpResponse(CONTENT, content_type='application/json'))
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), CONTENT)
+
+    def test_small_response_is_not_compressed(self):
+        """Test that responses under the threshold are sent as they are"""
+        response = self.get_response('gzip', HttpResponse(b'{"sku": "sku_0001"}', content_type='application/json'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_incompressible_type_is_not_compressed(self):
+        """Test that already compressed content types are sent as they are"""
+        response = self.get_response('gzip', HttpResponse(CONTENT, content_type='image/png'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_not_accepted_response_varies(self):
+        """Test that a response not compressed for this client still varies on Accept-Encoding"""
+        response = self.get_response('identity', HttpResponse(CONTENT, content_type='application/json'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, CONTENT)
+
+    def test_streaming_response(self):
+        """Test that streams are compressed chunk by chunk, whatever their size"""
+        chunks = [b'[', b'{"sku": "sku_0001"}', b']']
+        response = self.get_response('gzip', StreamingHttpResponse(chunks, content_type='application/x-ndjson'))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(chunks))
@@ -0,0 +1,216 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Product
+from products.cache import product_cache
+from products.visits import visit_buffer
+from user.authentication import token_cache
+from utils.instrumentation import (
+    UNMATCHED_ROUTE, RequestMetrics, aggregate_pending, current_metrics, pending, request_duration, timing
+)
+from utils.metrics import Counter, Histogram, Registry, archive_process, registry
+
+
+def parse_server_timing(header):
+    """Return a dict of metric name -> (description, duration) of a Server-Timing header"""
+    metrics = {}
+    for metric in header.split(', '):
+        name, *params = metric.split(';')
+        values = dict(param.split('=', 1) for param in params)
+        metrics[name] = (values.get('desc', '').strip('"'), float(values['dur']))
+    return metrics
+
+
+class MetricsTests(TestCase):
+    """Test the Prometheus metrics"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that the buckets count every value lower or equal to their bound"""
+        test_registry = Registry()
+        histogram = test_registry.register(Histogram('latency', 'Latency', ('route', ), buckets=(0.1, 1)))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, 'api/"x"/')
+
+        lines = test_registry.render().splitlines()
+
+        self.assertEqual(lines[:2], ['# HELP latency Latency', '# TYPE latency histogram'])
+        self.assertEqual(lines[2:], [
+            'latency_bucket{route="api/\\"x\\"/",le="0.1"} 2',
+            'latency_bucket{route="api/\\"x\\"/",le="1"} 3',
+            'latency_bucket{route="api/\\"x\\"/",le="+Inf"} 4',
+            'latency_sum{route="api/\\"x\\"/"} 3.65',
+            'latency_count{route="api/\\"x\\"/"} 4',
+        ])
+
+    def test_counter(self):
+        """Test that a counter adds up the values of each label"""
+        counter = Counter('queries_total', 'Queries', ('route', ))
+        counter.inc(2, 'a')
+        counter.inc(3, 'a')
+        counter.inc(1, 'b')
+
+        self.assertEqual(list(counter.samples()), ['queries_total{route="a"} 5', 'queries_total{route="b"} 1'])
+
+    def test_metrics_of_every_process(self):
+        """Test that the values written by each process are added up, including the exited ones"""
+        test_registry = Registry()
+        counter = test_registry.register(Counter('queries_total', 'Queries', ('route', )))
+        histogram = test_registry.register(Histogram('latency', 'Latency', buckets=(1, )))
+        with tempfile.TemporaryDirectory() as directory:
+            # Values of two processes that exited, as the gunicorn master archives them
+            for pid in (101, 102):
+                counter.inc(2, 'a')
+                histogram.observe(0.5)
+                test_registry.export(directory)
+                os.rename(os.path.join(directory, f'{os.getpid()}.json'), os.path.join(directory, f'{pid}.json'))
+                test_registry.clear()
+            archive_process(directory, 101)
+            # And the values of this process
+            counter.inc(1, 'b')
+
+            lines = test_registry.render(directory).splitlines()
+
+            self.assertEqual(
+                sorted(os.listdir(directory)), sorted(['102.json', 'archived.json', f'{os.getpid()}.json'])
+            )
+        self.assertIn('queries_total{route="a"} 4', lines)
+        self.assertIn('queries_total{route="b"} 1', lines)
+        self.assertIn('latency_count 2', lines)
+
+    def test_nested_timings_are_counted_once(self):
+        """Test that a phase timed inside the same phase is not added twice"""
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with timing('serialize'):
+                with timing('serialize'):
+                    pass
+        finally:
+            current_metrics.reset(token)
+
+        self.assertEqual(list(metrics.phases), ['serialize'])
+
+    def test_timing_outside_of_a_request(self):
+        """Test that timings outside of a request are ignored"""
+        with timing('serialize'):
+            pass
+
+        self.assertIsNone(current_metrics.get())
+
+
+class InstrumentationMiddlewareTests(TestCase):
+    """Test the per request instrumentation"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.product = Product.objects.create(sku='sku_0001', name='Test Name', price=10.0, brand='Brand')
+        pending.clear()
+        registry.clear()
+        product_cache.clear()
+
+    def tearDown(self):
+        pending.clear()
+        registry.clear()
+        product_cache.clear()
+        token_cache.clear()
+        visit_buffer.clear()
+
+    def test_server_timing_counts_the_queries(self):
+        """Test that the Server-Timing header has the number of queries of the request"""
+        url = reverse('products:list')
+        with CaptureQueriesContext(connection) as queries:
+            result = self.client.get(url)
+
+        metrics = parse_server_timing(result['Server-Timing'])
+
+        self.assertEqual(metrics['db'][0], f'{len(queries)} queries')
+        self.assertGreater(len(queries), 0)
+        self.assertGreaterEqual(metrics['total'][1], metrics['db'][1])
+
+    def test_server_timing_phases(self):
+        """Test that the authentication, serializer and rendering times are measured"""
+        user = get_user_model().objects.create_user('user@zebrands.com', 'pass123')
+        token = Token.objects.create(user=user)
+
+        result = self.client.patch(
+            reverse('products:product', args=[self.product.id]), {'name': 'New Name'},
+            HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(
+            list(parse_server_timing(result['Server-Timing'])), ['db', 'auth', 'serialize', 'render', 'total']
+        )
+
+    def test_metrics_per_route(self):
+        """Test that the latency of the requests is aggregated by route"""
+        for _ in range(3):
+            self.client.get(reverse('products:product_readonly', args=[self.product.id]))
+        self.client.get('/missing/')
+        aggregate_pending()
+
+        self.assertEqual(request_duration.count('GET', 'api/products/<int:product_id>/', '200'), 3)
+        self.assertEqual(request_duration.count('GET', UNMATCHED_ROUTE, '404'), 1)
+
+        result = self.client.get(reverse('metrics'))
+
+        self.assertEqual(result.status_code, 200)
+        self.assertTrue(result['Content-Type'].startswith('text/plain'))
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",route="api/products/<int:product_id>/",status="200"} 3',
+            result.content.decode()
+        )
+        self.assertIn('http_request_db_queries_total{route="api/products/<int:product_id>/"}', result.content.decode())
+
+    def test_metrics_are_aggregated_in_batches(self):
+        """Test that the pending measures are added to the metrics once the limit is reached"""
+        with mock.patch('utils.instrumentation.PENDING_LIMIT', 2):
+            self.client.get(reverse('healthz'))
+            self.assertEqual(len(pending), 1)
+            self.client.get(reverse('healthz'))
+
+        self.assertEqual(len(pending), 0)
+        self.assertEqual(request_duration.count('GET', 'healthz', '200'), 2)
+
+    def test_structured_log_line(self):
+        """Test that each request is logged as a JSON line"""
+        with self.assertLogs('utils.instrumentation', 'INFO') as logs:
+            self.client.get(reverse('products:list'))
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['route'], 'api/products/')
+        self.assertEqual(line['status'], 200)
+        self.assertGreater(line['db_queries'], 0)
+        self.assertIn('render_ms', line)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        """Test that the metrics require the bearer token when one is set"""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        result = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(result.status_code, 200)
+
+    def test_metrics_without_token_are_local(self):
+        """Test that only local clients get the metrics when no token is set"""
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.8').status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1').status_code, 200)
+
+    @override_settings(INSTRUMENTATION_ENABLED=False)
+    def test_disabled(self):
+        """Test that nothing is measured when the instrumentation is disabled"""
+        result = self.client.get(reverse('products:list'))
+
+        self.assertFalse(result.has_header('Server-Timing'))
+        self.assertEqual(len(pending), 0)
+        self.assertEqual(request_duration.count('GET', 'api/products/', '200'), 0)
@@ -0,0 +1,61 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from utils.lru_cache import TTLCache
+
+
+class TTLCacheTests(SimpleTestCase):
+    """Test the in-memory LRU cache"""
+
+    def test_least_recently_used_is_evicted(self):
+        """Test that the cache keeps at most maxsize entries"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')  # 'b' is now the least recently used
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_entries_expire_after_ttl(self):
+        """Test that expired entries are treated as misses"""
+        cache = TTLCache(maxsize=10, ttl=5)
+        with mock.patch('utils.lru_cache.time.monotonic', return_value=100):
+            cache.set('a', 1)
+        with mock.patch('utils.lru_cache.time.monotonic', return_value=106):
+            self.assertIsNone(cache.get('a'))
+
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_hits_and_misses_are_counted(self):
+        """Test the hit/miss counters"""
+        cache = TTLCache()
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_delete_where(self):
+        """Test removing the entries that match a predicate"""
+        cache = TTLCache()
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.delete_where(lambda value: value > 1)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+
+    def test_items_skips_expired_entries(self):
+        """Test that items returns only the entries that are not expired"""
+        cache = TTLCache(maxsize=10, ttl=5)
+        with mock.patch('utils.lru_cache.time.monotonic', return_value=100):
+            cache.set('a', 1)
+        with mock.patch('utils.lru_cache.time.monotonic', return_value=103):
+            cache.set('b', 2)
+        with mock.patch('utils.lru_cache.time.monotonic', return_value=106):
+            self.assertEqual(cache.items(), [('b', 2)])
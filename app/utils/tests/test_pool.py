@@ -0,0 +1,37 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from utils.pool import BoundedPool, PoolFull
+
+
+class BoundedPoolTests(SimpleTestCase):
+    """Test the thread pool with bounded pending tasks"""
+
+    def test_run_returns_the_result(self):
+        """Test that run waits for the task and returns its result"""
+        pool = BoundedPool(workers=1, queue_size=0)
+
+        self.assertEqual(pool.run(sum, [1, 2, 3]), 6)
+        self.assertNotEqual(pool.run(threading.current_thread).name, threading.current_thread().name)
+
+    def test_full_pool_rejects_tasks(self):
+        """Test that tasks beyond the workers and the queue are rejected"""
+        pool = BoundedPool(workers=1, queue_size=0)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait()
+
+        thread = threading.Thread(target=pool.run, args=(block, ))
+        thread.start()
+        started.wait()
+        try:
+            with self.assertRaises(PoolFull):
+                pool.run(sum, [1])
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(pool.run(sum, [1]), 1)
@@ -0,0 +1,159 @@
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from utils.profiling import ProfileStore, ProfilingMiddleware, StackSampler, fold
+
+
+def slow_view(request):
+    time.sleep(0.05)
+    return HttpResponse('slow')
+
+
+def fast_view(request):
+    return HttpResponse('fast')
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Test the profiling of the requests"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.settings = override_settings(
+            PROFILING_ENABLED=True, PROFILING_DIR=self.directory.name, PROFILING_SAMPLE_RATE=0,
+            PROFILING_SLOW_THRESHOLD=0.02, PROFILING_SAMPLE_INTERVAL=0.001
+        )
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.request = RequestFactory().get('/api/products/?brand=Luuna')
+
+    def files(self, extension):
+        return [name for name in os.listdir(self.directory.name) if name.endswith(extension)]
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        """Test that the middleware is not installed when profiling is disabled"""
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(fast_view)
+
+    def test_sampled_request_is_profiled(self):
+        """Test that a sampled request is saved as a cProfile file with its allocations"""
+        with override_settings(PROFILING_SAMPLE_RATE=1):
+            ProfilingMiddleware(fast_view)(self.request)
+
+        [name] = self.files('.prof')
+        stats = pstats.Stats(os.path.join(self.directory.name, name))
+        self.assertTrue(any(function[2] == 'fast_view' for function in stats.stats))
+        [details] = ProfileStore(self.directory.name).list()
+        self.assertEqual(details['name'], name)
+        self.assertEqual(details['kind'], 'cprofile')
+        self.assertEqual(details['path'], '/api/products/?brand=Luuna')
+        self.assertIn('allocations', details)
+
+    def test_slow_request_is_sampled(self):
+        """Test that the stack samples of a slow request are saved as a flame graph"""
+        ProfilingMiddleware(slow_view)(self.request)
+
+        [name] = self.files('.folded')
+        with open(os.path.join(self.directory.name, name)) as file:
+            content = file.read()
+        self.assertIn('slow_view (test_profiling.py:', content)
+        self.assertGreaterEqual(ProfileStore(self.directory.name).list()[0]['duration_ms'], 50)
+
+    def test_fast_request_is_not_saved(self):
+        """Test that nothing is saved for a request under the threshold"""
+        ProfilingMiddleware(fast_view)(self.request)
+
+        self.assertEqual(os.listdir(self.directory.name) if os.path.exists(self.directory.name) else [], [])
+
+    def test_oldest_profiles_are_deleted(self):
+        """Test that only the newest profiles are kept"""
+        with override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_MAX_PROFILES=2,
+                                    PROFILING_TRACEMALLOC=False):
+            middleware = ProfilingMiddleware(fast_view)
+            for path in ('/first/', '/second/', '/third/'):
+                middleware(RequestFactory().get(path))
+
+        self.assertEqual(len(self.files('.prof')), 2)
+        self.assertEqual(
+            sorted(details['path'] for details in ProfileStore(self.directory.name).list()), ['/second/', '/third/']
+        )
+
+
+class StackSamplerTests(TestCase):
+    """Test the stack sampler"""
+
+    def test_fold(self):
+        """Test that the samples are written outermost frame first with their count"""
+        sampler = StackSampler()
+        samples = sampler.start(threading.get_ident())
+        sampler.sample()
+        sampler.sample()
+        sampler.stop(threading.get_ident())
+
+        [line] = fold(samples).splitlines()
+        frames, count = line.rsplit(' ', 1)
+        self.assertEqual(count, '2')
+        self.assertEqual(
+            [frame.split(' ')[0] for frame in frames.split(';')[-2:]], ['test_fold', 'sample']
+        )
+
+
+class ProfileEndpointsTests(TestCase):
+    """Test the admin endpoints of the captured profiles"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.settings = override_settings(PROFILING_DIR=self.directory.name)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+        store = ProfileStore(self.directory.name)
+        for path, duration in (('/a/', 1200.0), ('/b/', 3400.0)):
+            self.last = store.save('sampler', {'path': path, 'duration_ms': duration},
+                                   lambda file_path: open(file_path, 'w').close())
+        self.client = APIClient()
+
+    def test_list_requires_admin(self):
+        """Test that only admins can list the profiles"""
+        user = get_user_model().objects.create_user('user@zebrands.com', 'pass123')
+        self.client.force_authenticate(user)
+
+        self.assertEqual(self.client.get(reverse('profiles')).status_code, 403)
+
+    def test_list_slowest_first(self):
+        """Test that the profiles are listed from the slowest request"""
+        admin = get_user_model().objects.create_superuser('admin@zebrands.com', 'pass123')
+        self.client.force_authenticate(admin)
+
+        result = self.client.get(reverse('profiles'))
+
+        self.assertEqual([details['path'] for details in result.json()['profiles']], ['/b/', '/a/'])
+
+    def test_download(self):
+        """Test that a profile file is downloaded by name, other files are not found"""
+        admin = get_user_model().objects.create_superuser('admin@zebrands.com', 'pass123')
+        self.client.force_authenticate(admin)
+
+        result = self.client.get(reverse('profile', args=[self.last['name']]))
+        self.assertEqual(result.status_code, 200)
+        self.assertIn('attachment', result['Content-Disposition'])
+        self.assertEqual(b''.join(result.streaming_content), b'')
+
+        json_name = self.last['name'].replace('.folded', '.json')
+        self.assertEqual(self.client.get(reverse('profile', args=[json_name])).status_code, 404)
+        with open(os.path.join(self.directory.name, json_name)) as file:
+            self.assertEqual(json.load(file)['path'], '/b/')
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from core.models import Product
+
+from utils import slack_handler
+from utils.dispatcher import NotificationDispatcher
+
+
+class StubSlackHandler(BaseHTTPRequestHandler):
+    """Stub webhook that stores the received messages"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        server = self.server
+        server.messages.append(json.loads(body))
+        time.sleep(server.delay)
+        status = server.statuses.pop(0) if server.statuses else 200
+        self.send_response(status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        """Keep the test output clean"""
+
+
+class StubSlackServer(HTTPServer):
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubSlackHandler)
+        self.messages = []
+        self.statuses = []  # Status codes for the next requests
+        self.delay = 0
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}/webhook'
+
+
+@override_settings(SLACK_RETRY_BACKOFF=0, SLACK_TIMEOUT=1)
+class SlackNotificationTests(SimpleTestCase):
+    """Test the background Slack notifications against a local stub server"""
+
+    def setUp(self):
+        self.server = StubSlackServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        env = mock.patch.dict(os.environ, {'SLACK_WEBHOOK': self.server.url})
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.dispatcher = NotificationDispatcher(
+            send=slack_handler._send_product_update,
+            workers=2,
+            coalesce_window=0.2
+        )
+        patcher = mock.patch.object(slack_handler, 'slack_dispatcher', self.dispatcher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.product = Product(id=1, sku='sku_0001', name='Test Name', price=10.0, brand='Test Brand')
+
+    def tearDown(self):
+        self.dispatcher.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_notification_is_sent(self):
+        """Test that a product update notification reaches the webhook"""
+        self.assertTrue(slack_handler.create_product_update_notification(self.product))
+        self.dispatcher.join()
+
+        self.assertEqual(len(self.server.messages), 1)
+        attachment = self.server.messages[0]['attachments'][0]
+        self.assertEqual(attachment['title'], 'Product sku_0001 updated')
+        self.assertIn('Test Name', attachment['text'])
+
+    def test_updates_of_same_product_are_coalesced(self):
+        """Test that several updates inside the window are sent as one message"""
+        for price in (11.0, 12.0, 13.0):
+            self.product.price = price
+            slack_handler.create_product_update_notification(self.product)
+        other_product = Product(id=2, sku='sku_0002', name='Other', price=1.0, brand='Test Brand')
+        slack_handler.create_product_update_notification(other_product)
+        self.dispatcher.join()
+
+        self.assertEqual(len(self.server.messages), 2)
+        texts = {message['attachments'][0]['title']: message['attachments'][0]['text']
+                 for message in self.server.messages}
+        self.assertIn('13.0', texts['Product sku_0001 updated'])
+        self.assertIn('3 updates', texts['Product sku_0001 updated'])
+        self.assertNotIn('updates', texts['Product sku_0002 updated'])
+
+    def test_failed_requests_are_retried(self):
+        """Test that server errors are retried until the webhook accepts the message"""
+        self.server.statuses = [500, 503]
+
+        result = slack_handler._send_slack_message('Title', 'Content')
+
+        self.assertEqual(result, '200')
+        self.assertEqual(len(self.server.messages), 3)
+
+    def test_submit_does_not_wait_for_slow_webhook(self):
+        """Test that queueing a notification does not depend on the webhook latency"""
+        self.server.delay = 0.5
+
+        start = time.monotonic()
+        slack_handler.create_product_update_notification(self.product)
+        elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 0.1)
+
+    def test_notification_skipped_without_webhook(self):
+        """Test that nothing is queued when there is no webhook configured"""
+        with mock.patch.dict(os.environ, {'SLACK_WEBHOOK': ''}):
+            self.assertFalse(slack_handler.create_product_update_notification(self.product))